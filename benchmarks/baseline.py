@@ -0,0 +1,65 @@
+# storing and comparing benchmark results
+
+import json
+import os
+
+# directory containing stored baselines
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+def path(name):
+	"""
+	Returns the path of the baseline file for the named benchmark.
+	"""
+	return os.path.join(BASELINE_DIR, name + '.json')
+
+def load(name):
+	"""
+	Loads the stored baseline for the named benchmark, a dict mapping case
+	names to dicts of measurements. Returns an empty dict if no baseline was
+	stored.
+	"""
+	try:
+		with open(path(name)) as baseline:
+			return json.load(baseline)
+	except FileNotFoundError:
+		return {}
+
+def save(name, results):
+	"""
+	Stores results as the baseline for the named benchmark.
+	"""
+	os.makedirs(BASELINE_DIR, exist_ok = True)
+	with open(path(name), 'w') as baseline:
+		json.dump(results, baseline, indent = '\t', sort_keys = True)
+		baseline.write('\n')
+
+def compare(baseline, results, key, tolerance, higher_is_better = False):
+	"""
+	Compares measurement key of all cases in results to those in baseline,
+	yielding (case, baseline value, value, ratio) for cases that regressed
+	more than tolerance (a fraction, 0.1 allowing a 10% regression).
+	"""
+	for case, measurements in sorted(results.items()):
+		if case not in baseline or key not in baseline[case]:
+			continue
+
+		expected = baseline[case][key]
+		value = measurements[key]
+		if higher_is_better:
+			ratio = expected / value if value else float('inf')
+		else:
+			ratio = value / expected if expected else float('inf')
+
+		if ratio > 1.0 + tolerance:
+			yield (case, expected, value, ratio)
+
+def report(name, regressions):
+	"""
+	Prints regressions as produced by compare, returning whether there were
+	any.
+	"""
+	regressions = list(regressions)
+	for case, expected, value, ratio in regressions:
+		print('REGRESSION {} {}: {:.6g} -> {:.6g} ({:.2f}x)'.format(name, case, expected, value, ratio))
+
+	return bool(regressions)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# turns per second benchmark of headless turn resolution
+#
+# usage: python3 -m benchmarks.bench_turns [--players 10 100] [--log] [--save | --compare]
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from benchmarks import baseline
+from lobotomy import log
+from lobotomy.simulation import Simulation
+
+# name of the stored baseline
+NAME = 'turns'
+
+# phases to report, in order
+PHASES = ('begin', 'end', 'move', 'index', 'fire', 'scan', 'dispatch')
+
+def run_case(num_players, field_size, turns, seed):
+	"""
+	Runs turns turns with num_players players on a square field of the given
+	size, returning a dict of measurements.
+	"""
+	simulation = Simulation(num_players, (field_size, field_size), seed = seed)
+	# warm up, letting every player act at least once
+	simulation.step()
+
+	start = time.perf_counter()
+	totals = simulation.run(turns)
+	elapsed = time.perf_counter() - start
+
+	result = {'turns_per_second': turns / elapsed}
+	for phase in PHASES:
+		# store phase costs in ms per turn
+		result[phase] = totals.get(phase, 0.0) * 1000 / turns
+
+	# fraction of the reference's candidate checks saved by the neighbor
+	# lists in the last turn
+	stats = simulation.server.neighbor_stats
+	result['saved'] = 1.0 - stats.get('candidates', 0) / max(stats.get('reference_candidates', 0), 1)
+
+	return result
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Benchmark headless LoBotomy turn resolution')
+	parser.add_argument('--players', type = int, nargs = '+', default = [10, 100, 1000, 10000], help = 'numbers of players to benchmark')
+	parser.add_argument('--fields', type = float, nargs = '+', default = [2.0, 20.0], help = 'sizes of the (square) field to benchmark')
+	parser.add_argument('--turns', type = int, default = 5, help = 'number of turns to measure per case')
+	parser.add_argument('--seed', type = int, default = 1452, help = 'seed for the simulated worlds')
+	parser.add_argument('--log', action = 'store_true', help = 'log actions (to nowhere) like a server would, measuring what logging costs')
+	parser.add_argument('--save', action = 'store_true', help = 'store the results as the new baseline')
+	parser.add_argument('--compare', action = 'store_true', help = 'compare the results to the stored baseline')
+	parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed regression as a fraction of the baseline')
+	args = parser.parse_args()
+
+	if args.log:
+		listener = log.setup(handlers = [logging.StreamHandler(open(os.devnull, 'w'))])
+	else:
+		# per-action log messages are not part of what we're measuring
+		logging.disable(logging.INFO)
+
+	print('{:>8} {:>8} {:>10} '.format('players', 'field', 'turns/s') + ' '.join('{:>9}'.format(phase + ' ms') for phase in PHASES) + ' {:>7}'.format('saved'))
+	results = {}
+	for field_size in args.fields:
+		for num_players in args.players:
+			result = run_case(num_players, field_size, args.turns, args.seed)
+			results['{}@{:g}'.format(num_players, field_size)] = result
+			print('{:>8} {:>8g} {:>10.2f} '.format(num_players, field_size, result['turns_per_second']) + ' '.join('{:>9.3f}'.format(result[phase]) for phase in PHASES) + ' {:>6.1f}%'.format(result['saved'] * 100))
+
+	if args.log:
+		listener.stop()
+
+	if args.compare:
+		regressed = baseline.report(NAME, baseline.compare(baseline.load(NAME), results, 'turns_per_second', args.tolerance, higher_is_better = True))
+		if regressed:
+			sys.exit(1)
+
+	if args.save:
+		stored = baseline.load(NAME)
+		stored.update(results)
+		baseline.save(NAME, stored)
+
+if __name__ == '__main__':
+	main()
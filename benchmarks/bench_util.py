@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# micro-benchmarks of functions called for every player, every turn
+#
+# usage: python3 -m benchmarks.bench_util [--save | --compare]
+
+import argparse
+import math
+import random
+import sys
+import time
+
+from benchmarks import baseline
+from lobotomy import config, protocol, util
+
+# name of the stored baseline
+NAME = 'util'
+
+FIELD_SIZE = config.game.field_dimensions
+FIELD = (0.0, 0.0) + FIELD_SIZE
+
+def random_location(rng):
+	return (rng.random() * FIELD_SIZE[0], rng.random() * FIELD_SIZE[1])
+
+def edge_location(rng, margin = 0.1):
+	"""
+	Returns a random location within margin of one of the field's edges.
+	"""
+	x, y = random_location(rng)
+	if rng.random() < 0.5:
+		x = rng.choice((rng.random() * margin, FIELD_SIZE[0] - rng.random() * margin))
+	else:
+		y = rng.choice((rng.random() * margin, FIELD_SIZE[1] - rng.random() * margin))
+	return (x, y)
+
+def corner_location(rng, margin = 0.1):
+	"""
+	Returns a random location within margin of one of the field's corners.
+	"""
+	return (
+		rng.choice((rng.random() * margin, FIELD_SIZE[0] - rng.random() * margin)),
+		rng.choice((rng.random() * margin, FIELD_SIZE[1] - rng.random() * margin)),
+	)
+
+def bounds(location, radius):
+	x, y = location
+	return (x - radius, y - radius, x + radius, y + radius)
+
+def random_line(rng):
+	"""
+	Returns a random action command as sent by clients.
+	"""
+	angle = '{:.6f}'.format(rng.random() * 2 * math.pi)
+	return rng.choice((
+		'move {} {:.4f}\n'.format(angle, rng.random() * 0.2),
+		'fire {} {:.4f} {:.4f} {:.4f}\n'.format(angle, rng.random() * 0.5, rng.random() * 0.2, rng.random() * 0.3),
+		'scan {:.4f}\n'.format(rng.random() * 0.3),
+	))
+
+def parse_line(line):
+	"""
+	Parses a command line as received, the way players do.
+	"""
+	parts = line.split()
+	name, converters = protocol.SIGNATURES[parts[0]]
+	return protocol.parse_arguments(converters, parts[1:])
+
+def frame_chunk(buffer, chunk):
+	"""
+	Frames and parses the lines of chunk, as read from a client's socket.
+	"""
+	buffer[:len(chunk)] = chunk
+	lines, _ = protocol.frame_lines(buffer, len(chunk))
+	for line in lines:
+		parse_line(line)
+
+def cases(rng, size):
+	"""
+	Yields benchmark cases as (name, function, list of argument tuples).
+	"""
+	locations = [random_location(rng) for _ in range(size)]
+	edges = [edge_location(rng) for _ in range(size)]
+	corners = [corner_location(rng) for _ in range(size)]
+
+	yield ('move_wrapped', util.move_wrapped, [(location, rng.random() * 2 * math.pi, rng.random() * 0.2, FIELD_SIZE) for location in locations])
+	yield ('move_wrapped/edge', util.move_wrapped, [(location, rng.random() * 2 * math.pi, 0.2, FIELD_SIZE) for location in edges])
+
+	# consume the generated bounds, as the server does
+	def wrapped_bounds(field, target):
+		return list(util.generate_wrapped_bounds(field, target))
+
+	yield ('generate_wrapped_bounds', wrapped_bounds, [(FIELD, bounds(location, rng.random() * 0.1)) for location in locations])
+	yield ('generate_wrapped_bounds/edge', wrapped_bounds, [(FIELD, bounds(location, 0.15)) for location in edges])
+	yield ('generate_wrapped_bounds/corner', wrapped_bounds, [(FIELD, bounds(location, 0.15)) for location in corners])
+
+	radii = [util.WrappedRadius(location, rng.random() * 0.3, FIELD_SIZE) for location in locations]
+	yield ('WrappedRadius.distance', util.WrappedRadius.distance, [(radius, random_location(rng)) for radius in radii])
+	yield ('WrappedRadius.__contains__', util.WrappedRadius.__contains__, [(radius, random_location(rng)) for radius in radii])
+	corner_radii = [util.WrappedRadius(location, 0.15, FIELD_SIZE) for location in corners]
+	yield ('WrappedRadius.__contains__/corner', util.WrappedRadius.__contains__, [(radius, corner_location(rng)) for radius in corner_radii])
+
+	yield ('angle', util.angle, [(location, random_location(rng)) for location in locations])
+
+	lines = [random_line(rng) for _ in range(size)]
+	yield ('parse_msg', protocol.parse_msg, [(line,) for line in lines])
+	yield ('parse_line', parse_line, [(line.encode('utf-8'),) for line in lines])
+	# reads of up to recv_size, full of complete lines
+	buffer = bytearray(config.host.max_line_length + config.host.recv_size + 1)
+	chunks = [b'']
+	for line in lines:
+		line = line.encode('utf-8')
+		if len(chunks[-1]) + len(line) > config.host.recv_size:
+			chunks.append(b'')
+		chunks[-1] += line
+	yield ('frame_chunk', frame_chunk, [(buffer, chunk) for chunk in chunks])
+	yield ('format_msg', protocol.format_msg, [(rng.choice((
+		('begin', rng.randrange(100000), rng.random()),
+		('hit', 'player{}'.format(rng.randrange(1000)), rng.random() * 2 * math.pi, rng.random() * 0.3),
+		('detect', 'player{}'.format(rng.randrange(1000)), rng.random() * 2 * math.pi, rng.random() * 0.3, rng.random()),
+		('end',),
+	)),) for _ in range(size)])
+
+def measure(function, arguments, repeat):
+	"""
+	Returns the best time over repeat runs of calling function for all of
+	arguments, in ns per call.
+	"""
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for args in arguments:
+			function(*args)
+		best = min(best, time.perf_counter() - start)
+
+	return best / len(arguments) * 1e9
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Benchmark functions on the hot path of turn resolution')
+	parser.add_argument('--size', type = int, default = 10000, help = 'number of inputs per case')
+	parser.add_argument('--repeat', type = int, default = 5, help = 'number of runs per case, the best is reported')
+	parser.add_argument('--seed', type = int, default = 1452, help = 'seed for the generated inputs')
+	parser.add_argument('--save', action = 'store_true', help = 'store the results as the new baseline')
+	parser.add_argument('--compare', action = 'store_true', help = 'compare the results to the stored baseline')
+	parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed regression as a fraction of the baseline')
+	args = parser.parse_args()
+
+	results = {}
+	# number of inputs by case
+	counts = {}
+	for name, function, arguments in cases(random.Random(args.seed), args.size):
+		counts[name] = len(arguments)
+		results[name] = {'ns_per_call': measure(function, arguments, args.repeat)}
+		print('{:<36} {:>10.1f} ns'.format(name, results[name]['ns_per_call']))
+
+	print('parsing throughput: {:.0f} lines/s, {:.0f} lines/s framed from reads'.format(
+		1e9 / results['parse_line']['ns_per_call'],
+		1e9 * args.size / counts['frame_chunk'] / results['frame_chunk']['ns_per_call'],
+	))
+
+	if args.compare:
+		if baseline.report(NAME, baseline.compare(baseline.load(NAME), results, 'ns_per_call', args.tolerance)):
+			sys.exit(1)
+
+	if args.save:
+		stored = baseline.load(NAME)
+		stored.update(results)
+		baseline.save(NAME, stored)
+
+if __name__ == '__main__':
+	main()
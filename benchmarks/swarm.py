@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# loopback load generator, connecting a swarm of bots to a running server
+#
+# usage: python3 -m benchmarks.swarm --bots 1000 --mix random=3,idle=1 --turns 20 --server-pid PID
+#
+# all bots connect from a single address, start the server with limits that
+# allow for the swarm, or bots will be refused:
+#
+#   python3 lobotomy.py --max-connections 2000 --max-host-connections 2000 --max-handshakes 2000
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import resource
+import statistics
+import time
+from collections import Counter, defaultdict
+
+from lobotomy import config, protocol
+
+def encode(command):
+	"""
+	Encodes a parsed command (as returned by the protocol module) as a line to
+	be sent to the server.
+	"""
+	return protocol.format_msg(command.values())
+
+# behaviors, yielding the commands a bot sends in a single turn
+def idle(rng):
+	return ()
+
+def mover(rng):
+	return (protocol.move(rng.random() * 2 * math.pi, rng.random() * 0.2),)
+
+def shooter(rng):
+	return (protocol.fire(rng.random() * 2 * math.pi, rng.random() * 0.5, rng.random() * 0.2, rng.random() * 0.3),)
+
+def scanner(rng):
+	return (protocol.scan(rng.random() * 0.3),)
+
+def random_actions(rng):
+	return mover(rng) + shooter(rng) + scanner(rng)
+
+BEHAVIORS = {
+	'idle': idle,
+	'mover': mover,
+	'shooter': shooter,
+	'scanner': scanner,
+	'random': random_actions,
+}
+
+class Stats:
+	"""
+	Measurements shared by all bots in the swarm.
+	"""
+
+	def __init__(self):
+		# arrival times of begin commands, by turn number
+		self.begins = defaultdict(list)
+		self.connected = 0
+		self.failed = 0
+		# bots turned away by the server's connection limits
+		self.refused = 0
+		self.dropped = 0
+		self.commands = 0
+		self.errors = Counter()
+		# round trips in seconds from sending commands to the server's answer
+		# to them, by answer (only join and failing commands are answered)
+		self.round_trips = defaultdict(list)
+
+class Bot:
+	"""
+	A single connection to the server, acting according to a behavior.
+	"""
+
+	def __init__(self, name, behavior, rate, stats, rng):
+		self.name = name
+		self.behavior = behavior
+		# number of times the behavior's commands are sent every turn
+		self.rate = rate
+		self.stats = stats
+		self.rng = rng
+		self.dead_turns = 0
+		# time the last commands were sent, answers arrive before those of
+		# any later ones
+		self.sent = None
+
+	async def run(self, host, port, deadline):
+		try:
+			reader, writer = await asyncio.open_connection(host, port)
+		except OSError:
+			self.stats.failed += 1
+			return
+
+		# bots the server closes the connection of before joining were turned
+		# away by its connection limits, whether or not their error 203 made
+		# it
+		joined = False
+		try:
+			writer.write(encode(protocol.join(self.name)))
+			writer.write(encode(protocol.spawn()))
+			self.sent = time.perf_counter()
+
+			while True:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break
+				try:
+					# a server that stopped talking should not keep the swarm
+					# from reporting
+					line = await asyncio.wait_for(reader.readline(), remaining)
+				except asyncio.TimeoutError:
+					break
+				if not line:
+					break
+
+				arrived = time.perf_counter()
+				message = protocol.parse_msg(line.decode('utf-8'))
+				command = message['command']
+
+				if command in ('welcome', 'error'):
+					self.stats.round_trips[command].append(arrived - self.sent)
+
+				if command == 'welcome':
+					joined = True
+					self.stats.connected += 1
+				elif command == 'begin':
+					self.stats.begins[message['turn_number']].append(arrived)
+					if self.dead_turns > 0:
+						self.dead_turns -= 1
+						if self.dead_turns <= 0:
+							writer.write(encode(protocol.spawn()))
+							self.sent = time.perf_counter()
+						continue
+
+					for _ in range(self.rate):
+						for action in self.behavior(self.rng):
+							writer.write(encode(action))
+							self.stats.commands += 1
+					self.sent = time.perf_counter()
+					await writer.drain()
+				elif command == 'death':
+					self.dead_turns = message['turns']
+				elif command == 'error' and message['errno'] == 203:
+					# not an error of a command
+					break
+				elif command == 'error':
+					self.stats.errors[message['errno']] += 1
+					if message['errno'] == 104:
+						# spawned too early, try again next turn
+						self.dead_turns = 1
+		except (OSError, ValueError, KeyError):
+			if joined:
+				self.stats.dropped += 1
+		finally:
+			if not joined:
+				self.stats.refused += 1
+			writer.close()
+
+def parse_mix(mix):
+	"""
+	Parses a behavior mix like 'random=3,idle=1' into a list of (behavior,
+	weight) pairs.
+	"""
+	result = []
+	for part in mix.split(','):
+		name, _, weight = part.partition('=')
+		result.append((BEHAVIORS[name], float(weight or 1)))
+
+	return result
+
+def cpu_seconds(pid):
+	"""
+	Returns the CPU time (user and system) spent by process pid in seconds, or
+	None if it cannot be determined.
+	"""
+	try:
+		with open('/proc/{}/stat'.format(pid)) as stat:
+			# fields after the command name (which may contain spaces)
+			fields = stat.read().rsplit(')', 1)[1].split()
+		# utime and stime are fields 14 and 15, in clock ticks
+		return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+	except (OSError, IndexError, ValueError):
+		return None
+
+def percentile(values, fraction):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def swarm(args):
+	rng = random.Random(args.seed)
+	behaviors, weights = zip(*parse_mix(args.mix))
+	stats = Stats()
+
+	duration = args.turns * args.turn_duration / 1000
+	start_cpu = cpu_seconds(args.server_pid) if args.server_pid else None
+	start = time.monotonic()
+	deadline = start + duration
+
+	tasks = []
+	for i in range(args.bots):
+		bot = Bot('{}{}'.format(args.prefix, i), rng.choices(behaviors, weights)[0], args.rate, stats, random.Random(rng.random()))
+		tasks.append(asyncio.ensure_future(bot.run(args.host, args.port, deadline)))
+		# spread connections over time if requested
+		if args.connect_rate and i % args.connect_rate == args.connect_rate - 1:
+			await asyncio.sleep(1)
+
+	await asyncio.gather(*tasks)
+	elapsed = time.monotonic() - start
+	end_cpu = cpu_seconds(args.server_pid) if args.server_pid else None
+
+	print('bots: {} joined, {} refused by the server, {} failed to connect, {} dropped'.format(stats.connected, stats.refused, stats.failed, stats.dropped))
+
+	# only consider turns seen by (nearly) every connected bot
+	skews = [max(times) - min(times) for times in stats.begins.values() if len(times) > 1]
+	if skews:
+		print('begin skew over {} turns: median {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms'.format(
+			len(skews),
+			statistics.median(skews) * 1000,
+			percentile(skews, 0.99) * 1000,
+			max(skews) * 1000
+		))
+
+	errors = sum(stats.errors.values())
+	print('commands: {} sent, {} errors ({:.2%})'.format(stats.commands, errors, errors / stats.commands if stats.commands else 0.0))
+	for errno, count in sorted(stats.errors.items()):
+		print('  error {}: {} ({})'.format(errno, count, protocol.ERRORS.get(errno, 'unknown')))
+
+	for answer, round_trips in sorted(stats.round_trips.items()):
+		print('round trips to {} over {} commands: median {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms'.format(
+			answer,
+			len(round_trips),
+			statistics.median(round_trips) * 1000,
+			percentile(round_trips, 0.99) * 1000,
+			max(round_trips) * 1000
+		))
+
+	if start_cpu is not None and end_cpu is not None:
+		spent = end_cpu - start_cpu
+		print('server cpu: {:.2f} s over {:.2f} s ({:.1%}), {:.3f} ms per bot per second'.format(
+			spent, elapsed, spent / elapsed, spent / elapsed / max(stats.connected, 1) * 1000
+		))
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Connect a swarm of bots to a LoBotomy server')
+	parser.add_argument('--host', default = 'localhost', help = 'server to connect to')
+	parser.add_argument('--port', type = int, default = config.host.port, help = 'port to connect to')
+	parser.add_argument('--bots', type = int, default = 1000, help = 'number of bots to connect')
+	parser.add_argument('--mix', default = 'random=1', help = 'weighted behavior mix, choose from {}'.format(', '.join(sorted(BEHAVIORS))))
+	parser.add_argument('--rate', type = int, default = 1, help = 'number of times a bot sends its commands every turn')
+	parser.add_argument('--connect-rate', type = int, default = 0, help = 'number of connections to open per second (0 opens all at once)')
+	parser.add_argument('--turns', type = int, default = 10, help = 'number of turns to run for')
+	parser.add_argument('--turn-duration', type = int, default = config.game.turn_duration, help = 'turn duration of the server in ms')
+	parser.add_argument('--server-pid', type = int, default = 0, help = 'process id of the server, to measure its cpu usage')
+	parser.add_argument('--prefix', default = 'swarm', help = 'prefix for bot names')
+	parser.add_argument('--seed', type = int, default = None, help = 'seed for bot behavior')
+	args = parser.parse_args()
+
+	# thousands of connections need as many file descriptors
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	if soft < hard:
+		resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+	asyncio.run(swarm(args))
+
+if __name__ == '__main__':
+	main()
@@ -3,9 +3,15 @@
 
 import signal
 import logging
+import lobotomy.log
 import lobotomy.server
 import lobotomy.config
 
+# handle config parameter, before anything reads the configuration
+lobotomy.config.parse_args()
+
+# setup logging to print messages from server, written by a background thread
+listener = lobotomy.log.setup(level = logging.DEBUG)
 
 # create a server object
 server = lobotomy.server.LoBotomyServer()
@@ -18,11 +24,8 @@ def shutdown(signal, frame):
 # add a signal before serving
 signal.signal(signal.SIGINT, shutdown)
 
-# setup simple logging to print messages from server
-logging.basicConfig(format = '[ %(levelname)8s ] %(message)s', level = logging.DEBUG)
-
-# handle config parameter
-lobotomy.config.parse_args()
-
 # start the server
 server.serve_forever()
+
+# write what's left to log
+listener.stop()
@@ -0,0 +1,205 @@
+# per-turn, per-player analytics, exported in columnar chunk files
+#
+# a chunk file starts with a line of JSON describing it, followed by the raw
+# contents of every column in order:
+#
+#   {"turns": [1, 100], "rows": 1234, "byteorder": "little",
+#    "columns": [["turn", "i", 4], ...], "names": ["henk", ...]}
+#
+# the player column indexes the chunk's names
+
+from array import array
+import json
+import math
+import os
+import sys
+
+from lobotomy.event import Listener
+from lobotomy.state import FIRE, MOVE, SCAN
+
+# columns of the rows kept for every player active in a turn, and their
+# typecodes
+COLUMNS = (
+	('turn', 'i'),
+	('player', 'i'),
+	# energy and location at the end of the turn (before healing)
+	('energy', 'd'),
+	('x', 'd'),
+	('y', 'd'),
+	# bitwise or of the actions performed (state.MOVE, FIRE and SCAN)
+	('actions', 'B'),
+	('move_cost', 'd'),
+	('fire_cost', 'd'),
+	('scan_cost', 'd'),
+	# hits dealt and the damage they did, hits taken and the damage taken
+	('hits', 'i'),
+	('damage', 'd'),
+	('hits_taken', 'i'),
+	('damage_taken', 'd'),
+	('detects', 'i'),
+	('deaths', 'B'),
+)
+
+# indices of the columns in a row
+(TURN, PLAYER, ENERGY, X, Y, ACTIONS, MOVE_COST, FIRE_COST, SCAN_COST,
+	HITS, DAMAGE, HITS_TAKEN, DAMAGE_TAKEN, DETECTS, DEATHS) = range(len(COLUMNS))
+
+# file name extension of chunk files
+EXTENSION = '.chunk'
+
+class ColumnarExport(Listener):
+	"""
+	Listener accumulating a row for every player active in a turn into
+	typed column buffers, writing them to a chunk file in directory every
+	turns_per_chunk turns. Call close to write the last, partial chunk.
+	"""
+
+	def __init__(self, directory, turns_per_chunk = 100):
+		super().__init__()
+		self.directory = directory
+		self.turns_per_chunk = turns_per_chunk
+		os.makedirs(directory, exist_ok = True)
+
+		# turn being resolved, and the rows of the players active in it by
+		# name
+		self._turn = None
+		self._rows = {}
+		self._reset()
+
+	def _reset(self):
+		self._columns = [array(typecode) for (_, typecode) in COLUMNS]
+		# index of every player's name in the chunk's names
+		self._names = {}
+		self._first_turn = None
+
+	def accepts(self, **event):
+		return event['type'] in ('turn_end', 'player_move', 'player_fire', 'player_scan', 'player_hit', 'player_detect')
+
+	def row(self, name):
+		row = self._rows.get(name)
+		if row is None:
+			index = self._names.setdefault(name, len(self._names))
+			row = self._rows[name] = [self._turn, index, math.nan, math.nan, math.nan, 0, 0.0, 0.0, 0.0, 0, 0.0, 0, 0.0, 0, 0]
+		return row
+
+	def accept(self, **event):
+		kind = event['type']
+		if kind == 'turn_end':
+			# the events of the previous turn are all in
+			self.end_turn()
+			self._turn = event['turn']
+			if self._first_turn is None:
+				self._first_turn = self._turn
+			return
+
+		row = self.row(event['player'])
+		energy = event['energy']
+		if kind == 'player_hit':
+			row[HITS_TAKEN] += 1
+			row[DAMAGE_TAKEN] += event['charge']
+			row[X], row[Y] = event['location']
+			attacker = self.row(event['attacker'])
+			attacker[HITS] += 1
+			attacker[DAMAGE] += event['charge']
+			if event['fatal']:
+				row[DEATHS] += 1
+		elif kind == 'player_detect':
+			row[DETECTS] += 1
+			# detect events carry the current energy, not a change
+			return
+		else:
+			if kind == 'player_move':
+				row[ACTIONS] |= MOVE
+				row[MOVE_COST] += event['cost']
+				# players dying from a move stay where they were
+				row[X], row[Y] = event['location'][1 if energy[1] > 0.0 else 0]
+			elif kind == 'player_fire':
+				row[ACTIONS] |= FIRE
+				row[FIRE_COST] += event['cost']
+				row[X], row[Y] = event['location']
+			else:
+				row[ACTIONS] |= SCAN
+				row[SCAN_COST] += event['cost']
+				row[X], row[Y] = event['location']
+
+			if energy[1] <= 0.0:
+				# died from exhaustion
+				row[DEATHS] += 1
+
+		row[ENERGY] = energy[1]
+
+	def end_turn(self):
+		"""
+		Moves the rows of the turn being resolved into the column buffers,
+		writing a chunk when it spans enough turns.
+		"""
+		columns = self._columns
+		for row in self._rows.values():
+			for column, value in zip(columns, row):
+				column.append(value)
+		self._rows.clear()
+
+		if self._turn is not None and self._turn - self._first_turn + 1 >= self.turns_per_chunk:
+			self.write()
+
+	def write(self):
+		"""
+		Writes the buffered rows to a chunk file, returning its path (or None
+		if no turns were buffered).
+		"""
+		if self._first_turn is None:
+			return None
+
+		names = sorted(self._names, key = self._names.get)
+		header = {
+			'turns': [self._first_turn, self._turn],
+			'rows': len(self._columns[0]),
+			'byteorder': sys.byteorder,
+			'columns': [[name, column.typecode, column.itemsize] for ((name, _), column) in zip(COLUMNS, self._columns)],
+			'names': names,
+		}
+		path = os.path.join(self.directory, 'turns-{:010d}{}'.format(self._first_turn, EXTENSION))
+		# write to a temporary file first, readers never see partial chunks
+		with open(path + '.tmp', 'wb') as chunk:
+			chunk.write(json.dumps(header).encode('utf-8') + b'\n')
+			for column in self._columns:
+				column.tofile(chunk)
+		os.replace(path + '.tmp', path)
+
+		self._reset()
+		return path
+
+	def close(self):
+		"""
+		Writes the rows of the turns since the last chunk, including those of
+		the turn being resolved.
+		"""
+		self.end_turn()
+		self.write()
+
+def read_chunk(path):
+	"""
+	Reads a chunk file, returning its header and its columns as a dict of
+	arrays by column name.
+	"""
+	with open(path, 'rb') as chunk:
+		header = json.loads(chunk.readline().decode('utf-8'))
+		columns = {}
+		for name, typecode, itemsize in header['columns']:
+			column = array(typecode)
+			if column.itemsize != itemsize:
+				raise ValueError('column {} was written with items of {} bytes'.format(name, itemsize))
+			column.fromfile(chunk, header['rows'])
+			if header['byteorder'] != sys.byteorder:
+				column.byteswap()
+			columns[name] = column
+	return header, columns
+
+def read_chunks(directory):
+	"""
+	Reads all chunk files in directory in order of their turns, yielding
+	(header, columns) pairs.
+	"""
+	for name in sorted(os.listdir(directory)):
+		if name.endswith(EXTENSION):
+			yield read_chunk(os.path.join(directory, name))
@@ -0,0 +1,166 @@
+# bots playing from within the server, without network connections
+
+import math
+import random
+from threading import RLock
+
+from lobotomy import game, LoBotomyException
+from lobotomy.player import Player, PlayerState
+
+class Bot:
+	"""
+	Base class for bots playing in-process. The methods named after the
+	messages a client receives (welcome, begin, end, hit, death, detect and
+	error) are called with the same arguments, straight from the turn loop.
+	Actions are requested with spawn, move, fire and scan, like a client
+	would.
+	"""
+
+	# respawn automatically when allowed to
+	respawn = True
+
+	def __init__(self):
+		# the player this bot plays as, set when added to a server
+		self.player = None
+
+	def welcome(self, version, energy, heal, turn_duration, turns_left):
+		pass
+
+	def begin(self, turn_number, energy, duration):
+		pass
+
+	def end(self):
+		pass
+
+	def hit(self, name, angle, charge):
+		pass
+
+	def death(self, turns):
+		pass
+
+	def detect(self, name, angle, distance, energy):
+		pass
+
+	def error(self, errno, message):
+		pass
+
+	def spawn(self):
+		return self.player.request('spawn')
+
+	def move(self, angle, distance):
+		return self.player.request('move', angle, distance)
+
+	def fire(self, angle, distance, radius, charge):
+		return self.player.request('fire', angle, distance, radius, charge)
+
+	def scan(self, radius):
+		return self.player.request('scan', radius)
+
+class BotPlayer(Player):
+	"""
+	Player controlled by a Bot rather than a client. Messages to the client
+	are handed to the bot's methods directly, no socket or thread is
+	involved.
+	"""
+
+	def __init__(self, server, bot):
+		# no socket, the thread is never started
+		super().__init__(server, None)
+
+		self.bot = bot
+		bot.player = self
+		# the turn loop and the thread resolving turns in pipelined mode both
+		# signal the bot, which handles a signal at a time (reentrant, as the
+		# bot's requests can have errors signaled right away)
+		self._bot_lock = RLock()
+
+	def request(self, command, *arguments):
+		"""
+		Handles command with arguments as if it were sent by a client,
+		returning whether it was accepted. Errors are reported to the bot.
+		"""
+		try:
+			self._handlers[command](*arguments)
+			return True
+		except LoBotomyException as e:
+			self.send_error(e.errno)
+			return False
+
+	def signal_begin(self, turn_number, energy, duration):
+		if self.state is PlayerState.DEAD and self.dead_turns <= 0 and self.bot.respawn:
+			self.request('spawn')
+
+		super().signal_begin(turn_number, energy, duration)
+
+	def send(self, command):
+		name, *arguments = command
+		with self._bot_lock:
+			getattr(self.bot, name)(*arguments)
+
+def action_angle(angle):
+	"""
+	Converts an angle as signaled to players (measured from the y axis,
+	towards the x axis) to an angle for actions (measured from the x axis,
+	towards the y axis).
+	"""
+	return (math.pi / 2 - angle) % (2 * math.pi)
+
+class Wanderer(Bot):
+	"""
+	Moves and fires at random.
+	"""
+
+	def __init__(self, seed = None):
+		super().__init__()
+		self.random = random.Random(seed)
+
+	def begin(self, turn_number, energy, duration):
+		rng = self.random
+		if rng.random() < 0.5:
+			self.move(rng.random() * 2 * math.pi, rng.random() * 0.2)
+		if energy > 0.5 and rng.random() < 0.3:
+			self.fire(rng.random() * 2 * math.pi, rng.random() * 0.2, rng.random() * 0.1, rng.random() * 0.4)
+
+class Hunter(Bot):
+	"""
+	Scans around, firing at the players it detected last turn.
+	"""
+
+	def __init__(self, radius = 0.3, charge = 0.3, seed = None):
+		super().__init__()
+		self.radius = radius
+		self.charge = charge
+		self.random = random.Random(seed)
+		# (angle, distance, energy) of the players detected last turn
+		self.targets = []
+
+	def begin(self, turn_number, energy, duration):
+		targets, self.targets = self.targets, []
+		if targets:
+			# go for the weakest target, if we can afford it
+			angle, distance, _ = min(targets, key = lambda target: target[2])
+			if energy > game.fire_cost(distance, 0.05, self.charge) + 0.1:
+				self.fire(action_angle(angle), distance, 0.05, self.charge)
+				return
+
+		if energy > game.scan_cost(self.radius) + 0.1:
+			self.scan(self.radius)
+		else:
+			# keep moving while recharging
+			self.move(self.random.random() * 2 * math.pi, 0.05)
+
+	def detect(self, name, angle, distance, energy):
+		self.targets.append((angle, distance, energy))
+
+# bots used to fill up an arena, cycled through in order, and the prefix of
+# their names
+FILLERS = (Wanderer, Hunter)
+NAME_PREFIX = 'bot-'
+
+def fillers(count, seed = None):
+	"""
+	Creates count filler bots, yielding (name, bot) pairs.
+	"""
+	rng = random.Random(seed)
+	for index in range(count):
+		yield ('{}{}'.format(NAME_PREFIX, index), FILLERS[index % len(FILLERS)](seed = rng.random()))
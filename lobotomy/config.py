@@ -13,15 +13,71 @@ class host:
 	# if host is in debug mode, which client names should under full admin
 	# control
 	debug_names = ''
+	# number of connections the operating system queues for us to accept
+	backlog = 128
+	# maximum number of connections, in total and from a single address
+	max_connections = 1024
+	max_host_connections = 128
+	# maximum number of connections that have yet to join, and the time in
+	# seconds they get to do so
+	max_handshakes = 64
+	handshake_timeout = 5.0
+	# time in seconds sending to a client may block before dropping it
+	send_timeout = 2.0
+	# enable TCP keepalive, detecting connections of which the other end has
+	# disappeared
+	keepalive = True
+	# size in bytes of a connection's socket buffers, a single read and the
+	# longest line accepted from a client
+	socket_buffer = 16 * 1024
+	recv_size = 4096
+	max_line_length = 1024
+	# maximum number of robots a single connection can play as a fleet (0
+	# to refuse fleets)
+	max_fleet_size = 64
+	# address of a lobby to report our load to as host:port (none when
+	# empty), the address clients should connect to us on (defaults to our
+	# host name) and the interval in seconds between reports
+	lobby = ''
+	advertise = ''
+	report_interval = 2.0
+	# time in seconds after which a lobby forgets about nodes that stopped
+	# reporting, and the addresses it accepts reports from (comma separated)
+	node_timeout = 10.0
+	lobby_nodes = '127.0.0.1,::1'
+	# name of the shared memory segment to publish the world in after every
+	# turn (none when empty), and the number of players it holds
+	world_view = ''
+	world_view_capacity = 16384
+	# send turn signals as UDP datagrams to clients asking for them, from
+	# udp_port (0 for the port we listen on), dropping a fraction udp_loss of
+	# them on purpose to simulate a lossy network
+	udp = False
+	udp_port = 0
+	udp_loss = 0.0
+	# stack size in bytes of the threads handling clients (0 for the
+	# platform's default), other threads keep the default
+	thread_stack_size = 256 * 1024
 
 # store general game settings
 class game:
 	# turn length, time in ms the server will wait before executing a turn
 	turn_duration = 5000
+	# adapt the length of turns to how fast players act and how long
+	# executing a turn takes, between min_turn_duration and turn_duration
+	adaptive_turns = False
+	min_turn_duration = 200
 	# internal battle field size
 	field_dimensions = (2.0, 2.0)
 	# number of turns a player is kept dead
 	dead_turns = 5
+	# resolve turns while the next turn is already being collected
+	pipelined = False
+	# index player locations once per turn for the area queries of fires and
+	# scans
+	neighbor_lists = True
+	# number of built-in bots to fill up the arena with
+	bots = 0
 
 # store player settings
 class player:
@@ -29,15 +85,66 @@ class player:
 	max_energy = 1.0
 	# amount of energy that is recharged at the end of each turn
 	turn_heal = 0.2
+	# commands a client may send per second, and in a single burst
+	command_rate = 50.0
+	command_burst = 20
+	# action commands a client may send per turn
+	turn_commands = 12
 
-def parse_args():
+# store logging settings
+class log:
+	# fraction of the records of actions logged, by event (move, fire, hit,
+	# death, scan or detect), logging all records of events not listed
+	samples = {}
+	# records logged per second for every event, and in a single burst (0
+	# for no limit)
+	rate = 100.0
+	burst = 100
+	# records waiting to be written, records are dropped when exceeded
+	queue_size = 100000
+	# directory to export per-turn analytics of players to (none when empty),
+	# and the number of turns in a single file
+	analytics = ''
+	analytics_turns = 100
+
+def parse_args(args = None):
 	parser = argparse.ArgumentParser(description='A server for the awesome Lobotomy game')
 
 	parser.add_argument('--debug', '-d', action='store_true', dest='host.debug', default=False, help='Run server in debug mode, pausing the server between turns. Also provides a possibility to start the Python debugger (pdb) to inspect server state.')
 
 	parser.add_argument('--debug_names', dest='host.debug_names', default='', help='If debugging is enabled, this contains a list of names of clients for which the server administrator can fully control which messages are sent and which are not. All other connected clients will be handeled by the server itself.')
 
-	parse_result = parser.parse_args()
+	parser.add_argument('--backlog', type=int, dest='host.backlog', default=host.backlog, help='Number of connections the operating system queues for the server to accept.')
+
+	parser.add_argument('--max-connections', type=int, dest='host.max_connections', default=host.max_connections, help='Maximum number of connected clients.')
+
+	parser.add_argument('--max-host-connections', type=int, dest='host.max_host_connections', default=host.max_host_connections, help='Maximum number of clients connected from a single address.')
+
+	parser.add_argument('--max-handshakes', type=int, dest='host.max_handshakes', default=host.max_handshakes, help='Maximum number of connections that have yet to join.')
+
+	parser.add_argument('--max-fleet-size', type=int, dest='host.max_fleet_size', default=host.max_fleet_size, help='Maximum number of robots a single connection can play as a fleet.')
+
+	parser.add_argument('--world-view', dest='host.world_view', default=host.world_view, help='Name of a shared memory segment to publish the state of all players in after every turn, for tools on the same machine (see lobotomy.world_view).')
+
+	parser.add_argument('--udp', action='store_true', dest='host.udp', default=host.udp, help='Offer clients to receive turn signals as UDP datagrams, keeping TCP for everything else.')
+
+	parser.add_argument('--udp-loss', type=float, dest='host.udp_loss', default=host.udp_loss, help='Fraction of datagrams to drop on purpose, simulating a lossy network.')
+
+	parser.add_argument('--lobby', dest='host.lobby', default=host.lobby, help='Address of a lobby (host:port) to report to, having it send players to this server.')
+
+	parser.add_argument('--advertise', dest='host.advertise', default=host.advertise, help='Address the lobby should send players to, defaults to the host name of this machine.')
+
+	parser.add_argument('--bots', type=int, dest='game.bots', default=game.bots, help='Number of built-in bots to fill up the arena with, playing from within the server.')
+
+	parser.add_argument('--log-rate', type=float, dest='log.rate', default=log.rate, help='Number of records logged per second for every type of action, 0 for no limit.')
+
+	parser.add_argument('--analytics', dest='log.analytics', default=log.analytics, help='Directory to export per-turn analytics of all players to, in columnar chunk files (see lobotomy.analytics).')
+
+	parser.add_argument('--adaptive-turns', action='store_true', dest='game.adaptive_turns', default=game.adaptive_turns, help='Shorten turns when players act quickly and the server keeps up, lengthen them up to the configured turn duration when they don\'t.')
+
+	parser.add_argument('--pipelined', action='store_true', dest='game.pipelined', default=False, help='Execute a turn\'s actions while the next turn is already being collected, sending its results before that next turn ends.')
+
+	parse_result = parser.parse_args(args)
 
 	# Convert stuff in parse_result to properties of above classes
 	# This may be a bit ugly, but was the shortest/cleanest i could come up
@@ -0,0 +1,123 @@
+# turn signals sent as UDP datagrams, for clients that asked for them
+#
+# a datagram starts with a header line of its sequence number (counting the
+# datagrams sent to a client) and the turn its messages belong to, followed
+# by the messages as they would be sent over TCP:
+#
+#   17 123
+#   begin 123 0.8 5000
+#   hit Klaas 1.123 0.4
+
+import logging
+import random
+import socket
+from threading import local, Lock
+
+from lobotomy import protocol
+
+# maximum size of a datagram's payload, staying clear of fragmentation on
+# common links (a single message longer than this is sent on its own)
+MAX_DATAGRAM_SIZE = 1200
+
+class DatagramChannel:
+	"""
+	UDP socket sending the turn signals of the clients attached to it.
+	Signals are queued per client and sent when flushed, as few datagrams as
+	fit them. Every thread flushes the signals it queued itself, keeping the
+	results of a turn being resolved apart from the signals of the next one.
+	A fraction loss of datagrams is dropped on purpose, simulating a lossy
+	network.
+	"""
+
+	def __init__(self, host, port, loss = 0.0, seed = None):
+		self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self._sock.bind((host, port))
+		self._sock.setblocking(False)
+		self.loss = loss
+		self._random = random.Random(seed)
+
+		# address and sequence number of the next datagram by player
+		self._clients = {}
+		# messages queued by player, for every thread queueing signals (the
+		# turn loop and the thread resolving turns)
+		self._local = local()
+		# lock making flushes take turns, guarding the sequence numbers
+		self._lock = Lock()
+		# number of datagrams sent, and dropped (on purpose or by a full
+		# socket buffer)
+		self.sent = 0
+		self.dropped = 0
+
+	@property
+	def port(self):
+		return self._sock.getsockname()[1]
+
+	def attach(self, player, address):
+		self._clients[player] = [address, 0]
+
+	def detach(self, player):
+		# messages still queued are dropped when flushed
+		self._clients.pop(player, None)
+
+	def queue(self, player, command):
+		try:
+			queues = self._local.queues
+		except AttributeError:
+			queues = self._local.queues = {}
+		queues.setdefault(player, []).append(protocol.format_msg(command))
+
+	def flush(self, turn):
+		"""
+		Sends all messages queued by the calling thread, as messages of turn.
+		"""
+		queues = getattr(self._local, 'queues', None)
+		if not queues:
+			return
+		self._local.queues = {}
+
+		with self._lock:
+			for player, messages in queues.items():
+				client = self._clients.get(player)
+				if client is None:
+					# detached meanwhile
+					continue
+
+				datagram = []
+				size = 0
+				for message in messages:
+					if datagram and size + len(message) > MAX_DATAGRAM_SIZE:
+						self.send(client, turn, datagram)
+						datagram, size = [], 0
+					datagram.append(message)
+					size += len(message)
+				self.send(client, turn, datagram)
+
+	def send(self, client, turn, messages):
+		# called with the lock held, by a single flush at a time
+		address, sequence = client
+		client[1] += 1
+		if self.loss and self._random.random() < self.loss:
+			self.dropped += 1
+			return
+
+		try:
+			self._sock.sendto('{} {}\n'.format(sequence, turn).encode('utf-8') + b''.join(messages), address)
+			self.sent += 1
+		except (BlockingIOError, InterruptedError):
+			self.dropped += 1
+		except (OSError, OverflowError, ValueError) as e:
+			# a bad address only affects its client
+			logging.debug('failed to send datagram to %s: %s', address, str(e))
+			self.dropped += 1
+
+	def close(self):
+		self._sock.close()
+
+def parse_datagram(data):
+	"""
+	Parses a datagram as received by a client, returning its sequence
+	number, turn number and messages (parsed like protocol.parse_msg does).
+	"""
+	header, *lines = data.decode('utf-8').splitlines()
+	sequence, turn = map(int, header.split())
+	return sequence, turn, [protocol.parse_msg(line) for line in lines if line]
@@ -15,20 +15,112 @@ class Listener:
 		# to be overridden by implementors
 		pass
 
+class Envelope:
+	"""
+	Events of a single turn, grouped by type, in the order they were emitted.
+	An envelope starts with the turn_end event of its turn, followed by the
+	events of resolving the turn and those of starting the next one. Events
+	are stored as a column of values for every field.
+	"""
+
+	__slots__ = ('turn', 'events', 'counts')
+
+	def __init__(self, turn):
+		self.turn = turn
+		# columns of values by field, by type
+		self.events = {}
+		# number of events by type
+		self.counts = {}
+
+	def __len__(self):
+		return sum(self.counts.values())
+
+	def append(self, kind, fields):
+		"""
+		Appends an event of kind with fields (a dict of values by field, not
+		including its type).
+		"""
+		count = self.counts.get(kind, 0)
+		self.counts[kind] = count + 1
+		columns = self.events.get(kind)
+		if columns is None:
+			columns = self.events[kind] = {}
+
+		for field, value in fields.items():
+			column = columns.get(field)
+			if column is None:
+				# earlier events of this kind lacked the field
+				column = columns[field] = [None] * count
+			column.append(value)
+		if len(columns) != len(fields):
+			# this event lacks fields of earlier ones
+			for column in columns.values():
+				if len(column) == count:
+					column.append(None)
+
+	def columns(self, kind, *fields):
+		"""
+		Returns the values of fields of all events of kind, as a list of
+		values per field (None for events lacking the field). The lists are
+		the envelope's own, not to be modified.
+		"""
+		count = self.counts.get(kind, 0)
+		columns = self.events.get(kind, {})
+		return tuple(columns.get(field) or [None] * count for field in fields)
+
+class BatchListener(Listener):
+	"""
+	Listener receiving all events of a turn at once, rather than an event at
+	a time.
+	"""
+
+	def accept_batch(self, envelope):
+		# to be overridden by implementors
+		pass
+
 class Emitter:
 	def __init__(self):
 		self._listeners = []
+		self._batch_listeners = []
+		# envelope collecting events for batch listeners
+		self._envelope = None
 
 	def add_listener(self, listener):
-		self._listeners.append(listener)
+		if isinstance(listener, BatchListener):
+			self._batch_listeners.append(listener)
+		else:
+			self._listeners.append(listener)
 
 	def remove_listener(self, listener):
-		try:
-			self._listeners.remove(listener)
-		except ValueError:
-			pass
+		for listeners in (self._listeners, self._batch_listeners):
+			try:
+				listeners.remove(listener)
+			except ValueError:
+				pass
 
 	def emit_event(self, **kwargs):
 		for sink in self._listeners:
 			sink.submit(**kwargs)
 
+		if self._batch_listeners:
+			# listeners got copies of the event, its fields go into the
+			# envelope's columns
+			kind = kwargs.pop('type')
+			if kind == 'turn_end':
+				# the previous turn is complete, start a new envelope
+				self.flush_events()
+				self._envelope = Envelope(kwargs['turn'])
+			elif self._envelope is None:
+				# events from before the first turn
+				self._envelope = Envelope(None)
+			self._envelope.append(kind, kwargs)
+
+	def flush_events(self):
+		"""
+		Hands the events collected since the last turn_end to all batch
+		listeners.
+		"""
+		envelope, self._envelope = self._envelope, None
+		if envelope is not None:
+			for sink in self._batch_listeners:
+				sink.accept_batch(envelope)
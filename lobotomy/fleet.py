@@ -0,0 +1,90 @@
+# fleets of robots played over a single connection
+
+from threading import Lock
+
+from lobotomy import config, LoBotomyException, protocol
+from lobotomy.player import Player
+
+class FleetPlayer(Player):
+	"""
+	Robot of a fleet. Commands are handed to it by its fleet, messages to the
+	client are tagged with the robot's id and sent along with those of the
+	rest of the fleet. No socket or thread of its own is involved.
+	"""
+
+	def __init__(self, server, fleet, robot):
+		# no socket, the thread is never started
+		super().__init__(server, None)
+
+		self._fleet = fleet
+		self.robot = robot
+		# fleets don't nest, and signals travel with the rest of the fleet
+		del self._handlers['fleet']
+		del self._handlers['udp']
+
+	def send(self, command):
+		self._fleet.queue(self.robot, command)
+
+class Fleet:
+	"""
+	Multiplexed session of a single connection, playing several robots.
+	Every line is tagged with the id of the robot it is meant for or sent
+	by. Messages are queued until the fleet is flushed, sending those of
+	all robots in a single write.
+	"""
+
+	def __init__(self, server, connection):
+		self._server = server
+		self._connection = connection
+		# robots by id, in the order they were first used
+		self.robots = {}
+		# messages queued since the last flush (guarded by the lock, which
+		# also keeps writes from the turn loop and the connection's thread
+		# from interleaving)
+		self._queue = []
+		self._lock = Lock()
+		self._shutdown = False
+
+	def handle(self, parts):
+		"""
+		Hands a command, split into its parts, to the robot its first part
+		tags.
+		"""
+		if len(parts) < 2:
+			raise ValueError('missing robot id or command')
+
+		robot = int(parts[0])
+		if not 0 <= robot < config.host.max_fleet_size:
+			raise LoBotomyException(206)
+
+		player = self.robots.get(robot)
+		if player is None:
+			player = self.robots[robot] = FleetPlayer(self._server, self, robot)
+
+		player.handle_command(parts[1:])
+
+	def queue(self, robot, command):
+		with self._lock:
+			self._queue.append(protocol.format_msg((robot, *command)))
+
+	def flush(self):
+		"""
+		Sends all queued messages in a single write.
+		"""
+		with self._lock:
+			if self._queue:
+				data = b''.join(self._queue)
+				self._queue.clear()
+				self._connection.send_data(data)
+
+	def shutdown(self):
+		"""
+		Removes all robots of the fleet from the game.
+		"""
+		if self._shutdown:
+			return
+
+		self._shutdown = True
+		self._server.unregister_fleet(self)
+		for player in list(self.robots.values()):
+			player.shutdown()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# lobby sending players to the least loaded of several game nodes
+#
+# usage: python3 -m lobotomy.lobby [--port 1452]
+#
+# game nodes started with --lobby host:port report their load to the lobby
+# (from addresses allowed with --nodes), clients joining the lobby are told
+# where to go with a redirect
+
+import argparse
+import logging
+import selectors
+import socket
+import time
+
+from lobotomy import config, LoBotomyException, protocol
+
+class Lobby:
+	"""
+	Service answering joins with a redirect to the game node with the most
+	room left, as reported by the nodes themselves. Only connections from
+	addresses in nodes may report, anyone else could send players anywhere.
+	Nodes that stop reporting for node_timeout seconds are forgotten.
+	Connections are handled by a single thread.
+	"""
+
+	def __init__(self, host = config.host.address, port = config.host.port, node_timeout = config.host.node_timeout, nodes = config.host.lobby_nodes):
+		self.host = host
+		self.port = port
+		self.node_timeout = node_timeout
+		self.allowed = set(address.strip() for address in nodes.split(',') if address.strip())
+		# [players, capacity, deadline] of nodes by (host, port)
+		self.nodes = {}
+		# bytes received from connections that don't form a complete line yet
+		self._buffers = {}
+		# address of connections' peers
+		self._peers = {}
+		self._selector = selectors.DefaultSelector()
+		self._shutdown = False
+
+	def report(self, host, port, players, capacity):
+		if players < 0 or capacity < 1:
+			raise ValueError('invalid load', players, capacity)
+		self.nodes[(host, port)] = [players, capacity, time.monotonic() + self.node_timeout]
+
+	def choose(self):
+		"""
+		Returns the (host, port) of the node with the most room left relative
+		to its capacity, counting a player towards its load until it reports
+		again. Returns None when all nodes are full.
+		"""
+		now = time.monotonic()
+		for node in [node for (node, (_, _, deadline)) in self.nodes.items() if deadline < now]:
+			logging.info('node %s:%d stopped reporting', *node)
+			del self.nodes[node]
+
+		available = [(players / capacity, players, node) for (node, (players, capacity, _)) in self.nodes.items() if 0 <= players < capacity]
+		if not available:
+			return None
+
+		_, _, node = min(available)
+		self.nodes[node][0] += 1
+		return node
+
+	def handle_line(self, connection, line):
+		"""
+		Handles a line received from connection, returning whether to keep the
+		connection open.
+		"""
+		try:
+			parts = line.decode('utf-8').split()
+			if not parts:
+				return True
+
+			values = protocol.PARSERS[parts[0]](*parts[1:])
+			if parts[0] == 'join':
+				node = self.choose()
+				if node is None:
+					raise LoBotomyException(207)
+				logging.info('sending %s to %s:%d', values['name'], *node)
+				self.send(connection, protocol.redirect(*node).values())
+				return False
+			elif parts[0] == 'report':
+				if self._peers.get(connection) not in self.allowed:
+					# as far as strangers are concerned, there's no such thing
+					raise KeyError(parts[0])
+				del values['command']
+				self.report(**values)
+				return True
+			else:
+				raise KeyError(parts[0])
+		except LoBotomyException as e:
+			self.send(connection, protocol.error(e.errno, protocol.ERRORS[e.errno]).values())
+		except KeyError as e:
+			self.send(connection, protocol.error(301, protocol.ERRORS[301] + ': ' + str(e)).values())
+		except ValueError as e:
+			self.send(connection, protocol.error(302, protocol.ERRORS[302] + ': ' + str(e)).values())
+		return False
+
+	def send(self, connection, command):
+		try:
+			# answers are small enough to fit a fresh connection's buffer
+			connection.send(protocol.format_msg(command))
+		except OSError:
+			pass
+
+	def accept(self, ssock):
+		try:
+			connection, address = ssock.accept()
+		except (BlockingIOError, InterruptedError, ConnectionAbortedError):
+			return
+		connection.setblocking(False)
+		self._buffers[connection] = b''
+		self._peers[connection] = address[0]
+		self._selector.register(connection, selectors.EVENT_READ)
+
+	def receive(self, connection):
+		try:
+			data = connection.recv(config.host.recv_size)
+		except (BlockingIOError, InterruptedError):
+			return
+		except OSError:
+			data = b''
+
+		keep = bool(data)
+		*lines, buffer = (self._buffers[connection] + data).split(b'\n')
+		for line in lines:
+			if not self.handle_line(connection, line):
+				keep = False
+				break
+		if len(buffer) > config.host.max_line_length:
+			keep = False
+
+		if keep:
+			self._buffers[connection] = buffer
+		else:
+			self.close(connection)
+
+	def close(self, connection):
+		self._selector.unregister(connection)
+		del self._buffers[connection]
+		del self._peers[connection]
+		try:
+			connection.shutdown(socket.SHUT_RDWR)
+		except OSError:
+			pass
+		connection.close()
+
+	def bind(self):
+		"""
+		Binds the lobby's socket, returning the port it is bound to.
+		"""
+		self._ssock = socket.socket()
+		self._ssock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self._ssock.bind((self.host, self.port))
+		self._ssock.listen(config.host.backlog)
+		self._ssock.setblocking(False)
+		self._selector.register(self._ssock, selectors.EVENT_READ)
+		self.port = self._ssock.getsockname()[1]
+		return self.port
+
+	def serve_forever(self):
+		logging.info('lobby listening on %s:%d', self.host, self.port)
+		while not self._shutdown:
+			for key, _ in self._selector.select(timeout = 0.5):
+				if key.fileobj is self._ssock:
+					self.accept(self._ssock)
+				else:
+					self.receive(key.fileobj)
+
+		for connection in list(self._buffers):
+			self.close(connection)
+		self._selector.close()
+		self._ssock.close()
+
+	def shutdown(self):
+		self._shutdown = True
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Send LoBotomy players to the least loaded of several game nodes')
+	parser.add_argument('--address', default = config.host.address, help = 'network address to bind to')
+	parser.add_argument('--port', type = int, default = config.host.port, help = 'port to listen on')
+	parser.add_argument('--nodes', default = config.host.lobby_nodes, help = 'comma separated addresses game nodes may report from')
+	parser.add_argument('--node-timeout', type = float, default = config.host.node_timeout, help = 'seconds after which nodes that stopped reporting are forgotten')
+	args = parser.parse_args()
+
+	logging.basicConfig(format = '[ %(levelname)8s ] %(message)s', level = logging.INFO)
+	lobby = Lobby(args.address, args.port, args.node_timeout, args.nodes)
+	lobby.bind()
+	try:
+		lobby.serve_forever()
+	except KeyboardInterrupt:
+		logging.info('caught SIGINT, shutting down')
+
+if __name__ == '__main__':
+	main()
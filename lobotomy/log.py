@@ -0,0 +1,107 @@
+# logging off the turn loop: records of actions carry their event and player,
+# are sampled and rate limited by event, and are formatted and written by a
+# background thread
+
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import random
+
+from lobotomy import config, util
+
+# logger for the actions resolved every turn, and the filter deciding which
+# records of actions to log before creating them
+actions = logging.getLogger('lobotomy.actions')
+sampler = None
+
+def action(event, player, message, *arguments):
+	"""
+	Logs message about player's action as a record with event and player
+	attributes, unless the sampler drops it. Arguments are formatted into
+	message only when the record is written, so they should not be mutated
+	afterwards.
+	"""
+	if sampler is not None and not sampler.admit(event):
+		return
+	actions.info(message, *arguments, extra = {'event': event, 'player': player}, stacklevel = 2)
+
+class SamplingFilter(logging.Filter):
+	"""
+	Passes a fraction of the records of every event (as given by samples,
+	passing all records of events not in it), and at most rate records per
+	second per event with bursts of up to burst records. Records without an
+	event always pass. Dropped records are counted by event.
+	"""
+
+	def __init__(self, samples = None, rate = 0.0, burst = 1, seed = None):
+		super().__init__()
+		self.samples = samples or {}
+		self.rate = rate
+		self.burst = burst
+		self.dropped = {}
+		self._buckets = {}
+		self._random = random.Random(seed)
+
+	def filter(self, record):
+		event = getattr(record, 'event', None)
+		return event is None or self.admit(event)
+
+	def admit(self, event):
+		sample = self.samples.get(event, 1.0)
+		if sample < 1.0 and self._random.random() >= sample:
+			passed = False
+		elif self.rate:
+			bucket = self._buckets.get(event)
+			if bucket is None:
+				bucket = self._buckets[event] = util.TokenBucket(self.rate, self.burst)
+			passed = bucket.take()
+		else:
+			passed = True
+
+		if not passed:
+			self.dropped[event] = self.dropped.get(event, 0) + 1
+		return passed
+
+class DeferredQueueHandler(QueueHandler):
+	"""
+	Handler putting records on a queue as they are, leaving the formatting
+	to the thread writing them. Records that don't fit a full queue are
+	dropped and counted.
+	"""
+
+	def __init__(self, records):
+		super().__init__(records)
+		self.dropped = 0
+
+	def prepare(self, record):
+		return record
+
+	def enqueue(self, record):
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
+
+def setup(level = logging.DEBUG, format = '[ %(levelname)8s ] %(message)s', handlers = None):
+	"""
+	Has the root logger log records of level and up through a queue, written
+	to handlers (standard error by default) by a background thread, and
+	applies the sampling and rate limits of config.log to actions. Returns
+	the started QueueListener, stop it to write the records still queued.
+	"""
+	global sampler
+
+	if handlers is None:
+		handler = logging.StreamHandler()
+		handler.setFormatter(logging.Formatter(format))
+		handlers = [handler]
+
+	records = queue.Queue(config.log.queue_size)
+	root = logging.getLogger()
+	root.setLevel(level)
+	root.addHandler(DeferredQueueHandler(records))
+	sampler = SamplingFilter(config.log.samples, config.log.rate, config.log.burst)
+
+	listener = QueueListener(records, *handlers, respect_handler_level = True)
+	listener.start()
+	return listener
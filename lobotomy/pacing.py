@@ -0,0 +1,63 @@
+# adaptive turn durations
+
+import time
+
+class TurnPacer:
+	"""
+	Adapts the duration of turns (in milliseconds, between minimum and
+	maximum) to how long players take to send their actions after a turn
+	begins and to how long resolving a turn takes. A turn lasts long enough
+	for percentile of last turn's actions to arrive, and for resolving a
+	turn, both with some margin. Durations grow right away, but shrink by at
+	most a fraction shrink per turn.
+	"""
+
+	def __init__(self, minimum, maximum, percentile = 0.95, margin = 1.5, shrink = 0.1, clock = time.monotonic):
+		self.minimum = minimum
+		self.maximum = maximum
+		self.percentile = percentile
+		self.margin = margin
+		self.shrink = shrink
+		self._clock = clock
+
+		# start out slow, players have yet to show how fast they are
+		self.duration = maximum
+		# time the current turn began, and the delays of the actions that
+		# arrived since, in seconds
+		self._started = None
+		self._arrivals = []
+
+	def begin(self, resolution):
+		"""
+		Begins a new turn, resolution being the time in seconds it took to
+		resolve the last turn. Returns the duration of the new turn.
+		"""
+		arrivals, self._arrivals = self._arrivals, []
+		if self._started is None:
+			# first turn, nothing measured yet
+			self._started = self._clock()
+			return self.duration
+
+		target = self.minimum
+		if arrivals:
+			arrivals.sort()
+			arrival = arrivals[min(int(len(arrivals) * self.percentile), len(arrivals) - 1)]
+			target = max(target, arrival * 1000 * self.margin)
+		target = max(target, resolution * 1000 * self.margin)
+		target = min(target, self.maximum)
+		if target < self.duration:
+			# speed up gradually, a single quiet turn says little
+			target = max(target, self.duration * (1.0 - self.shrink))
+
+		self.duration = int(round(target))
+		self._started = self._clock()
+		return self.duration
+
+	def arrived(self):
+		"""
+		Records the arrival of an action, called from players' threads.
+		Actions arriving after the turn ended count towards it until the
+		next turn begins.
+		"""
+		if self._started is not None:
+			self._arrivals.append(self._clock() - self._started)
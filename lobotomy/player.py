@@ -1,16 +1,22 @@
 # make sure flake8 ignores this file: flake8: noqa
 
 import logging
+import math
 import socket
-from threading import Thread
+from threading import Lock, Thread
+import time
 
-from lobotomy import config, game, LoBotomyException, protocol
+from lobotomy import config, game, LoBotomyException, protocol, util
+from lobotomy.state import FIRE, MOVE, PlayerTable, SCAN
 from lobotomy.util import enum
 
 
 # enumerate possible player states
 PlayerState = enum('VOID', 'WAITING', 'ACTING', 'DEAD')
 
+# stack size of threads when not set explicitly (glibc's default)
+DEFAULT_STACK_SIZE = 8 * 1024 * 1024
+
 class Player(Thread):
 	"""
 	Class modeling a player, handling messages from and to a client.
@@ -26,29 +32,122 @@ class Player(Thread):
 		self._server = server
 		self._sock = sock
 		self._shutdown = False
+		# time the client last sent anything
+		self.last_seen = time.monotonic()
 
 		self._handlers = {
 			'join': self.handle_join,
+			'fleet': self.handle_fleet,
+			'udp': self.handle_udp,
 			'spawn': self.handle_spawn,
 			'move': self.handle_move,
 			'fire': self.handle_fire,
 			'scan': self.handle_scan,
 		}
 
+		# limit the commands a client can make us handle
+		self._bucket = util.TokenBucket(config.player.command_rate, config.player.command_burst)
+		# action commands received this turn, and whether the client has been
+		# told it's sending too many
+		self._turn_commands = 0
+		self._limited = False
+		# fleet of robots played over this connection, if the client asked for
+		# one
+		self.fleet = None
+		# channel sending our turn signals as datagrams, if the client asked
+		# for them
+		self.datagrams = None
+
 		# Thread will turn this assignment into a str; '' is as meaningless as
 		# we're gonna get it
 		self.name = ''
 		self.state = PlayerState.VOID
-
-		# actions requested by the client
-		self.move_action = None
-		self.fire_action = None
-		self.scan_action = None
-
-		# game state variables
-		self.location = (None, None)
-		self.energy = 0.0
-		self.dead_turns = 0
+		# guards changes of state, made by the turn loop, the thread resolving
+		# turns in pipelined mode and our own thread
+		self._state_lock = Lock()
+
+		# game state variables and actions requested by the client live in the
+		# server's player table, a player being a view on its slot
+		self._table = server.table
+		self.slot = self._table.allocate(self)
+
+	@property
+	def location(self):
+		x = self._table.x[self.slot]
+		# NaN indicates the player is not on the battlefield
+		if x != x:
+			return (None, None)
+		return (x, self._table.y[self.slot])
+
+	@location.setter
+	def location(self, location):
+		x, y = location
+		self._table.x[self.slot] = math.nan if x is None else x
+		self._table.y[self.slot] = math.nan if y is None else y
+
+	@property
+	def energy(self):
+		return self._table.energy[self.slot]
+
+	@energy.setter
+	def energy(self, energy):
+		self._table.energy[self.slot] = energy
+
+	@property
+	def dead_turns(self):
+		return self._table.dead_turns[self.slot]
+
+	@dead_turns.setter
+	def dead_turns(self, dead_turns):
+		self._table.dead_turns[self.slot] = dead_turns
+
+	@property
+	def move_action(self):
+		table, slot = self._table, self.slot
+		if table.actions[slot] & MOVE:
+			return (table.move_angle[slot], table.move_distance[slot])
+		return None
+
+	@move_action.setter
+	def move_action(self, action):
+		table, slot = self._table, self.slot
+		if action is None:
+			table.actions[slot] &= ~MOVE
+		else:
+			table.move_angle[slot], table.move_distance[slot] = action
+			table.actions[slot] |= MOVE
+
+	@property
+	def fire_action(self):
+		table, slot = self._table, self.slot
+		if table.actions[slot] & FIRE:
+			return (table.fire_angle[slot], table.fire_distance[slot], table.fire_radius[slot], table.fire_charge[slot])
+		return None
+
+	@fire_action.setter
+	def fire_action(self, action):
+		table, slot = self._table, self.slot
+		if action is None:
+			table.actions[slot] &= ~FIRE
+		else:
+			table.fire_angle[slot], table.fire_distance[slot], table.fire_radius[slot], table.fire_charge[slot] = action
+			table.actions[slot] |= FIRE
+
+	@property
+	def scan_action(self):
+		table, slot = self._table, self.slot
+		if table.actions[slot] & SCAN:
+			return (table.scan_radius[slot],)
+		return None
+
+	@scan_action.setter
+	def scan_action(self, action):
+		table, slot = self._table, self.slot
+		if action is None:
+			table.actions[slot] &= ~SCAN
+		else:
+			(table.scan_radius[slot],) = action
+			table.actions[slot] |= SCAN
 
 	def serialize(self):
 		"""
@@ -63,68 +162,157 @@ class Player(Thread):
 
 	def run(self):
 		try:
-			# read lines from the socket
-			for line in self._sock.makefile():
+			# reusable buffer of bytes received, holding a remainder that
+			# doesn't form a complete line yet and room for a full read
+			buffer = bytearray(config.host.max_line_length + config.host.recv_size + 1)
+			view = memoryview(buffer)
+			filled = 0
+			while not self._shutdown:
 				try:
-					# split line on whitespace
-					parts = line.split()
-					# first word is the command
-					command = parts[0]
-					# remainder are arguments
-					arguments = parts[1:]
-					# parse arguments into their corresponding values
-					arguments = protocol.PARSERS[command](*arguments)
-					# remove the command, handles have no such argument
-					del arguments['command']
-
-					# reaching this point, arguments have been successfully parsed (not validated)
-
-					# handle command
-					self._handlers[command](**arguments)
-				except LoBotomyException as e:
-					self.send_error(e.errno, str(e))
-				except KeyError as e:
-					self.send_error(301, str(e))
-				except ValueError as e:
-					self.send_error(302, str(e))
+					received = self._sock.recv_into(view[filled:])
+				except socket.timeout:
+					# nothing to read, clients that never join are closed by
+					# the handshake timeout, vanished ones by keepalive
+					continue
+
+				if not received:
+					# client closed the connection
+					self.shutdown()
+					break
+
+				self.last_seen = time.monotonic()
+				# frame all complete lines at once, keeping the remainder for
+				# later
+				lines, filled = protocol.frame_lines(buffer, filled + received)
+				if filled > config.host.max_line_length:
+					self.send_error(304)
+					self.shutdown()
+					break
+
+				for line in lines:
+					self.handle_line(line)
+				if self.fleet is not None:
+					# answer the robots of a fleet in a single write
+					self.fleet.flush()
 		except Exception as e:
 			if not self._shutdown:
 				# error occurred during regular operations
 				logging.error('unexpected network error, client will crash: %s', str(e))
 				self.shutdown()
 
-	def signal_begin(self, turn_number, energy):
-		if self.state is PlayerState.WAITING:
-			self.state = PlayerState.ACTING
+	def handle_line(self, line):
+		# split line on whitespace, leaving the parts as bytes
+		parts = line.split()
+		if not parts:
+			# ignore empty lines
+			return
+
+		if self.fleet is not None:
+			try:
+				# lines are tagged with the robot they're meant for
+				self.fleet.handle(parts)
+			except LoBotomyException as e:
+				self.send_error(e.errno)
+			except ValueError as e:
+				self.send_error(302, str(e))
+		else:
+			self.handle_command(parts)
+
+	def handle_command(self, parts):
+		try:
+			# first word is the command
+			signature = protocol.SIGNATURES.get(parts[0])
+			command = signature[0] if signature is not None else None
+			# drop commands over the limits before doing any work on them
+			if not self.admit(command):
+				return
+			if signature is None:
+				raise KeyError(parts[0].decode('utf-8', 'replace'))
+
+			handler = self._handlers[command]
+			# parse the remainder into arguments straight from the received
+			# bytes (not validated)
+			arguments = protocol.parse_arguments(signature[1], parts[1:])
+
+			# handle command
+			handler(*arguments)
+		except LoBotomyException as e:
+			self.send_error(e.errno, str(e))
+		except KeyError as e:
+			self.send_error(301, str(e))
+		except ValueError as e:
+			self.send_error(302, str(e))
+
+	def memory_usage(self):
+		"""
+		Estimates the memory in bytes held for this player's session: its
+		thread's stack, its receive buffer and the socket's buffers.
+		"""
+		usage = config.host.thread_stack_size or DEFAULT_STACK_SIZE
+		# receive buffer
+		usage += config.host.max_line_length + config.host.recv_size + 1
+		try:
+			usage += self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+			usage += self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+		except OSError:
+			# socket was closed already
+			pass
+		return usage
+
+	def admit(self, command):
+		"""
+		Checks whether command is to be handled, limiting the rate of commands
+		and the number of action commands per turn. Dropping commands is
+		reported to the client once per turn.
+		"""
+		if command in ('move', 'fire', 'scan'):
+			self._turn_commands += 1
+			admitted = self._turn_commands <= config.player.turn_commands and self._bucket.take()
+		else:
+			admitted = self._bucket.take()
+
+		if not admitted and not self._limited:
+			self._limited = True
+			self.send_error(303)
+
+		return admitted
+
+	def signal_begin(self, turn_number, energy, duration):
+		with self._state_lock:
+			# a death signaled meanwhile sticks
+			if self.state is PlayerState.WAITING:
+				self.state = PlayerState.ACTING
+
+		# reset command limits for the new turn
+		self._turn_commands = 0
+		self._limited = False
 
 		# reset action requests
-		self.move_action = None
-		self.fire_action = None
-		self.scan_action = None
+		self._table.clear_actions(self.slot)
 
-		self.send(protocol.begin(turn_number, energy).values())
+		self.send_signal(protocol.begin(turn_number, energy, duration).values())
 
 	def signal_end(self):
-		if self.state is not PlayerState.DEAD:
-			self.state = PlayerState.WAITING
-		self.send(protocol.end().values())
+		with self._state_lock:
+			if self.state is not PlayerState.DEAD:
+				self.state = PlayerState.WAITING
+		self.send_signal(protocol.end().values())
 
 	def signal_hit(self, name, angle, charge):
-		self.send(protocol.hit(name, angle, charge).values())
+		self.send_signal(protocol.hit(name, angle, charge).values())
 
 	def signal_death(self, turns):
-		self.state = PlayerState.DEAD
-		self.dead_turns = turns
+		with self._state_lock:
+			self.state = PlayerState.DEAD
+			self.dead_turns = turns
 
 		# reset action requests for remainder of turn
-		self.move_action = None
-		self.fire_action = None
-		self.scan_action = None
+		self._table.clear_actions(self.slot)
 
 		self.send(protocol.death(turns).values())
 
 	def signal_detect(self, name, angle, distance, energy):
-		self.send(protocol.detect(name, angle, distance, energy).values())
+		self.send_signal(protocol.detect(name, angle, distance, energy).values())
 
 	def handle_join(self, name):
 		if self.state is not PlayerState.VOID:
@@ -139,15 +327,33 @@ class Player(Thread):
 		except LoBotomyException as e:
 			self.send_error(e.errno)
 
-	def handle_spawn(self):
-		if self.state is not PlayerState.DEAD:
+	def handle_fleet(self):
+		if self.state is not PlayerState.VOID or self.fleet is not None:
 			raise LoBotomyException(202)
 
-		try:
-			self._server.request_spawn(self)
-			self.state = PlayerState.WAITING
-		except LoBotomyException as e:
-			self.send_error(e.errno)
+		# robots of the fleet join by themselves, this connection never does
+		self.fleet = self._server.register_fleet(self)
+
+	def handle_udp(self, port):
+		if self.state is PlayerState.VOID or self.datagrams is not None:
+			raise LoBotomyException(202)
+		if not 0 < port < 65536:
+			raise ValueError('port out of range', port)
+
+		# datagrams go to the address the client connected from
+		self.datagrams = self._server.register_datagrams(self, (self._sock.getpeername()[0], port))
+		self.send(protocol.udp(self.datagrams.port).values())
+
+	def handle_spawn(self):
+		with self._state_lock:
+			if self.state is not PlayerState.DEAD:
+				raise LoBotomyException(202)
+
+			try:
+				self._server.request_spawn(self)
+				self.state = PlayerState.WAITING
+			except LoBotomyException as e:
+				self.send_error(e.errno)
 
 	def handle_move(self, angle, distance):
 		# check state
@@ -158,7 +364,7 @@ class Player(Thread):
 		if game.move_cost(distance) > config.player.max_energy:
 			raise LoBotomyException(101)
 
-		self.move_action = (angle, distance)
+		self._server.request_action(self, MOVE, (angle, distance))
 
 	def handle_fire(self, angle, distance, radius, charge):
 		# check state
@@ -169,7 +375,7 @@ class Player(Thread):
 		if game.fire_cost(distance, radius, charge) > config.player.max_energy:
 			raise LoBotomyException(102)
 
-		self.fire_action = (angle, distance, radius, charge)
+		self._server.request_action(self, FIRE, (angle, distance, radius, charge))
 
 	def handle_scan(self, radius):
 		# check state
@@ -180,7 +386,7 @@ class Player(Thread):
 		if game.scan_cost(radius) > config.player.max_energy:
 			raise LoBotomyException(103)
 
-		self.scan_action = (radius,)
+		self._server.request_action(self, SCAN, (radius,))
 
 	def send_error(self, error, message = ''):
 		logging.debug('client caused error %d', error)
@@ -192,8 +398,19 @@ class Player(Thread):
 
 	def send(self, command):
 		# send all data as strings separated by spaces, terminated by a newline
+		self.send_data(protocol.format_msg(command))
+
+	def send_signal(self, command):
+		# turn signals go out as datagrams if the client asked for them, all
+		# else sticks to the connection
+		if self.datagrams is not None:
+			self.datagrams.queue(self, command)
+		else:
+			self.send(command)
+
+	def send_data(self, data):
 		try:
-			self._sock.sendall(bytes(' '.join(map(str, command)) + '\n', 'utf-8'))
+			self._sock.sendall(data)
 		except Exception as e:
 			logging.error('unexpected network error, client will crash: %s', str(e))
 			self.shutdown()
@@ -215,7 +432,17 @@ class Player(Thread):
 			# ignore at this point
 			pass
 
-		# unregister ourselves from the server if we were registered
-		# TODO: find better way of determining this
-		if not self.name.startswith('Thread-'):
-			self._server.unregister(self.name, self)
+		# unregister ourselves from the server, leaving the game
+		self._server.unregister(self.name, self)
+		if self.fleet is not None:
+			# ...along with all robots of our fleet
+			self.fleet.shutdown()
+
+	def detach(self):
+		"""
+		Detaches this player from the server's player table, after its slot
+		was released. The player keeps a private table in case signals are
+		still underway.
+		"""
+		self._table = PlayerTable()
+		self.slot = self._table.allocate(self)
@@ -3,7 +3,7 @@
 from collections import OrderedDict
 
 # current protocol version
-VERSION = 0
+VERSION = 1
 
 # predefine error codes
 # TODO: store error codes in constants
@@ -15,13 +15,26 @@ ERRORS = {
 
 	201: 'name taken, choose another one',
 	202: 'invalid state for command',
+	203: 'too many connections, try again later',
+	204: 'took too long to join',
+	206: 'robot id out of range, fleet too large',
+	207: 'no room in any game, try again later',
+	208: 'datagrams not available',
 
 	301: 'unrecognized or unsupported command',
 	302: 'invalid command',
+	303: 'too many commands, commands are being dropped',
+	304: 'line too long',
 }
 
 # store message parsers by their command string
 PARSERS = {}
+# store the name and argument converters of commands by their command as
+# received, converting the bytes of an argument straight to its value
+SIGNATURES = {}
+
+def decode(argument):
+	return argument.decode('utf-8')
 
 def command(name, *types):
 	"""
@@ -45,6 +58,7 @@ def command(name, *types):
 
 	# map the handler's name to its parser
 	PARSERS[name] = parser
+	SIGNATURES[name.encode('utf-8')] = (name, tuple(decode if arg_type is str else arg_type for (_, arg_type) in types))
 
 	return parser
 
@@ -52,6 +66,13 @@ def command(name, *types):
 join = command('join',
 	('name', str))
 
+# fleet command, format: fleet
+fleet = command('fleet')
+
+# udp command, format: udp <port>
+udp = command('udp',
+	('port', int))
+
 # welcome command, format: welcome <version> <energy> <charge> <turn_duration> <turns_left>
 welcome = command('welcome',
 	('version', int),
@@ -61,13 +82,28 @@ welcome = command('welcome',
 	('turns_left', int)
 )
 
+# redirect command, format: redirect <host> <port>
+redirect = command('redirect',
+	('host', str),
+	('port', int)
+)
+
+# report command, format: report <host> <port> <players> <capacity>
+report = command('report',
+	('host', str),
+	('port', int),
+	('players', int),
+	('capacity', int)
+)
+
 # spawn command, format: spawn
 spawn = command('spawn')
 
-# begin command, format: begin <turn_number> <energy>
+# begin command, format: begin <turn_number> <energy> <duration>
 begin = command('begin',
 	('turn_number', int),
-	('energy', float)
+	('energy', float),
+	('duration', int)
 )
 
 # move command, format: move <angle> <distance>
@@ -128,3 +164,40 @@ def parse_msg(msg):
 	chunks = msg.split()
 	return PARSERS[chunks[0]](*chunks[1:])
 
+def frame_lines(buffer, filled):
+	"""
+	Splits all complete lines off the first filled bytes of buffer (a
+	bytearray), moving the remainder that doesn't form a complete line yet
+	to its start. Returns the lines, as bytes without their newlines, and the
+	length of the remainder.
+	"""
+	end = buffer.rfind(b'\n', 0, filled)
+	if end < 0:
+		return (), filled
+
+	with memoryview(buffer) as view:
+		lines = bytes(view[:end]).split(b'\n')
+		view[:filled - end - 1] = view[end + 1:filled]
+	return lines, filled - end - 1
+
+def parse_arguments(converters, arguments):
+	"""
+	Parses the arguments of a command as received, a bytes object per
+	argument, into a list of values using converters (see SIGNATURES).
+	Numbers are parsed straight from the bytes, without decoding them first.
+	"""
+	if len(arguments) < len(converters):
+		raise ValueError('invalid number of arguments', len(converters), len(arguments))
+
+	try:
+		return [convert(argument) for (convert, argument) in zip(converters, arguments)]
+	except ValueError as e:
+		raise ValueError('malformed argument', str(e))
+
+def format_msg(values):
+	"""
+	Formatter helper function, the inverse of parse_msg. Provide this with the
+	values of a protocol message (including the message name) and it will
+	return the bytes to send over the socket, terminated by a newline.
+	"""
+	return bytes(' '.join(map(str, values)) + '\n', 'utf-8')
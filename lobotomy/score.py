@@ -0,0 +1,214 @@
+# scoring of players, ranked as scores change
+
+import math
+import random
+
+from lobotomy.event import BatchListener
+
+class RankedList:
+	"""
+	Sorted list of keys, implemented as a skip list keeping the number of
+	keys its links skip. Inserting, removing, looking up keys by index and
+	finding the index of a key take O(log n) time (expected).
+	"""
+
+	# maximum number of levels, plenty for millions of keys
+	MAX_LEVEL = 24
+
+	class Node:
+		__slots__ = ('key', 'next', 'width')
+
+		def __init__(self, key, level):
+			self.key = key
+			self.next = [None] * level
+			# number of keys skipped by following next on a level, plus one
+			self.width = [1] * level
+
+	def __init__(self, seed = None):
+		self._head = self.Node(None, self.MAX_LEVEL)
+		self._size = 0
+		self._random = random.Random(seed)
+
+	def __len__(self):
+		return self._size
+
+	def __iter__(self):
+		node = self._head.next[0]
+		while node is not None:
+			yield node.key
+			node = node.next[0]
+
+	def _chain(self, key):
+		"""
+		Returns the last node before key on every level, and the index of
+		those nodes (the head being at -1).
+		"""
+		chain = [None] * self.MAX_LEVEL
+		indices = [0] * self.MAX_LEVEL
+		node = self._head
+		index = -1
+		for level in reversed(range(self.MAX_LEVEL)):
+			while node.next[level] is not None and node.next[level].key < key:
+				index += node.width[level]
+				node = node.next[level]
+			chain[level] = node
+			indices[level] = index
+		return chain, indices
+
+	def insert(self, key):
+		chain, indices = self._chain(key)
+		# pick a level for the new node, each level half as likely as the last
+		level = min(self.MAX_LEVEL, 1 - int(math.log(1.0 - self._random.random(), 2)))
+		node = self.Node(key, level)
+		index = indices[0] + 1
+		for l in range(level):
+			prev = chain[l]
+			node.next[l] = prev.next[l]
+			prev.next[l] = node
+			# split the width of the link the node was put in
+			node.width[l] = prev.width[l] - (index - indices[l]) + 1
+			prev.width[l] = index - indices[l]
+		for l in range(level, self.MAX_LEVEL):
+			# links over the new node skip one more key
+			chain[l].width[l] += 1
+		self._size += 1
+
+	def remove(self, key):
+		chain, _ = self._chain(key)
+		node = chain[0].next[0]
+		if node is None or node.key != key:
+			raise KeyError(key)
+
+		for l in range(len(node.next)):
+			prev = chain[l]
+			prev.width[l] += node.width[l] - 1
+			prev.next[l] = node.next[l]
+		for l in range(len(node.next), self.MAX_LEVEL):
+			chain[l].width[l] -= 1
+		self._size -= 1
+
+	def index(self, key):
+		"""
+		Returns the number of keys smaller than key (the index of key, if
+		present).
+		"""
+		_, indices = self._chain(key)
+		return indices[0] + 1
+
+	def __getitem__(self, index):
+		if index < 0:
+			index += self._size
+		if not 0 <= index < self._size:
+			raise IndexError(index)
+
+		node = self._head
+		# distance to the node at index, counting from the head
+		remaining = index + 1
+		for level in reversed(range(self.MAX_LEVEL)):
+			while node.next[level] is not None and node.width[level] <= remaining:
+				remaining -= node.width[level]
+				node = node.next[level]
+		return node.key
+
+	def range(self, start, stop):
+		"""
+		Returns the keys at indices start up to stop.
+		"""
+		start, stop = max(start, 0), min(stop, self._size)
+		if start >= stop:
+			return []
+
+		node = self._head
+		remaining = start + 1
+		for level in reversed(range(self.MAX_LEVEL)):
+			while node.next[level] is not None and node.width[level] <= remaining:
+				remaining -= node.width[level]
+				node = node.next[level]
+
+		keys = []
+		while len(keys) < stop - start:
+			keys.append(node.key)
+			node = node.next[0]
+		return keys
+
+class Scoreboard(BatchListener):
+	"""
+	Keeps score of players by name, from the events of a server, a turn at a
+	time (scores of a turn count once the next one ends). A player scores a
+	point for every other player it hit in the turn that player died (from
+	the hit or otherwise). Players are ranked by score, highest first, names
+	breaking ties.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		# [score, kills, deaths] by name
+		self.scores = {}
+		# (-score, name) for every player
+		self._ranking = RankedList()
+
+	def accept_batch(self, envelope):
+		for name in envelope.columns('player_spawn', 'player')[0]:
+			self.entry(name)
+
+		# attackers of players hit in the turn (dicts used as ordered sets)
+		hits = {}
+		dead = []
+		for name, attacker, fatal in zip(*envelope.columns('player_hit', 'player', 'attacker', 'fatal')):
+			hits.setdefault(name, {})[attacker] = None
+			if fatal:
+				dead.append(name)
+		for kind in ('player_move', 'player_fire', 'player_scan'):
+			for name, energy in zip(*envelope.columns(kind, 'player', 'energy')):
+				if energy[1] <= 0.0:
+					# died from exhaustion
+					dead.append(name)
+
+		for name in dead:
+			self.entry(name)[2] += 1
+			for attacker in hits.pop(name, ()):
+				if attacker != name:
+					self.add(attacker, 1)
+
+	def entry(self, name):
+		"""
+		Returns the [score, kills, deaths] of name, adding name to the
+		scoreboard if needed.
+		"""
+		entry = self.scores.get(name)
+		if entry is None:
+			entry = self.scores[name] = [0, 0, 0]
+			self._ranking.insert((0, name))
+		return entry
+
+	def add(self, name, points):
+		entry = self.entry(name)
+		self._ranking.remove((-entry[0], name))
+		entry[0] += points
+		entry[1] += 1
+		self._ranking.insert((-entry[0], name))
+
+	def score(self, name):
+		return self.scores[name][0]
+
+	def rank(self, name):
+		"""
+		Returns the rank of name, 1 being the best. Players with equal scores
+		share a rank.
+		"""
+		# count players with a higher score
+		return self._ranking.index((-self.scores[name][0], '')) + 1
+
+	def top(self, count):
+		"""
+		Returns (name, score) of the count best players.
+		"""
+		return [(name, -score) for (score, name) in self._ranking.range(0, count)]
+
+	def around(self, name, count):
+		"""
+		Returns (name, score) of name and up to count players ranked directly
+		above and below name.
+		"""
+		index = self._ranking.index((-self.scores[name][0], name))
+		return [(other, -score) for (score, other) in self._ranking.range(index - count, index + count + 1)]
@@ -3,21 +3,40 @@
 import pdb
 import logging
 import random
+import selectors
 import socket
-from threading import Thread
+from threading import Lock, Thread
 import time
 import cmd
+from collections import deque, namedtuple
 
-from lobotomy import manual_control, config, game, LoBotomyException, protocol, util
+from lobotomy import manual_control, config, game, LoBotomyException, log, protocol, util
+from lobotomy.analytics import ColumnarExport
+from lobotomy.datagram import DatagramChannel
+from lobotomy.bot import BotPlayer, fillers
 from lobotomy.event import Emitter
+from lobotomy.fleet import Fleet
+from lobotomy.pacing import TurnPacer
 from lobotomy.player import Player, PlayerState
+from lobotomy.score import Scoreboard
+from lobotomy.spatial import CellGrid, cell_size, join
+from lobotomy.state import FIRE, MOVE, PlayerTable, SCAN
+from lobotomy.util import enum
+from lobotomy.world_view import WorldPublisher
+
+# enumerate commands players queue for the turn loop
+Command = enum('SPAWN', 'LEAVE', 'ACTION')
+
+# immutable snapshot of a turn's requested actions, as tuples of (player,
+# action) pairs
+TurnBatch = namedtuple('TurnBatch', ('turn_number', 'moves', 'fires', 'scans', 'debug_hosts'))
 
 class LoBotomyServer(Emitter):
 	"""
 	Server for a LoBotomy game.
 	"""
 
-	def __init__(self, field_dimensions = config.game.field_dimensions, host = config.host.address, port = config.host.port):
+	def __init__(self, field_dimensions = config.game.field_dimensions, host = config.host.address, port = config.host.port, seed = None):
 		super().__init__()
 		# create battlefield
 		self.width, self.height = field_dimensions
@@ -25,30 +44,248 @@ class LoBotomyServer(Emitter):
 		self.host = host
 		self.port = port
 
+		# game state of all players
+		self.table = PlayerTable()
+		# scores of all players that ever played, by name
+		self.scoreboard = Scoreboard()
+		self.add_listener(self.scoreboard)
+		# per-turn analytics of all players, if requested
+		self.analytics = None
+		if config.log.analytics:
+			self.analytics = ColumnarExport(config.log.analytics, config.log.analytics_turns)
+			self.add_listener(self.analytics)
+
 		# track online players by name
 		self._players = {}
-		# track players in game
-		self._in_game = []
+		# track players in game, and the alive players among them (dicts used
+		# as ordered sets, iterating in the order players were added)
+		self._in_game = {}
+		self._alive = {}
+		# track players that requested actions this turn, by action
+		self._pending = {MOVE: {}, FIRE: {}, SCAN: {}}
+		# commands queued by player threads, applied by the turn loop
+		self._commands = deque()
+		# timer wheel of dead players, by the turn their wait to respawn ends
+		self._respawns = {}
+		# track online players under manual control in debug mode
+		self._debug_hosts = {}
 
 		self.turn_number = 0
+		# duration of the current turn in ms, adapted to the players and the
+		# load in adaptive mode
+		self.turn_duration = config.game.turn_duration
+		self.pacer = None
+		if config.game.adaptive_turns and not config.host.debug:
+			self.pacer = TurnPacer(min(config.game.min_turn_duration, config.game.turn_duration), config.game.turn_duration)
+		# turn being resolved, lagging behind in pipelined mode
+		self.resolution_turn = 0
+		# resolve turns on a worker thread while collecting the next turn
+		# (makes no sense when pausing between turns)
+		self.pipelined = config.game.pipelined and not config.host.debug
+		self._worker = None
+		# time spent in the phases of the last turn, in seconds
+		self.turn_timings = {}
+
+		# answer the area queries of fires and scans from a grid built once
+		# per turn, rather than checking all players for every query
+		self.neighbor_lists = config.game.neighbor_lists
+		self._grid = None
+		# work done answering the area queries of the last turn
+		self.neighbor_stats = {}
+		# shared memory view of the world, published after every turn
+		self.world_view = None
+		# channel sending turn signals as datagrams to clients asking for them
+		self.datagrams = None
+
+		# source of randomness for spawn locations and signal order, seed it
+		# for reproducible games
+		self.random = random.Random(seed)
+
+		# connected clients by address, the address of connected players and
+		# the time by which players that have yet to join should have joined
+		# (guarded by a lock, updated from both the socket loop and player
+		# threads)
+		self._hosts = {}
+		self._connected = {}
+		self._handshakes = {}
+		self._connection_lock = Lock()
+		# fleets of robots played over a single connection (dict used as an
+		# ordered set)
+		self._fleets = {}
+		# number of clients disconnected for failing to join in time, and the
+		# memory reclaimed doing so
+		self.expired = {'clients': 0, 'bytes': 0}
+
+		self._shutdown = False
 
 	def socket_listen(self):
 		# make the socket listen for new connections
-		self._ssock.listen(5)
+		self._ssock.listen(config.host.backlog)
+		self._ssock.setblocking(False)
+		selector = selectors.DefaultSelector()
+		selector.register(self._ssock, selectors.EVENT_READ)
 
 		# loop as long as a shutdown was not requested
 		while not self._shutdown:
 			try:
-				# accept a connection from a client
-				client, address = self._ssock.accept()
-				logging.info('client from %s connected', address[0])
-				Player(self, client).start()
+				# wait for connections, waking up regularly to drop clients
+				# that take too long to join
+				if selector.select(timeout = 0.5):
+					self.accept_pending()
+				self.expire_handshakes()
 			except Exception as e:
 				if not self._shutdown:
 					# not an expected exception
 					logging.critical('unexpected network error, shutting down server: %s', str(e))
 					self.shutdown()
 
+		selector.close()
+
+	def accept_pending(self):
+		"""
+		Accepts all connections currently waiting to be accepted.
+		"""
+		while True:
+			try:
+				client, address = self._ssock.accept()
+			except (BlockingIOError, InterruptedError):
+				return
+			except ConnectionAbortedError:
+				# client gave up before being accepted
+				continue
+
+			self.configure(client)
+			self.admit(client, address[0])
+
+	def configure(self, client):
+		"""
+		Applies the per-connection policies to client's socket.
+		"""
+		# bound the time the turn loop can block sending to a client (which
+		# also makes the socket blocking, whatever it inherited)
+		client.settimeout(config.host.send_timeout)
+		client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, config.host.socket_buffer)
+		client.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, config.host.socket_buffer)
+		if config.host.keepalive and client.family in (socket.AF_INET, socket.AF_INET6):
+			client.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+			# probe after 30 seconds of silence, giving up after 4 probes (on
+			# platforms that allow tuning keepalive)
+			for option, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 4)):
+				if hasattr(socket, option):
+					client.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+	def admit(self, client, host):
+		"""
+		Starts a player for client connecting from host, unless that would
+		exceed any of the connection limits. Returns the player or None.
+		"""
+		with self._connection_lock:
+			if len(self._connected) >= config.host.max_connections:
+				refusal = 'server is full'
+			elif self._hosts.get(host, 0) >= config.host.max_host_connections:
+				refusal = 'too many connections from {}'.format(host)
+			elif len(self._handshakes) >= config.host.max_handshakes:
+				refusal = 'too many clients joining'
+			else:
+				refusal = None
+				player = Player(self, client)
+				self._hosts[host] = self._hosts.get(host, 0) + 1
+				self._connected[player] = host
+				self._handshakes[player] = time.monotonic() + config.host.handshake_timeout
+
+		if refusal:
+			logging.info('refused client from %s: %s', host, refusal)
+			try:
+				# the client is new, a single message fits its send buffer
+				client.send(protocol.format_msg(protocol.error(203, protocol.ERRORS[203]).values()))
+				# discard what the client sent already, closing a socket with
+				# unread data resets the connection, losing the error message
+				client.setblocking(False)
+				while client.recv(4096):
+					pass
+			except OSError:
+				pass
+			client.close()
+			return None
+
+		logging.info('client from %s connected', host)
+		# client threads barely use the stack, don't have them reserve the
+		# default
+		util.start_thread(player, config.host.thread_stack_size)
+		return player
+
+	def expire_handshakes(self):
+		"""
+		Disconnects players that failed to join in time. Returns the number of
+		connections closed and the (estimated) memory reclaimed in bytes.
+		"""
+		now = time.monotonic()
+		with self._connection_lock:
+			# deadlines only increase, the expired players are at the front
+			expired = []
+			for player, deadline in self._handshakes.items():
+				if deadline > now:
+					break
+				expired.append(player)
+			for player in expired:
+				del self._handshakes[player]
+
+		reclaimed = 0
+		for player in expired:
+			logging.info('client took too long to join, disconnecting')
+			reclaimed += player.memory_usage()
+			player.send_error(204)
+			player.shutdown()
+
+		if expired:
+			self.expired['clients'] += len(expired)
+			self.expired['bytes'] += reclaimed
+			logging.info('disconnected %d clients, reclaiming about %d KiB (%d KiB in total)', len(expired), reclaimed // 1024, self.expired['bytes'] // 1024)
+		return (len(expired), reclaimed)
+
+	def load_report(self):
+		"""
+		Returns the report of our load for a lobby.
+		"""
+		with self._connection_lock:
+			players = len(self._connected)
+		return protocol.report(config.host.advertise or socket.gethostname(), self.port, players, config.host.max_connections)
+
+	def report_forever(self):
+		"""
+		Reports our load to the lobby regularly, reconnecting when the
+		connection drops.
+		"""
+		host, _, port = config.host.lobby.rpartition(':')
+		lobby = None
+		while not self._shutdown:
+			try:
+				if lobby is None:
+					lobby = socket.create_connection((host, int(port)), timeout = config.host.send_timeout)
+					logging.info('reporting to lobby at %s', config.host.lobby)
+				lobby.sendall(protocol.format_msg(self.load_report().values()))
+			except OSError as e:
+				logging.warning('failed to report to lobby at %s: %s', config.host.lobby, str(e))
+				if lobby is not None:
+					lobby.close()
+					lobby = None
+			time.sleep(config.host.report_interval)
+
+		if lobby is not None:
+			lobby.close()
+
+	def release_connection(self, player):
+		"""
+		Releases the connection of player towards the connection limits.
+		"""
+		with self._connection_lock:
+			self._handshakes.pop(player, None)
+			host = self._connected.pop(player, None)
+			if host is not None:
+				self._hosts[host] -= 1
+				if not self._hosts[host]:
+					del self._hosts[host]
+
 	def serve_forever(self):
 		logging.debug('preparing network setup for serving at "%s:%d"', self.host, self.port)
 		self._ssock = socket.socket()
@@ -63,9 +300,35 @@ class LoBotomyServer(Emitter):
 			service_thread.daemon = True
 			service_thread.start()
 
+			if config.host.udp:
+				self.datagrams = DatagramChannel(self.host, config.host.udp_port or self.port, config.host.udp_loss)
+				logging.info('sending turn signals as datagrams from port %d', self.datagrams.port)
+
+			if config.host.world_view:
+				self.world_view = WorldPublisher(config.host.world_view, config.host.world_view_capacity)
+				logging.info('publishing the world in shared memory as %s', self.world_view.name)
+
+			if config.host.lobby:
+				report_thread = Thread(name = 'lobby reports', target = self.report_forever)
+				report_thread.daemon = True
+				report_thread.start()
+
+			for name, filler in fillers(config.game.bots, seed = self.random.random()):
+				self.add_bot(filler, name)
+
 			# start a game
 			self.run_game()
 
+			# include the last turn's events
+			self.wait_resolution()
+			self.flush_events()
+			if self.analytics is not None:
+				self.analytics.close()
+			if self.world_view is not None:
+				self.world_view.close()
+			if self.datagrams is not None:
+				self.datagrams.close()
+
 		except Exception as e:
 			logging.critical('unexpected error: %s', str(e))
 
@@ -74,27 +337,7 @@ class LoBotomyServer(Emitter):
 	def run_game(self):
 		logging.info('main game loop started')
 		while not self._shutdown:
-			# increment internal turn counter
-			self.turn_number += 1
-
-			# FIXME: iterating over ALL the players time and time again must be slow
-
-			# send all alive players a new turn command
-			logging.info('turn {}, currently {} players in game'.format(self.turn_number, len(self._in_game)))
-			for player in self._in_game:
-				if player.state is not PlayerState.DEAD:
-					prev_energy = player.energy
-					player.energy = min(player.energy + config.player.turn_heal, 1.0)
-					# emit heal event with energy mutation
-					self.emit_event(
-						type = 'player_heal',
-						player = player.name,
-						energy = (prev_energy, player.energy)
-					)
-				player.signal_begin(self.turn_number, player.energy)
-
-			# emit turn start event
-			self.emit_event(type = 'turn_start', turn = self.turn_number, num_players = len(self._in_game))
+			self.begin_turn()
 
 			# wait the configured amount of time for players to submit commands
 			if config.host.debug:
@@ -102,57 +345,222 @@ class LoBotomyServer(Emitter):
 				if 'pdb' in ans:
 					pdb.Pdb(nosigint=True).set_trace()
 			else:
-				time.sleep(config.game.turn_duration / 1000)
+				time.sleep(self.turn_duration / 1000)
 
-			# send all players the end turn command
-			for player in self._in_game:
-				player.signal_end()
+			self.end_turn()
 
-			# emit turn end event
-			self.emit_event(type = 'turn_end', turn = self.turn_number)
+	def begin_turn(self):
+		"""
+		Starts a new turn, healing all alive players and sending all players
+		in game a new turn command. In pipelined mode, players are healed when
+		the previous turn has been resolved instead.
+		"""
+		# increment internal turn counter
+		self.turn_number += 1
 
-			# decrement wait counters for dead players
-			for player in [p for p in self._players.values() if p.state is PlayerState.DEAD]:
-				player.dead_turns -= 1
-				self.emit_event(
-					type = 'player_dead_turns_decrement',
-					player = player.name,
-					turns = player.dead_turns
-				)
+		logging.info('turn %d, currently %d players in game', self.turn_number, len(self._in_game))
+		if not self.pipelined:
+			self.heal_players()
 
-			debug_hosts = [p for p in self._in_game if p.name in config.host.debug_names]
+		# forget about last turn's actions
+		for pending in self._pending.values():
+			pending.clear()
 
-			signal_cache = []
+		if self.pacer is not None:
+			# pace the turn after the last one (its phases in pipelined mode
+			# being those of the turn before)
+			self.turn_duration = self.pacer.begin(sum(self.turn_timings.values()))
 
-			# execute all requested move actions
-			signal_cache.extend(self.execute_moves(player for player in self._in_game if player.move_action is not None))
+		# send all players a new turn command
+		energy = self.table.energy
+		for player in self._in_game:
+			player.signal_begin(self.turn_number, energy[player.slot], self.turn_duration)
+		self.flush_signals(self.turn_number)
 
-			# execute all requested fire actions
-			signal_cache.extend(self.execute_fires(player for player in self._in_game if player.fire_action is not None))
+		# emit turn start event
+		self.emit_event(type = 'turn_start', turn = self.turn_number, num_players = len(self._in_game), duration = self.turn_duration)
 
-			# execute all requested scan actions
-			signal_cache.extend(self.execute_scans(player for player in self._in_game if player.scan_action is not None))
+	def heal_players(self):
+		"""
+		Heals all alive players at once.
+		"""
+		table = self.table
+		for slot, prev_energy, energy in table.heal([player.slot for player in self._alive], config.player.turn_heal, 1.0):
+			# emit heal event with energy mutation
+			self.emit_event(
+				type = 'player_heal',
+				player = table.owners[slot].name,
+				energy = (prev_energy, energy)
+			)
 
-			# execute all actions as determined by server admin, for
-			# debug_hosts
-			signal_cache.extend(self.handle_manually(debug_hosts))
-			# shuffle the signals for fairness
-			random.shuffle(signal_cache)
-			for s in signal_cache:
-				# first item is the function to call, the rest of the items are
-				# the arguments
-				s[0](*s[1:])
+	def end_turn(self):
+		"""
+		Ends the current turn, executing all requested actions and sending the
+		resulting signals to the players involved. In pipelined mode, actions
+		are executed on a worker thread while the next turn is collected; its
+		signals are guaranteed to be sent before the next turn ends.
+		"""
+		# wait for the previous turn's signals to go out
+		self.wait_resolution()
+
+		batch = self.close_turn()
+		if self.pipelined:
+			self._worker = Thread(name = 'turn {}'.format(batch.turn_number), target = self.resolve_turn, args = (batch,))
+			self._worker.daemon = True
+			# leave the worker the default stack, sharing the turn loop's work
+			util.start_thread(self._worker)
+		else:
+			self.resolve_turn(batch)
+
+	def wait_resolution(self):
+		"""
+		Waits for a turn being resolved in pipelined mode to finish.
+		"""
+		if self._worker is not None:
+			self._worker.join()
+			self._worker = None
 
-	def find_players(self, bounds):
+	def close_turn(self):
 		"""
-		TODO: document me
+		Sends all players the end turn command and captures the actions
+		requested in the current turn as an immutable TurnBatch.
 		"""
-		def in_bounds(player):
-			p_x, p_y = player.location
-			x1, y1, x2, y2 = bounds
-			return p_x is not None and x1 <= p_x < x2 and y1 <= p_y < y2
+		timer = time.perf_counter
+		start = timer()
 
-		return set(player for player in self._in_game if in_bounds(player))
+		# send all players the end turn command
+		for player in self._in_game:
+			player.signal_end()
+		self.flush_signals(self.turn_number)
+
+		# players can no longer act, apply everything they requested
+		self.apply_commands()
+
+		# emit turn end event
+		self.emit_event(type = 'turn_end', turn = self.turn_number)
+
+		# allow dead players whose wait is over to respawn
+		for player in self._respawns.pop(self.turn_number, ()):
+			if player in self._in_game:
+				player.dead_turns = 0
+				self.emit_event(
+					type = 'player_respawn_ready',
+					player = player.name
+				)
+
+		# snapshot the actions of players still acting
+		table = self.table
+		actions = table.actions
+		alive = self._alive
+		batch = TurnBatch(
+			self.turn_number,
+			tuple((player, player.move_action) for player in self._pending[MOVE] if player in alive and actions[player.slot] & MOVE),
+			tuple((player, player.fire_action) for player in self._pending[FIRE] if player in alive and actions[player.slot] & FIRE),
+			tuple((player, player.scan_action) for player in self._pending[SCAN] if player in alive and actions[player.slot] & SCAN),
+			tuple(p for p in self._debug_hosts if p in self._in_game)
+		)
+
+		self.turn_timings['end'] = timer() - start
+		return batch
+
+	def resolve_turn(self, batch):
+		"""
+		Executes all actions in batch and sends the resulting signals to the
+		players involved. The time spent in every phase is recorded in
+		self.turn_timings.
+		"""
+		timer = time.perf_counter
+		# record the phases in a dict of our own, the turn loop may be reading
+		# the last turn's while we're resolving in pipelined mode
+		timings = dict(self.turn_timings)
+		self.resolution_turn = batch.turn_number
+
+		signal_cache = []
+		# players killed earlier in the turn are no longer alive, skip their
+		# remaining actions
+		alive = self._alive
+
+		# execute all requested move actions
+		start = timer()
+		signal_cache.extend(self.execute_moves((player, action) for (player, action) in batch.moves if player in alive))
+		timings['move'] = timer() - start
+
+		# players don't move any further this turn, index their locations for
+		# the fire and scan phases
+		start = timer()
+		self.build_grid()
+		timings['index'] = timer() - start
+
+		# execute all requested fire actions
+		start = timer()
+		signal_cache.extend(self.execute_fires((player, action) for (player, action) in batch.fires if player in alive))
+		timings['fire'] = timer() - start
+
+		# execute all requested scan actions
+		start = timer()
+		signal_cache.extend(self.execute_scans((player, action) for (player, action) in batch.scans if player in alive))
+		timings['scan'] = timer() - start
+
+		if self._grid is not None:
+			self.neighbor_stats = self._grid.stats
+			self._grid = None
+
+		# execute all actions as determined by server admin, for
+		# debug_hosts
+		signal_cache.extend(self.handle_manually(batch.debug_hosts))
+
+		start = timer()
+		# shuffle the signals for fairness
+		self.random.shuffle(signal_cache)
+		for s in signal_cache:
+			# first item is the function to call, the rest of the items are
+			# the arguments
+			s[0](*s[1:])
+		self.flush_signals(batch.turn_number)
+		timings['dispatch'] = timer() - start
+
+		if self.world_view is not None:
+			start = timer()
+			self.world_view.publish(batch.turn_number, self.table)
+			timings['publish'] = timer() - start
+		self.turn_timings = timings
+
+		if self.pipelined:
+			# heal players for the turn that is already being collected
+			self.heal_players()
+
+	def build_grid(self):
+		"""
+		Indexes the locations of all players on the battlefield in a grid,
+		used by find_players for the remainder of the turn.
+		"""
+		if not self.neighbor_lists:
+			return
+
+		xs, ys = self.table.x, self.table.y
+		players = [player for player in self._in_game if xs[player.slot] == xs[player.slot]]
+		self._grid = CellGrid((self.width, self.height), cell_size((self.width, self.height), len(players)))
+		for player in players:
+			self._grid.add(player, xs[player.slot], ys[player.slot])
+
+	def find_players(self, bounds):
+		"""
+		Returns a list of all players in game located within bounds (x1, y1,
+		x2, y2), in the order they joined the game.
+		"""
+		x1, y1, x2, y2 = bounds
+		grid = self._grid
+		if grid is None:
+			candidates = self._in_game
+		else:
+			# players outside of the grid's cells are never within bounds
+			candidates = grid.candidates(bounds)
+
+		# read locations straight from the table, players not on the
+		# battlefield have a NaN location, failing any comparison (players
+		# killed after the grid was built included)
+		xs, ys = self.table.x, self.table.y
+		return [player for player in candidates if x1 <= xs[player.slot] < x2 and y1 <= ys[player.slot] < y2]
 
 	def handle_manually(self, players):
 		result_signals = []
@@ -164,22 +572,19 @@ class LoBotomyServer(Emitter):
 			result_signals.extend(commands)
 		return result_signals
 
-	def execute_moves(self, players):
+	def execute_moves(self, actions):
 		result_signals = []
-		for player in players:
+		logged = log.actions.isEnabledFor(logging.INFO)
+		for player, action in actions:
 			# unpack required information
-			angle, distance = player.move_action
+			angle, distance = action
 			# calculate new values
 			x, y = util.move_wrapped(player.location, angle, distance, (self.width, self.height))
 			# log action and subtract energy cost
 			cost = game.move_cost(distance)
 			# TODO: truncate location tuples to x decimals
-			logging.info('player {} moved from {} to {} (cost: {})'.format(
-				player.name,
-				player.location,
-				(x, y),
-				cost
-			))
+			if logged:
+				log.action('move', player.name, 'player %s moved from %s to %s (cost: %s)', player.name, player.location, (x, y), cost)
 			prev_energy = player.energy
 			player.energy -= cost
 			self.emit_event(
@@ -201,31 +606,46 @@ class LoBotomyServer(Emitter):
 					cost = cost,
 					energy = (prev_energy, player.energy)
 				)
-				logging.info('player {} died from exhaustion (move)'.format(player.name))
+				if logged:
+					log.action('death', player.name, 'player %s died from exhaustion (move)', player.name)
 			else:
 				# move player on the battlefield
 				player.location = (x, y)
 		return result_signals
 
-	def execute_fires(self, players):
+	def execute_fires(self, actions):
 		result_signals = []
-		for player in players:
+		field = (self.width, self.height)
+		# players don't move during the fire phase, determine where all blasts
+		# land up front
+		actions = list(actions)
+		blasts = [
+			util.WrappedRadius(util.move_wrapped(player.location, angle, distance, field), radius, field)
+			for (player, (angle, distance, radius, charge)) in actions
+		]
+		if self._grid is not None:
+			# find the subjects of all blasts in one go, subjects killed by an
+			# earlier blast are skipped below
+			blast_subjects = join(self._grid, blasts, field)
+
+		alive = self._alive
+		logged = log.actions.isEnabledFor(logging.INFO)
+		for index, (player, action) in enumerate(actions):
+			if player not in alive:
+				# killed by an earlier blast
+				continue
+
 			# unpack required information
-			(angle, distance, radius, charge) = player.fire_action
+			(angle, distance, radius, charge) = action
 			# TODO: log fire action for player
 
-			# calculate the epicenter of the blast
-			epicenter = util.move_wrapped(player.location, angle, distance, (self.width, self.height))
+			# the epicenter of the blast
+			epicenter = blasts[index].point
 
 			# subtract energy cost
 			cost = game.fire_cost(distance, radius, charge)
-			logging.info('player {} at {} fired at {} (radius: {}, charge: {})'.format(
-				player.name,
-				player.location,
-				epicenter,
-				radius,
-				charge
-			))
+			if logged:
+				log.action('fire', player.name, 'player %s at %s fired at %s (radius: %s, charge: %s)', player.name, player.location, epicenter, radius, charge)
 
 			prev_energy = player.energy
 			player.energy -= cost
@@ -254,62 +674,66 @@ class LoBotomyServer(Emitter):
 					energy = (prev_energy, player.energy)
 				)
 				# XXX: possibly more to do with hitting one's self
-				logging.info('player {} died from exhaustion (fire)'.format(player.name))
+				if logged:
+					log.action('death', player.name, 'player %s died from exhaustion (fire)', player.name)
 
-			# calculate the bounding box for the blast
-			bounds = (
-				epicenter[0] - radius, epicenter[1] - radius,
-				epicenter[0] + radius, epicenter[1] + radius
-			)
-			# collect all players in the bounding box for the blast
-			subjects = set()
-			for region in util.generate_wrapped_bounds((0, 0, self.width, self.height), bounds):
-				subjects = subjects.union(self.find_players(region))
-
-			# create a wrapped radius to check distance against
-			radius = util.WrappedRadius(epicenter, radius, (self.width, self.height))
-			# check if subject in blast radius (bounding box possibly selects too many players)
+			if self._grid is not None:
+				subjects = [subject for subject in blast_subjects[index] if subject in alive]
+			else:
+				# calculate the bounding box for the blast
+				bounds = (
+					epicenter[0] - radius, epicenter[1] - radius,
+					epicenter[0] + radius, epicenter[1] + radius
+				)
+				# collect all players in the bounding box for the blast
+				subjects = {}
+				for region in util.generate_wrapped_bounds((0, 0, self.width, self.height), bounds):
+					# use a dict as an ordered set, keeping resolution order deterministic
+					subjects.update(dict.fromkeys(self.find_players(region)))
+
+				# check if subject in blast radius (bounding box possibly selects too many players)
+				subjects = [subject for subject in subjects if subject.location in blasts[index]]
+
+			radius = blasts[index]
 			for subject in subjects:
-				# calculate distance to epicenter for all subjects, signal hit if ... hit
-				if subject.location in radius:
-					# subtract energy equal to charge from subject that was hit
-					prev_energy = subject.energy
-					subject.energy -= charge
-					# emit player hit event
-					self.emit_event(
-						type = 'player_hit',
-						player = subject.name,
-						location = subject.location,
-						epicenter = epicenter,
-						radius = radius,
-						charge = charge,
-						energy = (prev_energy, subject.energy),
-						fatal = subject.energy <= 0.0,
-						attacker = player.name,
-						attacker_location = player.location,
-						attacker_energy = player.energy
-					)
-					# signal the subject it was hit
-					result_signals.append((player.signal_hit, player.name,
-							util.angle(radius.distance(subject.location)[1], epicenter),
-							charge
-					))
-					logging.info('player {} hit {} for {} (new energy: {})'.format(player.name, subject.name, charge, subject.energy))
-					# check to see if the subject died from this hit
-					if subject.energy <= 0.0:
-						logging.info("player {} died from {}'s bomb".format(subject.name, player.name))
-						result_signals.append(self.player_death(subject))
+				# subtract energy equal to charge from subject that was hit
+				prev_energy = subject.energy
+				subject.energy -= charge
+				# emit player hit event
+				self.emit_event(
+					type = 'player_hit',
+					player = subject.name,
+					location = subject.location,
+					epicenter = epicenter,
+					radius = radius,
+					charge = charge,
+					energy = (prev_energy, subject.energy),
+					fatal = subject.energy <= 0.0,
+					attacker = player.name,
+					attacker_location = player.location,
+					attacker_energy = player.energy
+				)
+				# signal the subject it was hit
+				result_signals.append((player.signal_hit, player.name,
+						util.angle(radius.distance(subject.location)[1], epicenter),
+						charge
+				))
+				if logged:
+					log.action('hit', player.name, 'player %s hit %s for %s (new energy: %s)', player.name, subject.name, charge, subject.energy)
+				# check to see if the subject died from this hit
+				if subject.energy <= 0.0:
+					if logged:
+						log.action('death', subject.name, "player %s died from %s's bomb", subject.name, player.name)
+					result_signals.append(self.player_death(subject))
 		return result_signals
 
-	def execute_scans(self, players):
+	def execute_scans(self, actions):
 		result_signals = []
-		for player in players:
-			(radius,) = player.scan_action
-			logging.info('player {} at {} scanned with radius {}'.format(
-				player.name,
-				player.location,
-				radius
-			))
+		logged = log.actions.isEnabledFor(logging.INFO)
+		for player, action in actions:
+			(radius,) = action
+			if logged:
+				log.action('scan', player.name, 'player %s at %s scanned with radius %s', player.name, player.location, radius)
 
 			# subtract energy cost
 			cost = game.scan_cost(radius)
@@ -333,7 +757,8 @@ class LoBotomyServer(Emitter):
 					cost = cost,
 					energy = (prev_energy, player.energy)
 				)
-				logging.info('player {} died from exhaustion (scan)'.format(player.name))
+				if logged:
+					log.action('death', player.name, 'player %s died from exhaustion (scan)', player.name)
 			else:
 				x, y = player.location
 				# calculate the bounding box for the scan
@@ -342,9 +767,9 @@ class LoBotomyServer(Emitter):
 					x + radius, y + radius
 				)
 				# collect all players in the bounding box for the blast
-				subjects = set()
+				subjects = {}
 				for region in util.generate_wrapped_bounds((0, 0, self.width, self.height), bounds):
-					subjects = subjects.union(self.find_players(region))
+					subjects.update(dict.fromkeys(self.find_players(region)))
 
 				radius = util.WrappedRadius(player.location, radius, (self.width, self.height))
 				# check if subject in scan radius (bounding box possibly selects too many players)
@@ -368,26 +793,39 @@ class LoBotomyServer(Emitter):
 							detected_location = subject.location,
 							detected_energy = subject.energy
 						)
-						logging.info('player {} detected {}'.format(player.name, subject.name))
+						if logged:
+							log.action('detect', player.name, 'player %s detected %s', player.name, subject.name)
 		return result_signals
 
 	def player_death(self, player):
 		"""
-		TODO: document me
+		Removes player from the battlefield, scheduling the end of its wait to
+		respawn. Returns the signal informing the player of its death.
 		"""
 		player.energy = 0.0
 		player.location = (None, None)
+		# a dead player gets to perform no further actions this turn
+		self.table.clear_actions(player.slot)
+
+		self._alive.pop(player, None)
+		respawn_turn = self.resolution_turn + max(config.game.dead_turns, 1)
+		self._respawns.setdefault(respawn_turn, {})[player] = None
 		# return signal
 		return (player.signal_death, config.game.dead_turns)
 
 	def register(self, name, player):
-		if name in self._players:
+		# claim the name, atomically in case of concurrent joins
+		if self._players.setdefault(name, player) is not player:
 			# TODO: include player host
 			logging.debug('player tried to register as %s, name is in use', name)
 			raise LoBotomyException(201)
 
-		# register player
-		self._players[name] = player
+		# joined, no longer subject to the handshake timeout
+		with self._connection_lock:
+			self._handshakes.pop(player, None)
+
+		if name in config.host.debug_names:
+			self._debug_hosts[player] = None
 		# send welcome message
 		player.send(protocol.welcome(
 			protocol.VERSION,
@@ -399,29 +837,145 @@ class LoBotomyServer(Emitter):
 		# TODO: include player host
 		logging.info('player %s joined', name)
 
+	def add_bot(self, bot, name):
+		"""
+		Joins bot to the game as name, spawning it at the next turn boundary.
+		Returns the BotPlayer playing for the bot, or None if name is taken.
+		"""
+		player = BotPlayer(self, bot)
+		player.request('join', name)
+		if player.state is PlayerState.VOID:
+			# name is taken, hand back the player's slot
+			player.shutdown()
+			return None
+
+		player.request('spawn')
+		return player
+
+	def register_fleet(self, player):
+		"""
+		Turns player's connection into a fleet, playing several robots.
+		Returns the Fleet.
+		"""
+		if not config.host.max_fleet_size:
+			raise LoBotomyException(206)
+
+		# the fleet's robots join individually, the connection is done
+		# joining
+		with self._connection_lock:
+			self._handshakes.pop(player, None)
+
+		fleet = Fleet(self, player)
+		self._fleets[fleet] = None
+		logging.info('client started a fleet')
+		return fleet
+
+	def unregister_fleet(self, fleet):
+		self._fleets.pop(fleet, None)
+
+	def register_datagrams(self, player, address):
+		"""
+		Sends player's turn signals to address as datagrams from now on.
+		Returns the DatagramChannel.
+		"""
+		if self.datagrams is None:
+			raise LoBotomyException(208)
+
+		self.datagrams.attach(player, address)
+		logging.info('sending turn signals of %s to %s:%d', player.name, *address)
+		return self.datagrams
+
+	def flush_signals(self, turn):
+		"""
+		Sends the signals queued for the robots of every fleet, a single
+		write per fleet, and those queued as datagrams, as signals of turn.
+		"""
+		# fleets come and go on their connections' threads, iterate a copy
+		for fleet in list(self._fleets):
+			fleet.flush()
+		if self.datagrams is not None:
+			self.datagrams.flush(turn)
+
 	def unregister(self, name, player):
-		# remove player from game if the player is in it
-		if player in self._in_game:
-			# remove player from game
-			self._in_game.remove(player)
-			self.emit_event(
-				type = 'player_leave',
-				player = player.name
-			)
+		self.release_connection(player)
+		if self.datagrams is not None:
+			self.datagrams.detach(player)
 
-		# remove player from online players
-		del self._players[name]
-		# TODO: include player host
-		logging.info('player %s left', name)
+		# free up the name right away, allowing the client to reconnect
+		if self._players.get(name) is player:
+			del self._players[name]
+			# TODO: include player host
+			logging.info('player %s left', name)
+
+		# leave the game at the next turn boundary
+		self._commands.append((Command.LEAVE, player, None))
 
 	def request_spawn(self, player):
 		if player.dead_turns > 0:
 			raise LoBotomyException(104)
 
-		# TODO: only spawn player just before turn begin
+		# spawn the player at the next turn boundary
+		self._commands.append((Command.SPAWN, player, None))
+
+	def request_action(self, player, action, arguments):
+		"""
+		Requests action (one of state.MOVE, FIRE or SCAN) with arguments to be
+		performed by player in the current turn, replacing any earlier request
+		for the same action.
+		"""
+		if self.pacer is not None and not isinstance(player, BotPlayer):
+			# in-process bots act instantly, only pace remote players
+			self.pacer.arrived()
+
+		# only the last request for an action matters, which apply_commands
+		# sorts out
+		self._commands.append((Command.ACTION, player, (self.turn_number, action, arguments)))
+
+	def apply_commands(self):
+		"""
+		Applies all commands queued by players since the last turn boundary,
+		in the order they were requested. Only the turn loop calls this, making
+		it the single writer of players' game state (slots themselves being
+		allocated by connections' threads, see PlayerTable.allocate).
+		"""
+		commands = self._commands
+		# arguments of the last request for an action in this turn, by
+		# (player, action)
+		actions = {}
+		while commands:
+			command, player, arguments = commands.popleft()
+			if command == Command.ACTION:
+				turn_number, action, arguments = arguments
+				# ignore requests that arrived too late
+				if turn_number == self.turn_number:
+					actions[(player, action)] = arguments
+			elif command == Command.SPAWN:
+				# ignore players that left in the meantime
+				if self._players.get(player.name) is player:
+					self.spawn(player)
+			elif command == Command.LEAVE:
+				self.leave(player)
+
+		for (player, action), arguments in actions.items():
+			# ignore requests of players that died or left
+			if player in self._alive:
+				self.store_action(player, action, arguments)
+
+	def store_action(self, player, action, arguments):
+		table, slot = self.table, player.slot
+		if action == MOVE:
+			table.move_angle[slot], table.move_distance[slot] = arguments
+		elif action == FIRE:
+			table.fire_angle[slot], table.fire_distance[slot], table.fire_radius[slot], table.fire_charge[slot] = arguments
+		elif action == SCAN:
+			(table.scan_radius[slot],) = arguments
+		table.actions[slot] |= action
+		self._pending[action][player] = None
+
+	def spawn(self, player):
 		# set player start values
 		player.energy = config.player.max_energy
-		player.location = (random.random() * self.width, random.random() * self.height)
+		player.location = (self.random.random() * self.width, self.random.random() * self.height)
 
 		self.emit_event(
 			type = 'player_spawn',
@@ -430,9 +984,27 @@ class LoBotomyServer(Emitter):
 			location = player.location
 		)
 
-		# check to see if this is a spawn or a respawn
-		if player not in self._in_game:
-			self._in_game.append(player)
+		# check to see if this is a spawn or a respawn (adding a key again
+		# keeps its position)
+		self._in_game[player] = None
+		self._alive[player] = None
+
+	def leave(self, player):
+		# remove player from game if the player is in it
+		if player in self._in_game:
+			# remove player from game (pending actions and respawn timers are
+			# ignored for players no longer in game)
+			del self._in_game[player]
+			self._alive.pop(player, None)
+			self.emit_event(
+				type = 'player_leave',
+				player = player.name
+			)
+
+		self._debug_hosts.pop(player, None)
+		# hand back the player's slot in the table
+		self.table.release(player.slot)
+		player.detach()
 
 	def shutdown(self):
 		# avoid double shutdown
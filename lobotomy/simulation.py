@@ -0,0 +1,159 @@
+# headless simulation of LoBotomy games, without sockets, threads or sleeping
+
+import math
+import random
+import time
+
+from lobotomy import config, LoBotomyException
+from lobotomy.player import Player, PlayerState
+from lobotomy.server import LoBotomyServer
+
+
+class SimulatedPlayer(Player):
+	"""
+	In-memory stand-in for a Player. Instead of reading commands from a
+	client, actions are requested by a behavior function every turn and
+	messages to the client are recorded rather than sent.
+	"""
+
+	def __init__(self, server, name, behavior):
+		# no socket, the thread is never started
+		super().__init__(server, None)
+
+		self.name = name
+		self.behavior = behavior
+		# messages 'sent' to this player, as tuples of values
+		self.messages = []
+
+	def send(self, command):
+		self.messages.append(tuple(command))
+
+	def act(self, turn_number, rng):
+		"""
+		Performs the actions for the current turn as the behavior sees fit,
+		respawning the player when it is allowed to.
+		"""
+		if self.state is PlayerState.DEAD:
+			if self.dead_turns <= 0:
+				self.handle_spawn()
+		elif self.state is PlayerState.ACTING:
+			try:
+				self.behavior(self, turn_number, rng)
+			except LoBotomyException as e:
+				# just like a client would be told
+				self.send_error(e.errno)
+
+def idle(player, turn_number, rng):
+	"""
+	Behavior that never requests an action.
+	"""
+	pass
+
+def random_actions(move = 0.5, fire = 0.3, scan = 0.3, max_distance = 0.2, max_radius = 0.1):
+	"""
+	Creates a behavior requesting a move, fire and scan action with the
+	provided probabilities, with random angles and random (but affordable)
+	distances and radii.
+	"""
+	def behavior(player, turn_number, rng):
+		if rng.random() < move:
+			player.handle_move(rng.random() * 2 * math.pi, rng.random() * max_distance)
+		if rng.random() < fire:
+			player.handle_fire(
+				rng.random() * 2 * math.pi,
+				rng.random() * max_distance,
+				rng.random() * max_radius,
+				rng.random() * 0.5
+			)
+		if rng.random() < scan:
+			player.handle_scan(rng.random() * max_radius * 2)
+
+	return behavior
+
+def scripted(script):
+	"""
+	Creates a behavior performing scripted actions, script being a dict
+	mapping turn numbers to a sequence of (command, arguments) pairs, like
+	('move', (angle, distance)).
+	"""
+	def behavior(player, turn_number, rng):
+		for command, arguments in script.get(turn_number, ()):
+			getattr(player, 'handle_' + command)(*arguments)
+
+	return behavior
+
+class Simulation:
+	"""
+	Drives a LoBotomyServer's turn resolution with simulated players, as fast
+	as possible. The server is created by engine, allowing alternative
+	implementations to be simulated.
+	"""
+
+	def __init__(self, num_players, field_dimensions = config.game.field_dimensions, behavior = None, seed = None, engine = LoBotomyServer):
+		self.server = engine(field_dimensions, seed = seed)
+		# use a separate source of randomness for the players' behavior
+		self.rng = random.Random(seed)
+
+		behavior = behavior or random_actions()
+		self.players = []
+		for i in range(num_players):
+			self.add_player(SimulatedPlayer(self.server, 'bot{}'.format(i), behavior))
+
+	def add_player(self, player):
+		"""
+		Joins a simulated player to the game and spawns it.
+		"""
+		player.handle_join(player.name)
+		player.handle_spawn()
+		# put the player on the battlefield right away
+		self.server.apply_commands()
+		self.players.append(player)
+
+	def add_bot(self, bot, name):
+		"""
+		Joins bot to the game as name and spawns it, returning its BotPlayer.
+		Bots act from within the turn loop, rather than when the simulation
+		tells them to.
+		"""
+		player = self.server.add_bot(bot, name)
+		self.server.apply_commands()
+		return player
+
+	def step(self):
+		"""
+		Runs a single turn, returning the time spent in each of its phases in
+		seconds.
+		"""
+		server = self.server
+
+		for player in self.players:
+			player.messages.clear()
+
+		start = time.perf_counter()
+		server.begin_turn()
+		begin = time.perf_counter() - start
+
+		turn_number = server.turn_number
+		for player in self.players:
+			player.act(turn_number, self.rng)
+
+		server.end_turn()
+
+		timings = {'begin': begin}
+		timings.update(server.turn_timings)
+		return timings
+
+	def run(self, turns):
+		"""
+		Runs the provided number of turns, returning the total time spent in
+		each of the phases in seconds. In pipelined mode, this waits for the
+		last turn to be resolved.
+		"""
+		totals = {}
+		for _ in range(turns):
+			for phase, spent in self.step().items():
+				totals[phase] = totals.get(phase, 0.0) + spent
+
+		self.server.wait_resolution()
+
+		return totals
@@ -0,0 +1,211 @@
+# spatial indexing of players on the battlefield
+
+import math
+
+from lobotomy import util
+
+class CellGrid:
+	"""
+	Uniform grid of cells over the battlefield, bucketing items by location.
+	Built once per turn (after players have moved), it answers all area
+	queries of that turn. Candidate lists for a range of cells are kept, as
+	crowded regions tend to be queried over and over.
+	"""
+
+	def __init__(self, field_dimensions, cell_size):
+		width, height = field_dimensions
+		self.columns = max(1, int(width / cell_size))
+		self.rows = max(1, int(height / cell_size))
+		self.cell_width = width / self.columns
+		self.cell_height = height / self.rows
+
+		# items by (column, row)
+		self.cells = {}
+		# position of items in the order they were added
+		self.order = {}
+		# location of items
+		self.locations = {}
+		# candidate lists by range of cells
+		self._ranges = {}
+
+		# statistics on the work done answering queries
+		self.stats = {
+			'queries': 0,
+			'range_hits': 0,
+			'cells_visited': 0,
+			'candidates': 0,
+			# candidates the queries would check without a grid
+			'reference_candidates': 0,
+			'circle_joins': 0,
+			'item_joins': 0,
+		}
+
+	def add(self, item, x, y):
+		column = min(int(x / self.cell_width), self.columns - 1)
+		row = min(int(y / self.cell_height), self.rows - 1)
+		self.cells.setdefault((column, row), []).append(item)
+		self.order[item] = len(self.order)
+		self.locations[item] = (x, y)
+
+	def cell_range(self, bounds):
+		"""
+		Returns the range of cells (c1, r1, c2, r2) overlapping bounds (x1, y1,
+		x2, y2), clipped to the field.
+		"""
+		x1, y1, x2, y2 = bounds
+		return (
+			max(0, int(math.floor(x1 / self.cell_width))),
+			max(0, int(math.floor(y1 / self.cell_height))),
+			min(self.columns - 1, int(math.floor(x2 / self.cell_width))),
+			min(self.rows - 1, int(math.floor(y2 / self.cell_height))),
+		)
+
+	def candidates(self, bounds):
+		"""
+		Returns all items in cells overlapping bounds (x1, y1, x2, y2), in the
+		order they were added. Bounds extending outside the field are clipped.
+		"""
+		stats = self.stats
+		stats['queries'] += 1
+		stats['reference_candidates'] += len(self.order)
+		return self.range_candidates(self.cell_range(bounds))
+
+	def range_candidates(self, cell_range):
+		stats = self.stats
+		result = self._ranges.get(cell_range)
+		if result is None:
+			c1, r1, c2, r2 = cell_range
+			cells = self.cells
+			result = []
+			for column in range(c1, c2 + 1):
+				for row in range(r1, r2 + 1):
+					result.extend(cells.get((column, row), ()))
+			stats['cells_visited'] += max(0, c2 - c1 + 1) * max(0, r2 - r1 + 1)
+			# restore insertion order for items from multiple cells
+			if c1 != c2 or r1 != r2:
+				result.sort(key = self.order.__getitem__)
+			self._ranges[cell_range] = result
+		else:
+			stats['range_hits'] += 1
+
+		stats['candidates'] += len(result)
+		return result
+
+# relative margin around a circle's edge within which the exact (and slower)
+# check of WrappedRadius is used
+EDGE_MARGIN = 1e-9
+
+def within(circle, location):
+	"""
+	Checks whether location is within circle, a WrappedRadius, with the same
+	outcome as location in circle. Only points close to the circle's edge are
+	left to the exact check.
+	"""
+	(cx, cy), radius = circle.point, circle.radius
+	width, height = circle.field_bounds
+	dx = abs(location[0] - cx) % width
+	dy = abs(location[1] - cy) % height
+	dx = min(dx, width - dx)
+	dy = min(dy, height - dy)
+	squared = dx * dx + dy * dy
+	if squared > (radius * (1 + EDGE_MARGIN)) ** 2:
+		return False
+	if squared < (radius * (1 - EDGE_MARGIN)) ** 2:
+		return True
+
+	return location in circle
+
+def join(grid, circles, field_dimensions):
+	"""
+	Joins all circles (WrappedRadius instances) with the items in grid at once,
+	returning for every circle the list of items within it. Items are listed
+	in the order querying the circle's wrapped bounds one by one would find
+	them: by the first bounds containing them, then by the order they were
+	added to grid.
+
+	Iterates either the circles (querying the grid for each of them) or the
+	items (looking up the circles overlapping their cell), depending on which
+	is expected to check fewer candidates.
+	"""
+	width, height = field_dimensions
+	field = (0, 0, width, height)
+	stats = grid.stats
+
+	# wrapped bounds of every circle, with the range of cells they overlap
+	regions = []
+	covered = 0
+	for circle in circles:
+		(x, y), radius = circle.point, circle.radius
+		circle_regions = []
+		for bounds in util.generate_wrapped_bounds(field, (x - radius, y - radius, x + radius, y + radius)):
+			cell_range = grid.cell_range(bounds)
+			c1, r1, c2, r2 = cell_range
+			covered += max(0, c2 - c1 + 1) * max(0, r2 - r1 + 1)
+			circle_regions.append((bounds, cell_range))
+		regions.append(circle_regions)
+		stats['queries'] += len(circle_regions)
+		stats['reference_candidates'] += len(circle_regions) * len(grid.order)
+
+	# circle-centric iteration checks all items in the covered cells, item-
+	# centric iteration checks every item once plus all entries of the cells
+	num_items = len(grid.order)
+	density = num_items / (grid.columns * grid.rows)
+	if covered * density > num_items + covered:
+		stats['item_joins'] += 1
+		return _join_items(grid, circles, regions)
+	else:
+		stats['circle_joins'] += 1
+		return _join_circles(grid, circles, regions)
+
+def _join_circles(grid, circles, regions):
+	locations = grid.locations
+	result = []
+	for circle, circle_regions in zip(circles, regions):
+		found = {}
+		for (x1, y1, x2, y2), cell_range in circle_regions:
+			for item in grid.range_candidates(cell_range):
+				if item not in found:
+					x, y = location = locations[item]
+					if x1 <= x < x2 and y1 <= y < y2 and within(circle, location):
+						found[item] = None
+		result.append(list(found))
+
+	return result
+
+def _join_items(grid, circles, regions):
+	# bucket the wrapped bounds of the circles by the cells they overlap
+	buckets = {}
+	for index, circle_regions in enumerate(regions):
+		for rank, (bounds, (c1, r1, c2, r2)) in enumerate(circle_regions):
+			for column in range(c1, c2 + 1):
+				for row in range(r1, r2 + 1):
+					buckets.setdefault((column, row), []).append((index, rank, bounds))
+
+	# for every circle, the items within it by the rank of the first bounds
+	# containing them
+	found = [{} for _ in circles]
+	cells, locations = grid.cells, grid.locations
+	checked = 0
+	for cell, entries in buckets.items():
+		items = cells.get(cell)
+		if not items:
+			continue
+		checked += len(items)
+		for item in items:
+			x, y = location = locations[item]
+			for index, rank, (x1, y1, x2, y2) in entries:
+				if x1 <= x < x2 and y1 <= y < y2:
+					ranks = found[index]
+					if rank < ranks.get(item, len(regions[index])) and within(circles[index], location):
+						ranks[item] = rank
+
+	grid.stats['candidates'] += checked
+	order = grid.order
+	return [sorted(ranks, key = lambda item: (ranks[item], order[item])) for ranks in found]
+
+def cell_size(field_dimensions, num_items, per_cell = 4.0, minimum = 0.05):
+	"""
+	Determines a cell size putting per_cell items in a cell on average.
+	"""
+	width, height = field_dimensions
+	return max(minimum, math.sqrt(width * height * per_cell / max(num_items, 1)))
@@ -0,0 +1,95 @@
+# central storage of player game state
+
+from array import array
+import math
+from threading import Lock
+
+# flags for requested actions
+MOVE = 1
+FIRE = 2
+SCAN = 4
+
+class PlayerTable:
+	"""
+	Game state of all players, stored in parallel arrays indexed by a
+	player's slot. Slots are reused after being released. Slots are allocated
+	by connections' threads, holding lock; anything exporting the buffer of
+	a column (which keeps it from growing) should hold it as well.
+	"""
+
+	def __init__(self):
+		# location, NaN for players not on the battlefield
+		self.x = array('d')
+		self.y = array('d')
+		self.energy = array('d')
+		self.dead_turns = array('l')
+
+		# bitwise or of the flags for the actions requested
+		self.actions = bytearray()
+		# arguments of the requested actions
+		self.move_angle = array('d')
+		self.move_distance = array('d')
+		self.fire_angle = array('d')
+		self.fire_distance = array('d')
+		self.fire_radius = array('d')
+		self.fire_charge = array('d')
+		self.scan_radius = array('d')
+
+		# player occupying a slot, None for free slots
+		self.owners = []
+		self._free = []
+		# guards allocating and releasing slots, resizing the columns
+		self.lock = Lock()
+
+	def __len__(self):
+		return len(self.owners) - len(self._free)
+
+	def allocate(self, owner):
+		"""
+		Allocates a slot for owner, returning the slot.
+		"""
+		with self.lock:
+			if self._free:
+				slot = self._free.pop()
+				self.owners[slot] = owner
+				return slot
+
+			slot = len(self.owners)
+			for column in (self.x, self.y):
+				column.append(math.nan)
+			for column in (self.energy, self.move_angle, self.move_distance, self.fire_angle, self.fire_distance, self.fire_radius, self.fire_charge, self.scan_radius):
+				column.append(0.0)
+			self.dead_turns.append(0)
+			self.actions.append(0)
+			self.owners.append(owner)
+
+			return slot
+
+	def release(self, slot):
+		"""
+		Releases slot, resetting its values for a future owner.
+		"""
+		with self.lock:
+			self.x[slot] = self.y[slot] = math.nan
+			self.energy[slot] = 0.0
+			self.dead_turns[slot] = 0
+			self.actions[slot] = 0
+			self.owners[slot] = None
+			self._free.append(slot)
+
+	def clear_actions(self, slot):
+		self.actions[slot] = 0
+
+	def heal(self, slots, amount, maximum):
+		"""
+		Adds amount of energy to all slots, up to maximum. Returns a list of
+		(slot, previous energy, energy) for all slots.
+		"""
+		energy = self.energy
+		result = []
+		for slot in slots:
+			prev_energy = energy[slot]
+			energy[slot] = min(prev_energy + amount, maximum)
+			result.append((slot, prev_energy, energy[slot]))
+
+		return result
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# headless tournaments between in-process bots, spread over a pool of processes
+#
+# usage: python3 -m lobotomy.tournament --bot Hunter=5 --bot Wanderer=5 --matches 1000
+
+import argparse
+import importlib
+import logging
+import multiprocessing
+import random
+import time
+
+from lobotomy import bot, config
+from lobotomy.event import BatchListener
+from lobotomy.simulation import Simulation
+
+# statistics kept for every player, and every entry in a tournament
+STATS = ('kills', 'deaths', 'hits', 'damage')
+
+class Tally(BatchListener):
+	"""
+	Listener keeping statistics of players by name, a turn at a time. A kill
+	is a fatal hit on another player, players die from fatal hits and from
+	exhausting themselves.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.players = {}
+
+	def stats(self, name):
+		if name not in self.players:
+			self.players[name] = dict.fromkeys(STATS, 0)
+		return self.players[name]
+
+	def accept_batch(self, envelope):
+		stats = self.stats
+		for name, attacker_name, charge, fatal in zip(*envelope.columns('player_hit', 'player', 'attacker', 'charge', 'fatal')):
+			attacker = stats(attacker_name)
+			attacker['hits'] += 1
+			attacker['damage'] += charge
+			if fatal:
+				stats(name)['deaths'] += 1
+				if attacker_name != name:
+					attacker['kills'] += 1
+
+		for kind in ('player_move', 'player_fire', 'player_scan'):
+			for name, energy in zip(*envelope.columns(kind, 'player', 'energy')):
+				if energy[1] <= 0.0:
+					# died from exhaustion
+					stats(name)['deaths'] += 1
+
+def load_bot(name):
+	"""
+	Loads a Bot class by name, either one of lobotomy.bot's or a
+	module:class path.
+	"""
+	if ':' in name:
+		module, _, name = name.partition(':')
+		return getattr(importlib.import_module(module), name)
+
+	return getattr(bot, name)
+
+def parse_entry(entry):
+	"""
+	Parses an entry like 'Hunter=5' into its name and number of bots.
+	"""
+	name, _, count = entry.partition('=')
+	return (name, int(count or 1))
+
+def play_match(match):
+	"""
+	Plays a single match, match being a tuple of (index, seed, entries,
+	turns, field_dimensions), entries a list of (bot name, number of bots).
+	Returns a dict with the match's statistics by entry and the time it
+	took.
+	"""
+	index, seed, entries, turns, field_dimensions = match
+	rng = random.Random(seed)
+	simulation = Simulation(0, field_dimensions, seed = seed)
+	tally = Tally()
+	simulation.server.add_listener(tally)
+
+	# name players after their entry, to attribute their statistics
+	entry_of = {}
+	for name, count in entries:
+		cls = load_bot(name)
+		for number in range(count):
+			player_name = '{}-{}'.format(name, number)
+			entry_of[player_name] = name
+			simulation.add_bot(cls(seed = rng.random()), player_name)
+
+	start = time.perf_counter()
+	simulation.run(turns)
+	# hand the events of the last turn to the tally
+	simulation.server.flush_events()
+	elapsed = time.perf_counter() - start
+
+	scores = {name: dict.fromkeys(STATS, 0) for (name, _) in entries}
+	for player_name, stats in tally.players.items():
+		for stat, value in stats.items():
+			scores[entry_of[player_name]][stat] += value
+
+	return {'index': index, 'seed': seed, 'scores': scores, 'turns': turns, 'elapsed': elapsed}
+
+def aggregate(results):
+	"""
+	Aggregates the results of matches into totals by entry, along with the
+	number of matches an entry scored the most kills in (shared wins are not
+	counted).
+	"""
+	totals = {}
+	for result in results:
+		for name, stats in result['scores'].items():
+			entry = totals.setdefault(name, dict(dict.fromkeys(STATS, 0), wins = 0))
+			for stat in STATS:
+				entry[stat] += stats[stat]
+
+		ranked = sorted(result['scores'].items(), key = lambda item: item[1]['kills'], reverse = True)
+		if len(ranked) == 1 or ranked[0][1]['kills'] > ranked[1][1]['kills']:
+			totals[ranked[0][0]]['wins'] += 1
+
+	return totals
+
+def apply_rules(rules):
+	"""
+	Applies game rules as taken from config in the parent process (worker
+	processes need not be forked from it).
+	"""
+	for section, values in rules.items():
+		for name, value in values.items():
+			setattr(getattr(config, section), name, value)
+	# per-action log messages would only slow matches down
+	logging.disable(logging.INFO)
+
+def rules():
+	return {
+		section: {name: value for (name, value) in vars(getattr(config, section)).items() if not name.startswith('_')}
+		for section in ('game', 'player')
+	}
+
+def run_tournament(entries, matches, turns, field_dimensions = config.game.field_dimensions, seed = 0, processes = None):
+	"""
+	Plays matches matches between entries, spread over processes processes
+	(defaulting to the number of CPUs, or played in this process when 1).
+	Returns the results of all matches, in order.
+	"""
+	rng = random.Random(seed)
+	schedule = [(index, rng.randrange(2 ** 32), entries, turns, field_dimensions) for index in range(matches)]
+
+	if processes == 1:
+		return [play_match(match) for match in schedule]
+
+	with multiprocessing.Pool(processes, initializer = apply_rules, initargs = (rules(),)) as pool:
+		results = list(pool.imap_unordered(play_match, schedule, chunksize = max(1, matches // (4 * (processes or multiprocessing.cpu_count())))))
+
+	return sorted(results, key = lambda result: result['index'])
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Play a headless tournament between in-process bots')
+	parser.add_argument('--bot', dest = 'entries', action = 'append', type = parse_entry, required = True, help = 'bot to enter, like Hunter=5 or module:Class=5 for 5 of them')
+	parser.add_argument('--matches', type = int, default = 100, help = 'number of matches to play')
+	parser.add_argument('--turns', type = int, default = 200, help = 'number of turns per match')
+	parser.add_argument('--field', type = float, default = config.game.field_dimensions[0], help = 'size of the (square) field')
+	parser.add_argument('--processes', type = int, default = None, help = 'number of processes to play matches in (defaults to the number of CPUs)')
+	parser.add_argument('--seed', type = int, default = 1452, help = 'seed for the matches')
+	args = parser.parse_args()
+
+	logging.disable(logging.INFO)
+	start = time.perf_counter()
+	results = run_tournament(args.entries, args.matches, args.turns, (args.field, args.field), args.seed, args.processes)
+	elapsed = time.perf_counter() - start
+
+	print('{:<24} {:>8} {:>8} {:>8} {:>8} {:>10}'.format('bot', 'wins', 'kills', 'deaths', 'hits', 'damage'))
+	for name, totals in sorted(aggregate(results).items(), key = lambda item: item[1]['wins'], reverse = True):
+		print('{:<24} {:>8} {:>8} {:>8} {:>8} {:>10.1f}'.format(name, totals['wins'], totals['kills'], totals['deaths'], totals['hits'], totals['damage']))
+
+	played = sum(result['elapsed'] for result in results)
+	turns = sum(result['turns'] for result in results)
+	print('{} matches in {:.1f} s ({:.1f} s playing, {:.0f} turns/s per process, {:.1f} matches/s)'.format(
+		len(results), elapsed, played, turns / max(played, 1e-9), len(results) / elapsed
+	))
+
+if __name__ == '__main__':
+	main()
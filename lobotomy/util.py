@@ -1,6 +1,8 @@
 # global utilities
 
 import math
+import threading
+import time
 
 def enum(*values):
 	"""
@@ -85,7 +87,7 @@ def generate_wrapped_bounds(field_bounds, target_bounds):
 		if ty1 < fy1:
 			# target area *also* extends the top of field (top left covered in right extension)
 			yield (fx1, ty1 + f_height, tx2 - f_width, fy2) # yield the 'bottom left' overlap
-			yield (tx1, ty1 + f_height, tx1, fy2) # yield the 'bottom right' overlap
+			yield (tx1, ty1 + f_height, fx2, fy2) # yield the 'bottom right' overlap
 		elif ty2 > fy2:
 			# target area *also* extends the bottom field (bottom left covered in right extension)
 			yield (fx1, fy1, tx2 - f_width, ty2 - f_height) # yield the 'top left' overlap
@@ -136,3 +138,46 @@ class WrappedRadius:
 		Checks whether the point is in self.point's radius in a wrapped field.
 		"""
 		return self.distance(point)[0] <= self.radius
+
+# serializes changing the stack size of new threads
+_stack_lock = threading.Lock()
+
+def start_thread(thread, stack_size = 0):
+	"""
+	Starts thread with a stack of stack_size bytes (0 for the platform's
+	default), leaving the stack size of other threads alone. Threads started
+	while others may be using a custom stack size should be started through
+	this as well.
+	"""
+	with _stack_lock:
+		previous = threading.stack_size(stack_size)
+		try:
+			thread.start()
+		finally:
+			threading.stack_size(previous)
+
+class TokenBucket:
+	"""
+	Limits the rate of events to rate per second, allowing bursts of up to
+	burst events.
+	"""
+
+	def __init__(self, rate, burst, clock = time.monotonic):
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self._clock = clock
+		self._last = clock()
+
+	def take(self):
+		"""
+		Takes a token for an event, returning whether one was available.
+		"""
+		now = self._clock()
+		self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+		self._last = now
+		if self.tokens >= 1.0:
+			self.tokens -= 1.0
+			return True
+
+		return False
@@ -0,0 +1,213 @@
+# read-only view of the world in shared memory, for tools on the same machine
+#
+# the segment starts with a header, followed by a column for every value of
+# the server's player table, indexed by slot:
+#
+#   header   magic, layout version, capacity, sequence, turn, slots, total
+#   x        capacity doubles, NaN for players not on the battlefield
+#   y        capacity doubles
+#   energy   capacity doubles
+#   state    capacity bytes, a PlayerState or FREE for unused slots
+#   name     capacity names of NAME_SIZE bytes, UTF-8 padded with zeros
+#
+# the sequence is odd while the server is writing, readers copy what they need
+# and retry if the sequence changed meanwhile (a seqlock), never blocking the
+# server
+
+from array import array
+from collections import namedtuple
+import logging
+from multiprocessing import resource_tracker, shared_memory
+import struct
+
+from lobotomy.player import PlayerState
+
+MAGIC = b'LOBOTOMY'
+LAYOUT_VERSION = 1
+
+HEADER = struct.Struct('<8sIIQQQQ')
+# offset of the sequence in the header
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 16
+
+# state of unused slots
+FREE = 255
+# bytes reserved for a player's name
+NAME_SIZE = 32
+
+# names of the segments published by this process
+_published = set()
+
+# published state of the world, columns indexed by slot
+Snapshot = namedtuple('Snapshot', ('turn', 'total', 'x', 'y', 'energy', 'states', 'names'))
+
+def layout(capacity):
+	"""
+	Returns the offsets of the x, y, energy, state and name columns for
+	capacity slots, and the size of the segment.
+	"""
+	x = HEADER.size
+	y = x + 8 * capacity
+	energy = y + 8 * capacity
+	state = energy + 8 * capacity
+	name = state + capacity
+	return (x, y, energy, state, name), name + NAME_SIZE * capacity
+
+def encode_name(name):
+	"""
+	Returns name as UTF-8 padded to NAME_SIZE bytes, truncated to the
+	characters that fit whole.
+	"""
+	encoded = name.encode('utf-8')
+	if len(encoded) > NAME_SIZE:
+		# drop a character cut in half
+		encoded = encoded[:NAME_SIZE].decode('utf-8', 'ignore').encode('utf-8')
+	return encoded.ljust(NAME_SIZE, b'\0')
+
+class WorldPublisher:
+	"""
+	Publishes the server's player table into a shared memory segment named
+	name, holding up to capacity slots. Only a single thread should publish.
+	"""
+
+	def __init__(self, name, capacity):
+		self.capacity = capacity
+		self._offsets, size = layout(capacity)
+		self._memory = shared_memory.SharedMemory(name, create = True, size = size)
+		_published.add(self._memory.name)
+		self._buffer = self._memory.buf
+		self._sequence = 0
+		# names as last written, by slot
+		self._names = [''] * capacity
+		self._states = bytearray([FREE]) * capacity
+		self._truncated = False
+		HEADER.pack_into(self._buffer, 0, MAGIC, LAYOUT_VERSION, capacity, 0, 0, 0, 0)
+
+	@property
+	def name(self):
+		return self._memory.name
+
+	def publish(self, turn, table):
+		"""
+		Writes the state of all slots in table after turn.
+		"""
+		buffer, owners = self._buffer, table.owners
+		total = len(owners)
+		slots = min(total, self.capacity)
+		if slots < total and not self._truncated:
+			logging.warning('world view holds %d of %d slots', slots, total)
+			self._truncated = True
+
+		states, names = self._states, self._names
+		x, y, energy, state, name = self._offsets
+		# collect states and names before marking the view as being written
+		changed = []
+		for slot in range(slots):
+			owner = owners[slot]
+			if owner is None:
+				states[slot] = FREE
+				owner_name = ''
+			else:
+				states[slot] = owner.state
+				owner_name = owner.name
+			if names[slot] != owner_name:
+				names[slot] = owner_name
+				changed.append(slot)
+
+		self._sequence += 1
+		SEQUENCE.pack_into(buffer, SEQUENCE_OFFSET, self._sequence)
+
+		# connections' threads grow the columns when allocating slots, which
+		# fails while their buffers are exported: copy them holding the table's
+		# lock
+		with table.lock:
+			for offset, column in ((x, table.x), (y, table.y), (energy, table.energy)):
+				with memoryview(column) as view:
+					buffer[offset:offset + 8 * slots] = view[:slots].cast('B')
+		buffer[state:state + slots] = states[:slots]
+		for slot in changed:
+			offset = name + slot * NAME_SIZE
+			buffer[offset:offset + NAME_SIZE] = encode_name(names[slot])
+		HEADER.pack_into(buffer, 0, MAGIC, LAYOUT_VERSION, self.capacity, self._sequence, turn, slots, total)
+
+		self._sequence += 1
+		SEQUENCE.pack_into(buffer, SEQUENCE_OFFSET, self._sequence)
+
+	def close(self):
+		"""
+		Closes and removes the segment.
+		"""
+		self._buffer = None
+		self._memory.close()
+		self._memory.unlink()
+		_published.discard(self._memory.name)
+
+class WorldReader:
+	"""
+	Reads the world as published by a server in the shared memory segment
+	named name.
+	"""
+
+	def __init__(self, name):
+		try:
+			self._memory = shared_memory.SharedMemory(name, track = False)
+		except TypeError:
+			# before Python 3.13, attaching registers the segment to be
+			# removed when this process exits, which is up to the server (the
+			# registration is shared with a publisher in this process)
+			self._memory = shared_memory.SharedMemory(name)
+			if self._memory.name not in _published:
+				resource_tracker.unregister(self._memory._name, 'shared_memory')
+
+		magic, version, self.capacity = HEADER.unpack_from(self._memory.buf, 0)[:3]
+		if magic != MAGIC or version != LAYOUT_VERSION:
+			self._memory.close()
+			raise ValueError('not a world view of layout version {}'.format(LAYOUT_VERSION))
+		self._offsets, _ = layout(self.capacity)
+
+	def read(self, attempts = 1000):
+		"""
+		Returns a consistent Snapshot of the world, retrying while the server
+		is writing (up to attempts times).
+		"""
+		buffer = self._memory.buf
+		x, y, energy, state, name = self._offsets
+		for _ in range(attempts):
+			(before,) = SEQUENCE.unpack_from(buffer, SEQUENCE_OFFSET)
+			if before % 2:
+				continue
+
+			_, _, _, _, turn, slots, total = HEADER.unpack_from(buffer, 0)
+			columns = [bytes(buffer[offset:offset + 8 * slots]) for offset in (x, y, energy)]
+			states = bytes(buffer[state:state + slots])
+			names = bytes(buffer[name:name + NAME_SIZE * slots])
+
+			(after,) = SEQUENCE.unpack_from(buffer, SEQUENCE_OFFSET)
+			if before == after:
+				break
+		else:
+			raise TimeoutError('world view kept changing while reading')
+
+		xs, ys, energies = (array('d', column) for column in columns)
+		names = [names[offset:offset + NAME_SIZE].rstrip(b'\0').decode('utf-8', 'replace') for offset in range(0, len(names), NAME_SIZE)]
+		return Snapshot(turn, total, xs, ys, energies, states, names)
+
+	def players(self):
+		"""
+		Returns a dict of (name, x, y, energy, state) of all joined players by
+		slot, x and y being None for players not on the battlefield. Names are
+		truncated to NAME_SIZE bytes, so they need not be unique.
+		"""
+		snapshot = self.read()
+		players = {}
+		for slot, state in enumerate(snapshot.states):
+			if state == FREE or state == PlayerState.VOID:
+				continue
+			x, y = snapshot.x[slot], snapshot.y[slot]
+			if x != x:
+				x = y = None
+			players[slot] = (snapshot.names[slot], x, y, snapshot.energy[slot], state)
+		return players
+
+	def close(self):
+		self._memory.close()
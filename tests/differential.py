@@ -0,0 +1,214 @@
+# differential testing of turn resolution engines
+#
+# An engine is a callable creating a server, like LoBotomyServer itself:
+# engine(field_dimensions, seed = seed). The same scenario is played on both
+# a reference and a candidate engine, comparing emitted events and signals
+# sent to players turn by turn. Mismatching scenarios are shrunk to a minimal
+# case before being reported.
+
+import math
+import random
+
+from lobotomy.event import Listener
+from lobotomy.simulation import Simulation, SimulatedPlayer
+from lobotomy.util import WrappedRadius
+
+# number of decimals floats are compared with
+PRECISION = 9
+
+class Scenario:
+	"""
+	A reproducible world: the players' initial locations and the actions they
+	request every turn.
+	"""
+
+	def __init__(self, field_dimensions, locations, turns, seed = 0):
+		self.field_dimensions = field_dimensions
+		# initial location for every player
+		self.locations = locations
+		# for every turn, a dict mapping player index to a dict of actions
+		# (like {'move': (angle, distance)})
+		self.turns = turns
+		self.seed = seed
+
+	def __repr__(self):
+		return 'Scenario({!r}, {!r}, {!r}, seed = {!r})'.format(self.field_dimensions, self.locations, self.turns, self.seed)
+
+class Recorder(Listener):
+	"""
+	Listener recording all events, normalized for comparison.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.events = []
+
+	def accept(self, **event):
+		self.events.append(tuple(sorted((key, normalize(value)) for (key, value) in event.items())))
+
+def normalize(value):
+	"""
+	Normalizes values in events and signals to make them comparable.
+	"""
+	if isinstance(value, float):
+		return round(value, PRECISION)
+	if isinstance(value, (tuple, list)):
+		return tuple(normalize(item) for item in value)
+	if isinstance(value, WrappedRadius):
+		return ('WrappedRadius', normalize(value.point), normalize(value.radius))
+
+	return value
+
+def play(engine, scenario):
+	"""
+	Plays scenario on engine, returning a list of (events, signals) for every
+	turn, events being a sorted list and signals a dict mapping player names
+	to a sorted list of messages. Values of mixed types are sorted by their
+	representation.
+	"""
+	simulation = Simulation(0, scenario.field_dimensions, seed = scenario.seed, engine = engine)
+	server = simulation.server
+
+	def behavior(player, turn_number, rng):
+		actions = scenario.turns[turn_number - 1].get(player.index, {})
+		for command in ('move', 'fire', 'scan'):
+			if command in actions:
+				getattr(player, 'handle_' + command)(*actions[command])
+
+	for index, location in enumerate(scenario.locations):
+		player = SimulatedPlayer(server, 'p{}'.format(index), behavior)
+		player.index = index
+		simulation.add_player(player)
+		player.location = location
+
+	recorder = Recorder()
+	server.add_listener(recorder)
+
+	result = []
+	for _ in scenario.turns:
+		recorder.events = []
+		simulation.step()
+		signals = {player.name: sorted(normalize(player.messages), key = repr) for player in simulation.players}
+		result.append((sorted(recorder.events, key = repr), signals))
+
+	return result
+
+def compare(reference, candidate, scenario):
+	"""
+	Plays scenario on both engines, returning None if they behave the same or
+	a description of the first difference.
+	"""
+	expected = play(reference, scenario)
+	try:
+		actual = play(candidate, scenario)
+	except Exception as e:
+		return 'candidate raised {!r}'.format(e)
+
+	for turn, ((expected_events, expected_signals), (actual_events, actual_signals)) in enumerate(zip(expected, actual), 1):
+		if expected_events != actual_events:
+			missing = [event for event in expected_events if event not in actual_events]
+			extra = [event for event in actual_events if event not in expected_events]
+			return 'turn {}: events differ, missing {}, extra {}'.format(turn, missing, extra)
+		for name in expected_signals:
+			if expected_signals[name] != actual_signals[name]:
+				return 'turn {}: signals to {} differ, expected {}, got {}'.format(turn, name, expected_signals[name], actual_signals[name])
+
+	return None
+
+def random_scenario(rng, num_players = 8, num_turns = 4, field_dimensions = (2.0, 2.0)):
+	"""
+	Creates a random scenario, with players crowded around one of the field's
+	corners to provoke hits, wrapping and players dying mid-turn.
+	"""
+	width, height = field_dimensions
+	corner = (rng.choice((0.0, width)), rng.choice((0.0, height)))
+	spread = rng.choice((0.2, 0.5, width / 2))
+
+	locations = []
+	for _ in range(num_players):
+		x = (corner[0] + rng.uniform(-spread, spread)) % width
+		y = (corner[1] + rng.uniform(-spread, spread)) % height
+		locations.append((x, y))
+
+	turns = []
+	for _ in range(num_turns):
+		actions = {}
+		for index in range(num_players):
+			requested = {}
+			if rng.random() < 0.5:
+				# occasionally move far enough to die from exhaustion
+				requested['move'] = (rng.uniform(0, 2 * math.pi), rng.choice((rng.uniform(0, 0.2), 0.5)))
+			if rng.random() < 0.6:
+				requested['fire'] = (rng.uniform(0, 2 * math.pi), rng.uniform(0, 0.3), rng.uniform(0, 0.4), rng.uniform(0.1, 0.6))
+			if rng.random() < 0.5:
+				requested['scan'] = (rng.uniform(0, 0.5),)
+			if requested:
+				actions[index] = requested
+		turns.append(actions)
+
+	return Scenario(field_dimensions, locations, turns, seed = rng.randrange(2 ** 32))
+
+def without_player(scenario, removed):
+	"""
+	Returns a copy of scenario without player removed.
+	"""
+	def reindex(actions):
+		return {(index if index < removed else index - 1): requested for (index, requested) in actions.items() if index != removed}
+
+	locations = scenario.locations[:removed] + scenario.locations[removed + 1:]
+	return Scenario(scenario.field_dimensions, locations, [reindex(actions) for actions in scenario.turns], scenario.seed)
+
+def shrink(scenario, fails):
+	"""
+	Shrinks scenario for which fails(scenario) is true to a (locally) minimal
+	scenario for which fails still holds, removing turns, players and
+	actions.
+	"""
+	changed = True
+	while changed:
+		changed = False
+
+		# drop trailing turns
+		while len(scenario.turns) > 1:
+			candidate = Scenario(scenario.field_dimensions, scenario.locations, scenario.turns[:-1], scenario.seed)
+			if not fails(candidate):
+				break
+			scenario, changed = candidate, True
+
+		# drop players
+		index = 0
+		while index < len(scenario.locations) and len(scenario.locations) > 1:
+			candidate = without_player(scenario, index)
+			if fails(candidate):
+				scenario, changed = candidate, True
+			else:
+				index += 1
+
+		# drop single actions
+		requests = [(turn, index, command) for (turn, actions) in enumerate(scenario.turns) for (index, requested) in actions.items() for command in requested]
+		for turn, index, command in requests:
+			turns = [dict(actions) for actions in scenario.turns]
+			requested = dict(turns[turn][index])
+			del requested[command]
+			if requested:
+				turns[turn][index] = requested
+			else:
+				del turns[turn][index]
+			candidate = Scenario(scenario.field_dimensions, scenario.locations, turns, scenario.seed)
+			if fails(candidate):
+				scenario, changed = candidate, True
+
+	return scenario
+
+def check(reference, candidate, runs = 50, seed = 0, **kwargs):
+	"""
+	Compares candidate to reference on runs random scenarios. Raises an
+	AssertionError describing a minimal mismatching scenario if the engines
+	behave differently. Additional arguments are passed to random_scenario.
+	"""
+	rng = random.Random(seed)
+	for _ in range(runs):
+		scenario = random_scenario(rng, **kwargs)
+		if compare(reference, candidate, scenario) is not None:
+			minimal = shrink(scenario, lambda s: compare(reference, candidate, s) is not None)
+			raise AssertionError('{}\nminimal scenario: {!r}'.format(compare(reference, candidate, minimal), minimal))
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from lobotomy import analytics
+from lobotomy.analytics import ColumnarExport
+from lobotomy.simulation import Simulation
+from lobotomy.state import MOVE
+from lobotomy.tournament import Tally
+
+class TestColumnarExport(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_export(self):
+		simulation = Simulation(30, seed = 4)
+		export = ColumnarExport(self.directory.name, turns_per_chunk = 2)
+		tally = Tally()
+		simulation.server.add_listener(export)
+		simulation.server.add_listener(tally)
+		simulation.run(5)
+		export.close()
+		simulation.server.flush_events()
+
+		chunks = list(analytics.read_chunks(self.directory.name))
+		self.assertEqual([header['turns'] for (header, _) in chunks], [[1, 2], [3, 4], [5, 5]])
+		for header, columns in chunks:
+			self.assertEqual({len(column) for column in columns.values()}, {header['rows']})
+
+		# the rows should add up to the statistics of the event stream
+		totals = {}
+		for header, columns in chunks:
+			for index, player in enumerate(columns['player']):
+				stats = totals.setdefault(header['names'][player], {'hits': 0, 'deaths': 0})
+				stats['hits'] += columns['hits'][index]
+				stats['deaths'] += columns['deaths'][index]
+		for name, stats in tally.players.items():
+			self.assertEqual((stats['hits'], stats['deaths']), (totals[name]['hits'], totals[name]['deaths']))
+
+		# the last turn's rows hold the state the turn ended in
+		header, columns = chunks[-1]
+		for index, player in enumerate(columns['player']):
+			player = simulation.server._players[header['names'][player]]
+			if not columns['deaths'][index]:
+				self.assertEqual(columns['energy'][index], player.energy)
+				self.assertEqual((columns['x'][index], columns['y'][index]), player.location)
+			if columns['actions'][index] & MOVE:
+				self.assertGreater(columns['move_cost'][index], 0.0)
+
+	def test_empty(self):
+		# nothing to write without turns
+		export = ColumnarExport(self.directory.name)
+		export.close()
+		self.assertEqual(os.listdir(self.directory.name), [])
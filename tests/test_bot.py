@@ -0,0 +1,90 @@
+import math
+import unittest
+
+from lobotomy.bot import action_angle, Bot, Hunter, Wanderer
+from lobotomy.player import PlayerState
+from lobotomy.simulation import Simulation, idle
+
+class RecordingBot(Bot):
+	"""
+	Bot recording the messages it receives, performing actions as instructed.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.messages = []
+		# actions to request on the next begin, as (method name, arguments)
+		self.actions = []
+
+	def __getattribute__(self, name):
+		attribute = super().__getattribute__(name)
+		if name in ('welcome', 'end', 'hit', 'death', 'detect', 'error'):
+			def record(*arguments):
+				self.messages.append((name,) + arguments)
+			return record
+		return attribute
+
+	def begin(self, turn_number, energy, duration):
+		self.messages.append(('begin', turn_number, energy))
+		for name, arguments in self.actions:
+			getattr(self, name)(*arguments)
+		self.actions = []
+
+class TestBot(unittest.TestCase):
+	def setUp(self):
+		self.simulation = Simulation(0, seed = 1)
+		self.server = self.simulation.server
+		self.bot = RecordingBot()
+		self.player = self.simulation.add_bot(self.bot, 'robby')
+
+	def test_messages(self):
+		self.assertEqual(self.bot.messages[0][0], 'welcome')
+		self.simulation.step()
+		self.assertEqual(self.bot.messages[1:], [('begin', 1, 1.0), ('end',)])
+
+	def test_actions(self):
+		location = self.player.location
+		self.bot.actions = [('move', (0.0, 0.1)), ('scan', (5.0,))]
+		self.simulation.step()
+		self.assertAlmostEqual(self.player.location[0], (location[0] + 0.1) % 2.0)
+		# invalid actions are reported to the bot
+		self.assertIn(('error', 103, 'scan impossible, costs more than max energy'), self.bot.messages)
+
+	def test_respawn(self):
+		self.bot.actions = [('move', (0.0, 0.5))]
+		self.simulation.step()
+		self.assertEqual(self.player.state, PlayerState.DEAD)
+		for _ in range(6):
+			self.simulation.step()
+		self.assertNotEqual(self.player.state, PlayerState.DEAD)
+
+	def test_name_taken(self):
+		self.assertIsNone(self.server.add_bot(RecordingBot(), 'robby'))
+
+class TestBuiltin(unittest.TestCase):
+	def test_action_angle(self):
+		# an angle signaled to players points the same way as the converted
+		# angle used for an action
+		self.assertAlmostEqual(action_angle(0.0), math.pi / 2)
+		self.assertAlmostEqual(action_angle(math.pi / 2), 0.0)
+
+	def test_hunter(self):
+		simulation = Simulation(1, behavior = idle, seed = 1)
+		target = simulation.players[0]
+		hunter = simulation.add_bot(Hunter(), 'hunter')
+		target.location = (1.0, 1.0)
+		hunter.location = (1.1, 1.2)
+
+		# the first turn is spent scanning, the second firing at the target
+		simulation.step()
+		simulation.step()
+		self.assertAlmostEqual(target.energy, 1.0 - hunter.bot.charge)
+
+	def test_wanderers(self):
+		# bots should be able to play along without any errors
+		simulation = Simulation(10, seed = 2)
+		bots = [Wanderer(seed = index) for index in range(5)] + [Hunter(seed = index) for index in range(5)]
+		for index, bot in enumerate(bots):
+			simulation.add_bot(bot, 'bot{}'.format(index + 100))
+		simulation.run(20)
+		self.assertTrue(all(player.state is not PlayerState.VOID for player in simulation.server._players.values()))
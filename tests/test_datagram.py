@@ -0,0 +1,163 @@
+import socket
+from threading import Thread
+import unittest
+
+from lobotomy import config, protocol
+from lobotomy.datagram import DatagramChannel, MAX_DATAGRAM_SIZE, parse_datagram
+from lobotomy.server import LoBotomyServer
+
+class TestDatagramChannel(unittest.TestCase):
+	def setUp(self):
+		self.channel = DatagramChannel('127.0.0.1', 0, seed = 1)
+		self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.client.bind(('127.0.0.1', 0))
+		self.client.settimeout(5)
+		self.channel.attach('henk', self.client.getsockname())
+
+	def tearDown(self):
+		self.channel.close()
+		self.client.close()
+
+	def receive(self):
+		sequence, turn, messages = parse_datagram(self.client.recv(65536))
+		return sequence, turn, [list(message.values()) for message in messages]
+
+	def test_batch(self):
+		self.channel.queue('henk', ('begin', 3, 1.0, 5000))
+		self.channel.queue('henk', ('detect', 'klaas', 0.5, 0.25, 0.75))
+		self.channel.flush(3)
+		self.channel.queue('henk', ('end',))
+		self.channel.flush(3)
+
+		self.assertEqual(self.receive(), (0, 3, [['begin', 3, 1.0, 5000], ['detect', 'klaas', 0.5, 0.25, 0.75]]))
+		self.assertEqual(self.receive(), (1, 3, [['end']]))
+
+	def test_split(self):
+		count = 100
+		for _ in range(count):
+			self.channel.queue('henk', ('detect', 'klaas', 0.5, 0.25, 0.75))
+		self.channel.flush(1)
+
+		messages = []
+		expected = 0
+		while len(messages) < count:
+			data = self.client.recv(65536)
+			self.assertLessEqual(len(data), MAX_DATAGRAM_SIZE + 16)
+			sequence, turn, received = parse_datagram(data)
+			self.assertEqual((sequence, turn), (expected, 1))
+			messages.extend(received)
+			expected += 1
+		self.assertGreater(expected, 1)
+		self.assertEqual(len(messages), count)
+
+	def test_loss(self):
+		self.channel.loss = 0.5
+		for turn in range(1, 101):
+			self.channel.queue('henk', ('begin', turn, 1.0, 5000))
+			self.channel.flush(turn)
+		self.assertEqual(self.channel.sent + self.channel.dropped, 100)
+		self.assertTrue(0 < self.channel.dropped < 100)
+
+		# gaps in the sequence tell the client what it missed, turns what to
+		# resynchronize on
+		self.client.settimeout(0.5)
+		received = []
+		try:
+			while True:
+				received.append(self.receive())
+		except socket.timeout:
+			pass
+		self.assertEqual(len(received), self.channel.sent)
+		self.assertEqual([sequence + 1 for (sequence, _, _) in received], [turn for (_, turn, _) in received])
+		self.assertEqual([turn for (_, turn, _) in received], [messages[0][1] for (_, _, messages) in received])
+
+	def test_threads(self):
+		# signals queued by the thread resolving a turn keep their turn, even
+		# when the turn loop signals the next one meanwhile
+		self.channel.queue('henk', ('begin', 4, 1.0, 5000))
+
+		def resolve():
+			self.channel.queue('henk', ('hit', 'klaas', 0.5, 0.25))
+			self.channel.flush(3)
+
+		worker = Thread(target = resolve)
+		worker.start()
+		worker.join()
+		self.channel.flush(4)
+
+		self.assertEqual(self.receive(), (0, 3, [['hit', 'klaas', 0.5, 0.25]]))
+		self.assertEqual(self.receive(), (1, 4, [['begin', 4, 1.0, 5000]]))
+
+	def test_bad_address(self):
+		self.channel.attach('klaas', ('127.0.0.1', 70000))
+		self.channel.queue('klaas', ('end',))
+		self.channel.flush(1)
+		self.assertEqual(self.channel.dropped, 1)
+
+	def test_detach(self):
+		self.channel.queue('henk', ('end',))
+		self.channel.detach('henk')
+		self.channel.flush(1)
+		self.assertEqual(self.channel.sent, 0)
+
+class TestDatagramPlayer(unittest.TestCase):
+	def setUp(self):
+		self.server = LoBotomyServer(seed = 1)
+		self.server.datagrams = DatagramChannel('127.0.0.1', 0)
+
+		listener = socket.create_server(('127.0.0.1', 0))
+		self.client = socket.create_connection(listener.getsockname())
+		server_side, _ = listener.accept()
+		listener.close()
+		self.client.settimeout(5)
+		self.server.configure(server_side)
+		self.player = self.server.admit(server_side, '127.0.0.1')
+		self.reader = self.client.makefile()
+
+		self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.udp.bind(('127.0.0.1', 0))
+		self.udp.settimeout(5)
+
+	def tearDown(self):
+		self.reader.close()
+		self.client.close()
+		self.udp.close()
+		self.server.datagrams.close()
+
+	def test_negotiate(self):
+		self.client.sendall('udp {}\n'.format(self.udp.getsockname()[1]).encode())
+		self.assertEqual(self.reader.readline().split()[:2], ['error', '202'])
+
+		self.client.sendall('join henk\nudp {}\nspawn\n'.format(self.udp.getsockname()[1]).encode())
+		self.assertEqual(self.reader.readline().split()[0], 'welcome')
+		self.assertEqual(self.reader.readline().split(), ['udp', str(self.server.datagrams.port)])
+		# wait for the spawn to be queued
+		self.client.sendall(b'spawn\n')
+		self.assertEqual(self.reader.readline().split()[:2], ['error', '202'])
+
+		self.server.end_turn()
+		self.server.begin_turn()
+		# turn signals arrive as datagrams
+		sequence, turn, messages = parse_datagram(self.udp.recv(65536))
+		self.assertEqual((sequence, turn), (0, 1))
+		self.assertEqual(messages, [protocol.begin(1, 1.0, config.game.turn_duration)])
+		self.server.end_turn()
+		self.assertEqual(parse_datagram(self.udp.recv(65536)), (1, 1, [protocol.end()]))
+
+		# errors stick to the connection
+		self.client.sendall(b'fire\n')
+		self.assertEqual(self.reader.readline().split()[:2], ['error', '302'])
+
+	def test_port(self):
+		self.client.sendall(b'join henk\nudp 70000\nudp -1\nudp 0\n')
+		self.assertEqual(self.reader.readline().split()[0], 'welcome')
+		self.assertEqual([self.reader.readline().split()[:2] for _ in range(3)], [['error', '302']] * 3)
+		self.assertIsNone(self.player.datagrams)
+
+	def test_unavailable(self):
+		self.server.datagrams.close()
+		self.server.datagrams = None
+		self.client.sendall(b'join henk\nudp 1234\n')
+		self.assertEqual(self.reader.readline().split()[0], 'welcome')
+		self.assertEqual(self.reader.readline().split()[:2], ['error', '208'])
+		self.server.datagrams = DatagramChannel('127.0.0.1', 0)
@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from lobotomy.server import LoBotomyServer
+from tests import differential
+
+class ForgetfulServer(LoBotomyServer):
+	"""
+	Broken engine, letting players killed mid-turn perform their remaining
+	actions.
+	"""
+
+	def player_death(self, player):
+		signal = super().player_death(player)
+		self._alive[player] = None
+		return signal
+
+class TestDifferential(unittest.TestCase):
+	def test_reference(self):
+		# the reference should agree with itself
+		differential.check(LoBotomyServer, LoBotomyServer, runs = 20)
+
+	def test_deterministic(self):
+		# playing the same scenario twice should result in the same events and signals
+		scenario = differential.random_scenario(random.Random(1), num_players = 12, num_turns = 6)
+		self.assertEqual(differential.play(LoBotomyServer, scenario), differential.play(LoBotomyServer, scenario))
+
+	def test_mismatch(self):
+		# a broken candidate should be caught...
+		with self.assertRaises(AssertionError) as context:
+			differential.check(LoBotomyServer, ForgetfulServer, runs = 20)
+
+		# ...and reported with a minimal scenario
+		self.assertIn('minimal scenario', str(context.exception))
+
+	def test_shrink(self):
+		def fails(scenario):
+			return differential.compare(LoBotomyServer, ForgetfulServer, scenario) is not None
+
+		rng = random.Random(2)
+		scenario = differential.random_scenario(rng)
+		while not fails(scenario):
+			scenario = differential.random_scenario(rng)
+
+		minimal = differential.shrink(scenario, fails)
+		self.assertTrue(fails(minimal))
+		self.assertLessEqual(len(minimal.locations), len(scenario.locations))
+		self.assertLessEqual(len(minimal.turns), len(scenario.turns))
+		# removing any of the players should make the mismatch disappear
+		for index in range(len(minimal.locations)):
+			self.assertFalse(fails(differential.without_player(minimal, index)))
@@ -0,0 +1,74 @@
+import unittest
+
+from lobotomy.event import BatchListener, Emitter, Envelope, Listener
+from lobotomy.simulation import Simulation
+
+class Recorder(Listener):
+	def __init__(self):
+		super().__init__()
+		self.events = []
+
+	def accept(self, **event):
+		self.events.append(event)
+
+class BatchRecorder(BatchListener):
+	def __init__(self):
+		super().__init__()
+		self.envelopes = []
+
+	def accept_batch(self, envelope):
+		self.envelopes.append(envelope)
+
+class TestBatches(unittest.TestCase):
+	def test_envelopes(self):
+		simulation = Simulation(20, seed = 2)
+		# hand the events of setting up the game to the server's own batch
+		# listeners
+		simulation.server.flush_events()
+		recorder, batches = Recorder(), BatchRecorder()
+		simulation.server.add_listener(recorder)
+		simulation.server.add_listener(batches)
+		simulation.run(4)
+		# the last turn's envelope is handed over when the next turn ends
+		self.assertEqual([envelope.turn for envelope in batches.envelopes], [None, 1, 2, 3])
+		simulation.server.flush_events()
+		self.assertEqual(batches.envelopes[-1].turn, 4)
+
+		# envelopes should hold exactly the events, grouped by type
+		events = recorder.events
+		self.assertEqual(sum(map(len, batches.envelopes)), len(events))
+		for kind in {event['type'] for event in events}:
+			emitted = [event for event in events if event['type'] == kind]
+			for field in {field for event in emitted for field in event} - {'type'}:
+				self.assertEqual(
+					[value for envelope in batches.envelopes for value in envelope.columns(kind, field)[0]],
+					[event.get(field) for event in emitted]
+				)
+
+	def test_columns(self):
+		envelope = Envelope(3)
+		envelope.append('player_hit', {'player': 'a', 'charge': 0.1})
+		envelope.append('player_hit', {'player': 'b', 'charge': 0.2})
+		self.assertEqual(envelope.columns('player_hit', 'player', 'charge'), (['a', 'b'], [0.1, 0.2]))
+		self.assertEqual(envelope.columns('player_scan', 'player'), ([],))
+		self.assertEqual(len(envelope), 2)
+
+	def test_missing_fields(self):
+		# events of a kind need not all have the same fields
+		envelope = Envelope(3)
+		envelope.append('player_suicide', {'player': 'a', 'cost': 0.1})
+		envelope.append('player_suicide', {'cost': 0.2})
+		envelope.append('player_suicide', {'cost': 0.3, 'action': 'scan'})
+		self.assertEqual(
+			envelope.columns('player_suicide', 'player', 'cost', 'action', 'radius'),
+			(['a', None, None], [0.1, 0.2, 0.3], [None, None, 'scan'], [None, None, None])
+		)
+
+	def test_remove(self):
+		emitter, batches = Emitter(), BatchRecorder()
+		emitter.add_listener(batches)
+		emitter.emit_event(type = 'turn_end', turn = 1)
+		emitter.remove_listener(batches)
+		# no envelopes are collected without batch listeners
+		emitter.emit_event(type = 'turn_end', turn = 2)
+		self.assertEqual(batches.envelopes, [])
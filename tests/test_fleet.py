@@ -0,0 +1,70 @@
+import socket
+import unittest
+
+from lobotomy import config
+from lobotomy.server import LoBotomyServer
+
+class TestFleet(unittest.TestCase):
+	def setUp(self):
+		self.server = LoBotomyServer(seed = 1)
+		self.client, server_side = socket.socketpair()
+		self.client.settimeout(5)
+		self.server.configure(server_side)
+		self.connection = self.server.admit(server_side, '10.0.0.1')
+		self.reader = self.client.makefile()
+
+	def tearDown(self):
+		self.reader.close()
+		self.client.close()
+
+	def readlines(self, count):
+		return [self.reader.readline().split() for _ in range(count)]
+
+	def start(self, *names):
+		self.client.sendall(b'fleet\n' + b''.join('{} join {}\n'.format(robot, name).encode() for (robot, name) in enumerate(names)))
+		lines = self.readlines(len(names))
+		self.assertEqual([(line[0], line[1]) for line in lines], [(str(robot), 'welcome') for robot in range(len(names))])
+
+	def test_join(self):
+		self.start('henk', 'klaas')
+		# robots join individually, the connection no longer has to
+		self.assertEqual(set(self.server._players), {'henk', 'klaas'})
+		self.assertEqual(self.server._handshakes, {})
+		self.assertEqual(self.connection.fleet.robots[1].name, 'klaas')
+
+	def test_turn(self):
+		self.start('henk', 'klaas')
+		self.client.sendall(b'0 spawn\n1 spawn\n1 spawn\n')
+		# wait for the spawns to be queued
+		self.assertEqual(self.readlines(1)[0][:3], ['1', 'error', '202'])
+
+		self.server.end_turn()
+		self.server.begin_turn()
+		self.assertEqual(self.readlines(2), [['0', 'begin', '1', '1.0', str(config.game.turn_duration)], ['1', 'begin', '1', '1.0', str(config.game.turn_duration)]])
+		robots = self.connection.fleet.robots
+		robots[1].location = robots[0].location
+		self.client.sendall(b'0 scan 0.3\n1 move 0.0 0.1\n')
+		self.client.sendall(b'1 spawn\n')
+		self.assertEqual(self.readlines(1)[0][:3], ['1', 'error', '202'])
+		# robots have separate command limits
+		self.assertEqual([robot._turn_commands for robot in robots.values()], [1, 1])
+
+		self.server.end_turn()
+		lines = self.readlines(3)
+		self.assertEqual(lines[:2], [['0', 'end'], ['1', 'end']])
+		self.assertEqual(lines[2][:3], ['0', 'detect', 'klaas'])
+
+	def test_errors(self):
+		self.client.sendall(b'fleet\nfleet\n0\nx join henk\n' + str(config.host.max_fleet_size).encode() + b' join henk\n0 fleet\n')
+		errors = [line[:3] for line in self.readlines(5)]
+		# malformed lines are answered untagged, errors of robots tagged
+		self.assertEqual(errors, [['error', '302', 'invalid'], ['error', '302', 'invalid'], ['error', '302', 'invalid'], ['error', '206', 'robot'], ['0', 'error', '301']])
+
+	def test_disconnect(self):
+		# closing the connection has all robots leave
+		self.start('henk', 'klaas')
+		self.reader.close()
+		self.client.close()
+		self.connection.join(5)
+		self.assertEqual(self.server._players, {})
+		self.assertEqual(self.server._fleets, {})
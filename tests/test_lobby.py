@@ -0,0 +1,90 @@
+import socket
+from threading import Thread
+import time
+import unittest
+
+from lobotomy import config
+from lobotomy.lobby import Lobby
+from lobotomy.server import LoBotomyServer
+
+class TestChoice(unittest.TestCase):
+	def test_least_loaded(self):
+		lobby = Lobby()
+		lobby.report('a', 1452, 50, 100)
+		lobby.report('b', 1452, 30, 40)
+		lobby.report('c', 1453, 10, 10)
+		# relative load counts, full nodes are skipped
+		self.assertEqual(lobby.choose(), ('a', 1452))
+		# players sent somewhere count until the node reports again
+		lobby.report('a', 1452, 74, 100)
+		self.assertEqual([lobby.choose() for _ in range(3)], [('a', 1452), ('b', 1452), ('a', 1452)])
+
+		lobby.report('a', 1452, 100, 100)
+		lobby.report('b', 1452, 40, 40)
+		self.assertIsNone(lobby.choose())
+
+	def test_invalid_load(self):
+		lobby = Lobby()
+		self.assertRaises(ValueError, lobby.report, 'a', 1452, -1, 0)
+		self.assertRaises(ValueError, lobby.report, 'a', 1452, 0, 0)
+		self.assertIsNone(lobby.choose())
+
+	def test_timeout(self):
+		lobby = Lobby(node_timeout = 0.0)
+		lobby.report('a', 1452, 0, 100)
+		time.sleep(0.01)
+		self.assertIsNone(lobby.choose())
+		self.assertEqual(lobby.nodes, {})
+
+class TestService(unittest.TestCase):
+	def setUp(self):
+		self.lobby = Lobby('127.0.0.1', 0)
+		self.port = self.lobby.bind()
+		self.thread = Thread(target = self.lobby.serve_forever)
+		self.thread.start()
+
+	def tearDown(self):
+		self.lobby.shutdown()
+		self.thread.join()
+
+	def request(self, line):
+		with socket.create_connection(('127.0.0.1', self.port), timeout = 5) as client:
+			client.sendall(line)
+			return client.makefile().readlines()
+
+	def test_redirect(self):
+		self.assertEqual(self.request(b'join henk\n'), ['error 207 no room in any game, try again later\n'])
+
+		node = socket.create_connection(('127.0.0.1', self.port), timeout = 5)
+		node.sendall(b'report localhost 1453 3 10\n')
+		for _ in range(100):
+			if self.lobby.nodes:
+				break
+			time.sleep(0.01)
+		# joining clients are sent to the node and disconnected
+		self.assertEqual(self.request(b'join henk\n'), ['redirect localhost 1453\n'])
+		self.assertEqual(self.lobby.nodes[('localhost', 1453)][0], 4)
+		node.close()
+
+	def test_unsupported(self):
+		self.assertTrue(self.request(b'spawn\n')[0].startswith('error 301'))
+		self.assertTrue(self.request(b'report localhost\n')[0].startswith('error 302'))
+
+	def test_strangers(self):
+		# only allowed addresses can report
+		self.lobby.allowed = {'10.0.0.1'}
+		self.assertTrue(self.request(b'report evil.host 1 0 1000000\n')[0].startswith('error 301'))
+		self.assertEqual(self.lobby.nodes, {})
+
+class TestReport(unittest.TestCase):
+	def test_load_report(self):
+		advertise = config.host.advertise
+		config.host.advertise = 'node1'
+		try:
+			server = LoBotomyServer(port = 1460)
+			client, server_side = socket.socketpair()
+			server.admit(server_side, '10.0.0.1')
+			self.assertEqual(list(server.load_report().values()), ['report', 'node1', 1460, 1, config.host.max_connections])
+			client.close()
+		finally:
+			config.host.advertise = advertise
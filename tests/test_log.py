@@ -0,0 +1,84 @@
+import logging
+import queue
+import threading
+import unittest
+
+from lobotomy import config, log
+from lobotomy.log import DeferredQueueHandler, SamplingFilter
+from lobotomy.simulation import Simulation
+
+class Collector(logging.Handler):
+	def __init__(self):
+		super().__init__()
+		self.records = []
+		self.threads = set()
+
+	def emit(self, record):
+		self.records.append(record)
+		self.threads.add(threading.current_thread())
+
+class TestSamplingFilter(unittest.TestCase):
+	def test_sampling(self):
+		sampler = SamplingFilter({'move': 0.1, 'hit': 0.0}, seed = 1)
+		passed = sum(sampler.admit('move') for _ in range(10000))
+		self.assertAlmostEqual(passed / 10000, 0.1, delta = 0.02)
+		self.assertFalse(sampler.admit('hit'))
+		# events not sampled pass
+		self.assertTrue(all(sampler.admit('scan') for _ in range(100)))
+		self.assertEqual(sampler.dropped, {'move': 10000 - passed, 'hit': 1})
+
+	def test_rate(self):
+		# events are limited separately
+		sampler = SamplingFilter(rate = 1.0, burst = 5)
+		self.assertEqual(sum(sampler.admit('move') for _ in range(10)), 5)
+		self.assertEqual(sum(sampler.admit('fire') for _ in range(10)), 5)
+		self.assertEqual(sampler.dropped, {'move': 5, 'fire': 5})
+
+	def test_filter(self):
+		sampler = SamplingFilter({'move': 0.0})
+		record = logging.makeLogRecord({'event': 'move'})
+		self.assertFalse(sampler.filter(record))
+		# records without an event are not subject to sampling
+		self.assertTrue(sampler.filter(logging.makeLogRecord({})))
+
+class TestQueue(unittest.TestCase):
+	def test_deferred(self):
+		# records are queued as they are, formatting is up to the listener
+		handler = DeferredQueueHandler(queue.Queue(1))
+		record = logging.makeLogRecord({'msg': 'player %s moved', 'args': ('henk',)})
+		handler.handle(record)
+		queued = handler.queue.get_nowait()
+		self.assertIs(queued, record)
+		self.assertEqual(queued.args, ('henk',))
+
+		# a full queue drops records
+		handler.handle(record)
+		handler.handle(record)
+		self.assertEqual(handler.dropped, 1)
+
+class TestSetup(unittest.TestCase):
+	def setUp(self):
+		root = logging.getLogger()
+		self.state = (root.level, list(root.handlers), log.sampler, config.log.rate)
+
+	def tearDown(self):
+		root = logging.getLogger()
+		root.level, root.handlers[:], log.sampler, config.log.rate = self.state
+
+	def test_actions(self):
+		config.log.rate = 0.0
+		collector = Collector()
+		listener = log.setup(logging.INFO, handlers = [collector])
+		simulation = Simulation(10, seed = 1)
+		simulation.run(3)
+		listener.stop()
+
+		records = [record for record in collector.records if record.name == 'lobotomy.actions']
+		self.assertTrue(records)
+		# records are written by the listener and carry what they're about
+		self.assertNotIn(threading.current_thread(), collector.threads)
+		names = {player.name for player in simulation.players}
+		for record in records:
+			self.assertIn(record.event, ('move', 'fire', 'hit', 'death', 'scan', 'detect'))
+			self.assertIn(record.player, names)
+			self.assertIn(record.player, record.getMessage())
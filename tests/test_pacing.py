@@ -0,0 +1,77 @@
+import unittest
+
+from lobotomy import config
+from lobotomy.bot import Hunter
+from lobotomy.pacing import TurnPacer
+from lobotomy.server import LoBotomyServer
+from lobotomy.simulation import Simulation
+
+class Clock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+class TestTurnPacer(unittest.TestCase):
+	def setUp(self):
+		self.clock = Clock()
+		self.pacer = TurnPacer(100, 5000, clock = self.clock)
+
+	def turn(self, delays, resolution = 0.0):
+		duration = self.pacer.begin(resolution)
+		start = self.clock.now
+		for delay in delays:
+			self.clock.now = start + delay
+			self.pacer.arrived()
+		self.clock.now = start + duration / 1000
+		return duration
+
+	def test_quiet(self):
+		# starts out at the maximum, speeding up gradually
+		durations = [self.turn([0.01] * 10) for _ in range(50)]
+		self.assertEqual(durations[0], 5000)
+		self.assertEqual(durations[1], 4500)
+		self.assertEqual(durations[-1], 100)
+		self.assertEqual(durations, sorted(durations, reverse = True))
+
+	def test_slow_players(self):
+		for _ in range(50):
+			self.turn([0.01] * 10)
+		# players needing more time get it right away, but not over the maximum
+		self.turn([0.01] * 10 + [0.8] * 90)
+		self.assertEqual(self.pacer.begin(0.0), 1200)
+		self.turn([3.8] * 10)
+		self.assertEqual(self.pacer.begin(0.0), 5000)
+
+	def test_load(self):
+		for _ in range(50):
+			self.turn([])
+		# turns never get shorter than resolving them takes
+		self.assertEqual(self.turn([], resolution = 0.4), 600)
+
+class TestAdaptiveServer(unittest.TestCase):
+	def setUp(self):
+		self.adaptive = config.game.adaptive_turns
+		config.game.adaptive_turns = True
+
+	def tearDown(self):
+		config.game.adaptive_turns = self.adaptive
+
+	def test_begin(self):
+		simulation = Simulation(5, seed = 1)
+		simulation.run(10)
+		(duration,) = [message[3] for message in simulation.players[0].messages if message[0] == 'begin']
+		# simulated players act instantly
+		self.assertLess(duration, config.game.turn_duration)
+		self.assertEqual(duration, simulation.server.turn_duration)
+
+	def test_bots(self):
+		# in-process bots act instantly, they don't count towards pacing
+		server = LoBotomyServer(seed = 1)
+		for i in range(5):
+			server.add_bot(Hunter(), 'hunter{}'.format(i))
+		for _ in range(5):
+			server.end_turn()
+			server.begin_turn()
+		self.assertEqual(server.pacer._arrivals, [])
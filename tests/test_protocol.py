@@ -0,0 +1,58 @@
+import unittest
+
+from lobotomy import protocol
+
+class TestParse(unittest.TestCase):
+	def test_parse(self):
+		message = protocol.parse_msg('fire 1.5 0.2 0.1 0.3\n')
+		self.assertEqual(list(message.items()), [('command', 'fire'), ('angle', 1.5), ('distance', 0.2), ('radius', 0.1), ('charge', 0.3)])
+		message = protocol.parse_msg('join Henk')
+		self.assertEqual(message['name'], 'Henk')
+		self.assertEqual(list(protocol.parse_msg('spawn').values()), ['spawn'])
+
+	def test_whitespace(self):
+		# any amount of whitespace separates arguments
+		self.assertEqual(protocol.parse_msg('  move\t0.5   0.1 \r\n'), protocol.move(0.5, 0.1))
+
+	def test_malformed(self):
+		self.assertRaises(ValueError, protocol.parse_msg, 'move up 0.1')
+		self.assertRaises(ValueError, protocol.parse_msg, 'move 0.5')
+		self.assertRaises(KeyError, protocol.parse_msg, 'teleport 0.5 0.5')
+
+	def test_arguments(self):
+		# commands as received are parsed straight from bytes
+		name, converters = protocol.SIGNATURES[b'fire']
+		self.assertEqual(name, 'fire')
+		self.assertEqual(protocol.parse_arguments(converters, b'1.5 0.2 0.1 0.3'.split()), [1.5, 0.2, 0.1, 0.3])
+		self.assertEqual(protocol.parse_arguments(protocol.SIGNATURES[b'join'][1], [b'Henk']), ['Henk'])
+		self.assertEqual(protocol.parse_arguments(protocol.SIGNATURES[b'udp'][1], [b'1452']), [1452])
+		self.assertRaises(ValueError, protocol.parse_arguments, converters, b'up 0.2 0.1 0.3'.split())
+		self.assertRaises(ValueError, protocol.parse_arguments, converters, [b'1.5'])
+		self.assertRaises(ValueError, protocol.parse_arguments, protocol.SIGNATURES[b'join'][1], [b'\xff'])
+
+	def test_frame(self):
+		buffer = bytearray(64)
+		data = b'move 0.5 0.1\r\n\nscan 0.2\nfi'
+		buffer[:len(data)] = data
+		lines, filled = protocol.frame_lines(buffer, len(data))
+		self.assertEqual(lines, [b'move 0.5 0.1\r', b'', b'scan 0.2'])
+		# the remainder is kept at the start, waiting for the rest of its line
+		self.assertEqual(bytes(buffer[:filled]), b'fi')
+		self.assertEqual(protocol.frame_lines(buffer, filled), ((), 2))
+
+class TestFormat(unittest.TestCase):
+	def test_format(self):
+		self.assertEqual(protocol.format_msg(('begin', 12, 0.5)), b'begin 12 0.5\n')
+		self.assertEqual(protocol.format_msg(protocol.end().values()), b'end\n')
+
+	def test_roundtrip(self):
+		# formatting and parsing a message should result in the same message
+		for message in (
+			protocol.welcome(protocol.VERSION, 1.0, 0.2, 5000, -1),
+			protocol.begin(123, 0.123456789, 5000),
+			protocol.hit('Klaas', 1.123, 0.4),
+			protocol.detect('Henk', 6.2831, 1e-05, 1.0),
+			protocol.death(5),
+		):
+			line = protocol.format_msg(message.values()).decode('utf-8')
+			self.assertEqual(protocol.parse_msg(line), message)
@@ -0,0 +1,100 @@
+import bisect
+import random
+import unittest
+
+from lobotomy.event import Envelope
+from lobotomy.score import RankedList, Scoreboard
+from lobotomy.simulation import Simulation, idle, scripted
+
+class TestRankedList(unittest.TestCase):
+	def test_random(self):
+		# should behave like a sorted list
+		rng = random.Random(1)
+		ranked, expected = RankedList(seed = 2), []
+		for _ in range(5000):
+			if expected and rng.random() < 0.4:
+				key = rng.choice(expected)
+				ranked.remove(key)
+				expected.remove(key)
+			else:
+				key = (rng.randrange(20), rng.random())
+				ranked.insert(key)
+				bisect.insort(expected, key)
+
+			index = rng.randrange(len(expected))
+			self.assertEqual(ranked[index], expected[index])
+			self.assertEqual(ranked.range(index - 2, index + 3), expected[max(index - 2, 0):index + 3])
+			key = (rng.randrange(20), rng.random())
+			self.assertEqual(ranked.index(key), bisect.bisect_left(expected, key))
+
+		self.assertEqual(list(ranked), expected)
+		self.assertEqual(len(ranked), len(expected))
+
+	def test_missing(self):
+		ranked = RankedList()
+		ranked.insert(1)
+		with self.assertRaises(KeyError):
+			ranked.remove(2)
+		with self.assertRaises(IndexError):
+			ranked[1]
+
+class TestScoreboard(unittest.TestCase):
+	def setUp(self):
+		self.board = Scoreboard()
+		self.envelope = Envelope(None)
+		for name in 'abcd':
+			self.envelope.append('player_spawn', {'player': name})
+
+	def hit(self, attacker, subject, fatal = False):
+		self.envelope.append('player_hit', {'attacker': attacker, 'player': subject, 'fatal': fatal})
+
+	def end_turn(self, turn):
+		# hands over the events so far, starting the envelope of turn
+		self.board.accept_batch(self.envelope)
+		self.envelope = Envelope(turn)
+
+	def test_kills(self):
+		self.end_turn(1)
+		# all players hitting a player in the turn it dies score
+		self.hit('a', 'c')
+		self.hit('b', 'c', fatal = True)
+		# hitting yourself doesn't count
+		self.hit('d', 'd', fatal = True)
+		self.end_turn(2)
+		self.assertEqual([self.board.score(name) for name in 'abcd'], [1, 1, 0, 0])
+		self.assertEqual(self.board.scores['c'], [0, 0, 1])
+
+		# hits of an earlier turn don't count, a player dying from
+		# exhaustion only earns points for that turn's hits
+		self.hit('a', 'b')
+		self.end_turn(3)
+		self.hit('c', 'b')
+		self.envelope.append('player_scan', {'player': 'b', 'energy': (0.1, -0.2)})
+		self.end_turn(4)
+		self.assertEqual([self.board.score(name) for name in 'abcd'], [1, 1, 1, 0])
+
+	def test_ranking(self):
+		self.hit('c', 'a', fatal = True)
+		self.hit('c', 'b', fatal = True)
+		self.hit('b', 'd', fatal = True)
+		self.end_turn(1)
+		self.assertEqual(self.board.top(2), [('c', 2), ('b', 1)])
+		self.assertEqual([self.board.rank(name) for name in 'abcd'], [3, 2, 1, 3])
+		self.assertEqual(self.board.around('b', 1), [('c', 2), ('b', 1), ('a', 0)])
+
+	def test_reconnect(self):
+		# scores are kept by name, across games
+		simulation = Simulation(2, behavior = idle, seed = 1)
+		first, second = simulation.players
+		first.behavior = scripted({1: [('fire', (0.0, 0.0, 0.1, 1.0))]})
+		second.location = first.location
+		simulation.step()
+		simulation.server.flush_events()
+		board = simulation.server.scoreboard
+		self.assertEqual(board.score(first.name), 1)
+
+		first.shutdown()
+		simulation.step()
+		simulation.server.flush_events()
+		self.assertEqual(board.score(first.name), 1)
+		self.assertEqual(board.rank(first.name), 1)
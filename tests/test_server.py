@@ -0,0 +1,317 @@
+import socket
+import tempfile
+import time
+import unittest
+
+from lobotomy import config
+from lobotomy.event import Listener
+from lobotomy.player import PlayerState
+from lobotomy.server import LoBotomyServer
+from lobotomy.simulation import Simulation, idle, scripted
+from lobotomy.state import MOVE
+from lobotomy.util import TokenBucket
+
+class Recorder(Listener):
+	def __init__(self):
+		super().__init__()
+		self.events = []
+
+	def accept(self, **event):
+		self.events.append(event)
+
+class TestBookkeeping(unittest.TestCase):
+	def setUp(self):
+		# first player moves to exhaustion in the first turn, the other idles
+		self.simulation = Simulation(2, behavior = scripted({1: [('move', (0.0, 0.5))]}), seed = 1)
+		self.server = self.simulation.server
+		self.dead, self.other = self.simulation.players
+		self.other.behavior = idle
+		self.recorder = Recorder()
+		self.server.add_listener(self.recorder)
+
+	def test_death(self):
+		self.simulation.step()
+		self.assertNotIn(self.dead, self.server._alive)
+		self.assertIn(self.dead, self.server._in_game)
+		self.assertIn(self.other, self.server._alive)
+		self.assertIn(self.dead, self.server._respawns[1 + config.game.dead_turns])
+
+	def test_respawn_ready(self):
+		self.simulation.run(config.game.dead_turns)
+		self.assertEqual(self.dead.dead_turns, config.game.dead_turns)
+		self.simulation.step()
+		# wait should be over, respawned in the same turn
+		ready = [event for event in self.recorder.events if event['type'] == 'player_respawn_ready']
+		self.assertEqual(ready, [{'type': 'player_respawn_ready', 'player': self.dead.name}])
+		self.assertEqual(self.dead.dead_turns, 0)
+		self.assertFalse(self.server._respawns)
+		# the simulated player respawns in the turn after
+		self.simulation.step()
+		self.assertIn(self.dead, self.server._alive)
+
+	def test_unregister(self):
+		self.simulation.step()
+		self.server.unregister(self.dead.name, self.dead)
+		self.server.unregister(self.other.name, self.other)
+		# names are freed right away, players leave the game at the turn boundary
+		self.assertFalse(self.server._players)
+		self.assertEqual(len(self.server._in_game), 2)
+		self.server.apply_commands()
+		self.assertFalse(self.server._in_game)
+		self.assertEqual(len(self.server.table), 0)
+		self.assertFalse(self.server._alive)
+		# timers of players that left should be ignored
+		self.simulation.run(config.game.dead_turns + 1)
+		self.assertNotIn('player_respawn_ready', [event['type'] for event in self.recorder.events])
+
+class TestPipelined(unittest.TestCase):
+	def simulate(self, pipelined):
+		config.game.pipelined = pipelined
+		try:
+			# all players fire at their own location every turn, hitting everyone
+			script = {turn: [('fire', (0.0, 0.0, 0.1, 0.05))] for turn in range(1, 6)}
+			simulation = Simulation(3, (0.1, 0.1), behavior = scripted(script), seed = 1)
+		finally:
+			config.game.pipelined = False
+
+		# log all messages, signals for a turn may arrive during the next
+		messages = []
+		for player in simulation.players:
+			received = []
+			player.send = lambda command, received = received: received.append(tuple(command))
+			messages.append(received)
+
+		simulation.run(5)
+
+		return simulation, messages
+
+	def test_same_outcome(self):
+		sequential, _ = self.simulate(False)
+		pipelined, _ = self.simulate(True)
+		self.assertTrue(pipelined.server.pipelined)
+		# pipelined mode heals for the next turn as soon as a turn is resolved
+		sequential.server.heal_players()
+		self.assertEqual([p.serialize() for p in sequential.players], [p.serialize() for p in pipelined.players])
+
+	def test_ordering(self):
+		simulation, messages = self.simulate(True)
+		for received in messages:
+			commands = [message[0] for message in received]
+			# split the stream into the parts following every end command
+			segments = ' '.join(commands).split('end')
+			self.assertEqual(len(segments), 6)
+			# hits for a turn arrive after it ended, but before the next one ends
+			for segment in segments[1:]:
+				self.assertEqual(segment.split().count('hit'), 3)
+
+	def test_death_and_begin(self):
+		# the turn loop begins the next turn while the thread resolving the
+		# previous one signals deaths, in either order a death sticks
+		simulation = Simulation(2, behavior = idle, seed = 1)
+		first, second = simulation.players
+		simulation.step()
+
+		# deaths without a wait, to respawn right away
+		first.signal_begin(2, 1.0, config.game.turn_duration)
+		first.signal_death(0)
+		second.signal_death(0)
+		second.signal_begin(2, 1.0, config.game.turn_duration)
+		for player in simulation.players:
+			self.assertIs(player.state, PlayerState.DEAD)
+			player.signal_end()
+			self.assertIs(player.state, PlayerState.DEAD)
+			# and the player can spawn again
+			player.handle_spawn()
+			self.assertIs(player.state, PlayerState.WAITING)
+
+class TestCommands(unittest.TestCase):
+	def setUp(self):
+		self.simulation = Simulation(2, behavior = idle, seed = 1)
+		self.server = self.simulation.server
+		self.first, self.second = self.simulation.players
+		self.server.begin_turn()
+
+	def test_last_write_wins(self):
+		# of repeated requests for an action, the last one is applied
+		self.first.handle_move(0.0, 0.1)
+		self.first.handle_move(1.0, 0.2)
+		self.assertIsNone(self.first.move_action)
+		self.server.apply_commands()
+		self.assertEqual(self.first.move_action, (1.0, 0.2))
+		self.assertEqual(list(self.server._pending[MOVE]), [self.first])
+
+		# a later request replaces an applied one
+		self.first.handle_move(2.0, 0.3)
+		self.server.apply_commands()
+		self.assertEqual(self.first.move_action, (2.0, 0.3))
+		self.assertEqual(list(self.server._pending[MOVE]), [self.first])
+
+	def test_late_actions(self):
+		# actions requested for a turn that has ended should be ignored
+		self.first.handle_scan(0.1)
+		self.server.turn_number += 1
+		self.server.apply_commands()
+		self.assertIsNone(self.first.scan_action)
+
+	def test_spawn(self):
+		# spawning takes effect at the turn boundary
+		self.server.player_death(self.first)
+		self.first.signal_death(0)
+		self.first.handle_spawn()
+		self.assertEqual(self.first.location, (None, None))
+		self.server.apply_commands()
+		self.assertIsNotNone(self.first.location[0])
+		self.assertIn(self.first, self.server._alive)
+
+class TestLimits(unittest.TestCase):
+	def setUp(self):
+		self.simulation = Simulation(1, behavior = idle, seed = 1)
+		self.player = self.simulation.players[0]
+		self.player.messages = []
+
+	def errors(self):
+		return [message for message in self.player.messages if message[0] == 'error']
+
+	def test_turn_commands(self):
+		admitted = [self.player.admit('move') for _ in range(config.player.turn_commands + 5)]
+		self.assertEqual(admitted.count(True), config.player.turn_commands)
+		# dropping commands is reported once
+		self.assertEqual([error[1] for error in self.errors()], [303])
+
+		# a new turn resets the limit
+		self.player.signal_begin(2, 1.0, 5000)
+		self.assertTrue(self.player.admit('scan'))
+
+	def test_rate(self):
+		now = [0.0]
+		self.player._bucket = TokenBucket(10.0, 2, clock = lambda: now[0])
+		self.assertTrue(self.player.admit('spawn'))
+		self.assertTrue(self.player.admit('spawn'))
+		self.assertFalse(self.player.admit('spawn'))
+		now[0] += 0.1
+		self.assertTrue(self.player.admit('spawn'))
+		self.assertFalse(self.player.admit('spawn'))
+		self.assertEqual(len(self.errors()), 1)
+
+class TestAdmission(unittest.TestCase):
+	def setUp(self):
+		self.limits = (config.host.max_connections, config.host.max_host_connections, config.host.max_handshakes, config.host.handshake_timeout)
+		self.server = LoBotomyServer(seed = 1)
+		self.clients = []
+
+	def tearDown(self):
+		config.host.max_connections, config.host.max_host_connections, config.host.max_handshakes, config.host.handshake_timeout = self.limits
+		for client in self.clients:
+			client.close()
+
+	def connect(self, host = '10.0.0.1'):
+		client, server_side = socket.socketpair()
+		client.settimeout(5)
+		self.clients.append(client)
+		return client, self.server.admit(server_side, host)
+
+	def test_host_limit(self):
+		config.host.max_host_connections = 2
+		self.assertIsNotNone(self.connect()[1])
+		self.assertIsNotNone(self.connect()[1])
+		client, player = self.connect()
+		self.assertIsNone(player)
+		self.assertTrue(client.makefile().readline().startswith('error 203'))
+		# other addresses are still welcome
+		self.assertIsNotNone(self.connect('10.0.0.2')[1])
+
+	def test_handshakes(self):
+		config.host.max_handshakes = 1
+		client, player = self.connect()
+		self.assertIsNone(self.connect()[1])
+
+		# joining frees up room for the next client
+		client.sendall(b'join henk\n')
+		self.assertTrue(client.makefile().readline().startswith('welcome'))
+		self.assertIsNotNone(self.connect()[1])
+
+	def test_handshake_timeout(self):
+		config.host.handshake_timeout = 0.0
+		client, player = self.connect()
+		closed, reclaimed = self.server.expire_handshakes()
+		self.assertEqual(closed, 1)
+		self.assertGreater(reclaimed, 0)
+		self.assertEqual(self.server.expired, {'clients': 1, 'bytes': reclaimed})
+		lines = client.makefile().readlines()
+		self.assertTrue(lines[0].startswith('error 204'))
+		# the connection no longer counts towards the limits
+		self.assertEqual(self.server._connected, {})
+		self.assertEqual(self.server._hosts, {})
+
+	def test_joined(self):
+		config.host.handshake_timeout = 0.0
+		client, player = self.connect()
+		client.sendall(b'join henk\n')
+		self.assertTrue(client.makefile().readline().startswith('welcome'))
+
+		# joined players may just be listening
+		self.assertEqual(self.server.expire_handshakes(), (0, 0))
+		self.assertIn('henk', self.server._players)
+
+class TestSessions(unittest.TestCase):
+	def setUp(self):
+		self.server = LoBotomyServer(seed = 1)
+		self.client, server_side = socket.socketpair()
+		self.client.settimeout(5)
+		self.server.configure(server_side)
+		self.player = self.server.admit(server_side, '10.0.0.1')
+
+	def tearDown(self):
+		self.client.close()
+
+	def test_line_length(self):
+		self.client.sendall(b'join ' + b'x' * config.host.max_line_length)
+		lines = self.client.makefile().readlines()
+		self.assertEqual(len(lines), 1)
+		self.assertTrue(lines[0].startswith('error 304'))
+
+	def test_lines(self):
+		# lines split over several reads or sharing one should all be handled
+		self.client.sendall(b'jo')
+		time.sleep(0.01)
+		self.client.sendall(b'in henk\r\n\nspawn\nspawn\n')
+		reader = self.client.makefile()
+		self.assertTrue(reader.readline().startswith('welcome'))
+		self.assertTrue(reader.readline().startswith('error 202'))
+
+	def test_framing(self):
+		# lines sharing reads and straddling them, none lost
+		padding = (b' ' * (config.host.max_line_length - 1) + b'\n') * 20
+		self.client.sendall(b'join henk\n' + padding + b'bogus\n' * 5 + padding + b'join \xff\n')
+		reader = self.client.makefile(errors = 'replace')
+		self.assertTrue(reader.readline().startswith('welcome'))
+		self.assertEqual([reader.readline().split()[1] for _ in range(6)], ['301'] * 5 + ['302'])
+
+	def test_disconnect(self):
+		# a client closing its connection leaves the game
+		self.client.sendall(b'join henk\n')
+		self.assertTrue(self.client.makefile().readline().startswith('welcome'))
+		self.client.close()
+		self.player.join(5)
+		self.assertNotIn('henk', self.server._players)
+		self.assertEqual(self.server._connected, {})
+
+class TestConfiguration(unittest.TestCase):
+	def setUp(self):
+		# parsing arguments sets every option, restore them afterwards
+		self.saved = [(section, dict(vars(section))) for section in (config.host, config.game, config.log)]
+
+	def tearDown(self):
+		for section, values in self.saved:
+			for name, value in values.items():
+				if not name.startswith('__'):
+					setattr(section, name, value)
+
+	def test_arguments(self):
+		with tempfile.TemporaryDirectory() as directory:
+			config.parse_args(['--pipelined', '--adaptive-turns', '--analytics', directory])
+			server = LoBotomyServer()
+			self.assertTrue(server.pipelined)
+			self.assertIsNotNone(server.pacer)
+			self.assertIsNotNone(server.analytics)
+			server.analytics.close()
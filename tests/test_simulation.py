@@ -0,0 +1,43 @@
+import unittest
+
+from lobotomy import config
+from lobotomy.player import PlayerState
+from lobotomy.simulation import Simulation, idle, scripted
+
+class TestSimulation(unittest.TestCase):
+	def test_deterministic(self):
+		# two simulations with the same seed should end up in the same state
+		first = Simulation(20, seed = 42)
+		second = Simulation(20, seed = 42)
+		first.run(10)
+		second.run(10)
+		self.assertEqual([p.serialize() for p in first.players], [p.serialize() for p in second.players])
+		self.assertEqual([p.messages for p in first.players], [p.messages for p in second.players])
+
+	def test_idle(self):
+		# idle players should only ever see turns begin and end
+		simulation = Simulation(5, behavior = idle, seed = 1)
+		simulation.run(3)
+		for player in simulation.players:
+			self.assertEqual(player.messages, [('begin', 3, 1.0, config.game.turn_duration), ('end',)])
+			self.assertEqual(player.energy, 1.0)
+
+	def test_exhaustion(self):
+		# moving to exhaustion should kill a player and cancel its other actions
+		behavior = scripted({1: [('move', (0.0, 0.5)), ('fire', (0.0, 0.1, 0.1, 0.1)), ('scan', (0.1,))]})
+		simulation = Simulation(1, behavior = behavior, seed = 1)
+		simulation.step()
+		player = simulation.players[0]
+		self.assertIs(player.state, PlayerState.DEAD)
+		self.assertEqual(player.location, (None, None))
+		self.assertEqual(player.messages[-1], ('death', 5))
+
+	def test_respawn(self):
+		# a dead player should respawn once it's allowed to
+		behavior = scripted({1: [('move', (0.0, 0.5))]})
+		simulation = Simulation(1, behavior = behavior, seed = 1)
+		player = simulation.players[0]
+		simulation.run(5)
+		self.assertIs(player.state, PlayerState.DEAD)
+		simulation.run(2)
+		self.assertIsNot(player.state, PlayerState.DEAD)
@@ -0,0 +1,115 @@
+import random
+import unittest
+
+from lobotomy.server import LoBotomyServer
+from lobotomy import spatial
+from lobotomy.spatial import CellGrid, cell_size
+from lobotomy.util import generate_wrapped_bounds, WrappedRadius
+from lobotomy.simulation import Simulation
+from tests import differential
+
+class ReferenceServer(LoBotomyServer):
+	"""
+	Engine checking all players for every area query.
+	"""
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.neighbor_lists = False
+
+class TestCellGrid(unittest.TestCase):
+	def test_candidates(self):
+		# candidates should include every item within bounds, in order
+		rng = random.Random(1)
+		grid = CellGrid((2.0, 2.0), 0.1)
+		items = [(index, rng.uniform(0, 2), rng.uniform(0, 2)) for index in range(200)]
+		for item in items:
+			grid.add(*item)
+
+		for _ in range(100):
+			x, y, radius = rng.uniform(-0.2, 2.2), rng.uniform(-0.2, 2.2), rng.uniform(0, 0.5)
+			bounds = (x - radius, y - radius, x + radius, y + radius)
+			candidates = grid.candidates(bounds)
+			self.assertEqual(candidates, sorted(candidates))
+			inside = [index for (index, ix, iy) in items if bounds[0] <= ix < bounds[2] and bounds[1] <= iy < bounds[3]]
+			self.assertTrue(set(inside) <= set(candidates))
+
+	def test_range_reuse(self):
+		grid = CellGrid((2.0, 2.0), 0.5)
+		grid.add('a', 0.1, 0.1)
+		grid.add('b', 0.6, 0.1)
+		self.assertEqual(grid.candidates((0.0, 0.0, 0.7, 0.2)), ['a', 'b'])
+		# bounds covering the same cells reuse the candidate list
+		self.assertEqual(grid.candidates((0.2, 0.3, 0.9, 0.4)), ['a', 'b'])
+		self.assertEqual(grid.stats['queries'], 2)
+		self.assertEqual(grid.stats['range_hits'], 1)
+		self.assertEqual(grid.stats['cells_visited'], 2)
+
+	def test_cell_size(self):
+		self.assertAlmostEqual(cell_size((2.0, 2.0), 16, per_cell = 4.0), 1.0)
+		# empty and extremely crowded fields should still result in sensible cells
+		self.assertAlmostEqual(cell_size((2.0, 2.0), 0, per_cell = 1.0), 2.0)
+		self.assertAlmostEqual(cell_size((2.0, 2.0), 10 ** 9, minimum = 0.05), 0.05)
+
+class TestJoin(unittest.TestCase):
+	def setUp(self):
+		rng = random.Random(2)
+		self.grid = CellGrid((2.0, 2.0), 0.25)
+		self.items = [(index, rng.uniform(0, 2), rng.uniform(0, 2)) for index in range(300)]
+		for item in self.items:
+			self.grid.add(*item)
+		# include blasts over edges and corners, and blasts larger than the field
+		self.circles = [WrappedRadius((rng.uniform(0, 2), rng.uniform(0, 2)), rng.choice((0.05, 0.3, 1.2)), (2.0, 2.0)) for _ in range(60)]
+
+	def expected(self, circle):
+		# items in the order querying the wrapped bounds one by one finds them
+		(x, y), radius = circle.point, circle.radius
+		found = {}
+		for x1, y1, x2, y2 in generate_wrapped_bounds((0, 0, 2.0, 2.0), (x - radius, y - radius, x + radius, y + radius)):
+			for index, ix, iy in self.items:
+				if x1 <= ix < x2 and y1 <= iy < y2 and (ix, iy) in circle:
+					found.setdefault(index, None)
+		return list(found)
+
+	def test_strategies(self):
+		# both strategies should find the same items as querying every circle
+		expected = [self.expected(circle) for circle in self.circles]
+		regions = [
+			[(bounds, self.grid.cell_range(bounds)) for bounds in generate_wrapped_bounds((0, 0, 2.0, 2.0), (c.point[0] - c.radius, c.point[1] - c.radius, c.point[0] + c.radius, c.point[1] + c.radius))]
+			for c in self.circles
+		]
+		self.assertEqual(spatial._join_circles(self.grid, self.circles, regions), expected)
+		self.assertEqual(spatial._join_items(self.grid, self.circles, regions), expected)
+
+	def test_within(self):
+		# the fast check should agree with WrappedRadius, edges included
+		rng = random.Random(3)
+		for circle in self.circles:
+			points = [(rng.uniform(0, 2), rng.uniform(0, 2)) for _ in range(50)]
+			points.append(((circle.point[0] + circle.radius) % 2.0, circle.point[1]))
+			for point in points:
+				self.assertEqual(spatial.within(circle, point), point in circle)
+
+	def test_choice(self):
+		# few small circles are joined by iterating the circles, many by
+		# iterating the items
+		spatial.join(self.grid, self.circles[:1], (2.0, 2.0))
+		self.assertEqual(self.grid.stats['circle_joins'], 1)
+		spatial.join(self.grid, self.circles, (2.0, 2.0))
+		self.assertEqual(self.grid.stats['item_joins'], 1)
+
+class TestNeighborLists(unittest.TestCase):
+	def test_differential(self):
+		# the grid should find exactly the players the reference finds, in the
+		# same order
+		differential.check(ReferenceServer, LoBotomyServer, runs = 10, num_players = 40, field_dimensions = (4.0, 4.0))
+		# ...also with few fires per turn, iterating the blasts rather than the players
+		differential.check(ReferenceServer, LoBotomyServer, runs = 10, num_players = 40, num_turns = 6, field_dimensions = (8.0, 8.0))
+
+	def test_stats(self):
+		simulation = Simulation(200, (4.0, 4.0), seed = 3)
+		simulation.run(3)
+		stats = simulation.server.neighbor_stats
+		self.assertGreater(stats['queries'], 0)
+		# the grid should have to check fewer players than the reference
+		self.assertLess(stats['candidates'], stats['reference_candidates'])
@@ -0,0 +1,62 @@
+from threading import Thread
+import unittest
+
+from lobotomy.state import MOVE, PlayerTable
+
+class TestPlayerTable(unittest.TestCase):
+	def setUp(self):
+		self.table = PlayerTable()
+
+	def test_allocate(self):
+		first = self.table.allocate('first')
+		second = self.table.allocate('second')
+		self.assertNotEqual(first, second)
+		self.assertEqual(len(self.table), 2)
+		self.assertEqual(self.table.owners[second], 'second')
+		# fresh slots are not on the battlefield
+		self.assertNotEqual(self.table.x[first], self.table.x[first])
+
+	def test_release(self):
+		slot = self.table.allocate('first')
+		self.table.energy[slot] = 0.5
+		self.table.actions[slot] = MOVE
+		self.table.release(slot)
+		self.assertEqual(len(self.table), 0)
+		# released slots should be reused, with fresh values
+		self.assertEqual(self.table.allocate('second'), slot)
+		self.assertEqual(self.table.energy[slot], 0.0)
+		self.assertEqual(self.table.actions[slot], 0)
+
+	def test_concurrent_allocate(self):
+		# connections' threads allocate slots at the same time
+		slots = {}
+
+		def allocate(thread):
+			for i in range(1000):
+				owner = (thread, i)
+				slots[owner] = self.table.allocate(owner)
+				if i % 3 == 0:
+					self.table.release(slots.pop(owner))
+
+		threads = [Thread(target = allocate, args = (thread,)) for thread in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(len(set(slots.values())), len(slots))
+		self.assertTrue(all(self.table.owners[slot] == owner for (owner, slot) in slots.items()))
+		self.assertEqual(len(self.table.x), len(self.table.owners))
+		self.assertEqual(len(self.table.actions), len(self.table.owners))
+
+	def test_heal(self):
+		slots = [self.table.allocate(i) for i in range(3)]
+		self.table.energy[slots[0]] = 0.1
+		self.table.energy[slots[1]] = 0.9
+		self.table.energy[slots[2]] = 0.1
+		healed = self.table.heal(slots[:2], 0.2, 1.0)
+		self.assertEqual([(slot, prev) for (slot, prev, energy) in healed], [(slots[0], 0.1), (slots[1], 0.9)])
+		self.assertAlmostEqual(self.table.energy[slots[0]], 0.3)
+		self.assertEqual(self.table.energy[slots[1]], 1.0)
+		# slots not provided should be left alone
+		self.assertEqual(self.table.energy[slots[2]], 0.1)
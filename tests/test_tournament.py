@@ -0,0 +1,39 @@
+import unittest
+
+from lobotomy import tournament
+from lobotomy.event import Envelope
+
+ENTRIES = [('Hunter', 2), ('Wanderer', 2)]
+
+class TestTournament(unittest.TestCase):
+	def test_match(self):
+		result = tournament.play_match((0, 1, ENTRIES, 30, (1.0, 1.0)))
+		self.assertEqual(set(result['scores']), {'Hunter', 'Wanderer'})
+		# matches are reproducible
+		self.assertEqual(tournament.play_match((0, 1, ENTRIES, 30, (1.0, 1.0)))['scores'], result['scores'])
+
+	def test_tally(self):
+		envelope = Envelope(1)
+		envelope.append('player_hit', dict(player = 'b', attacker = 'a', charge = 0.5, fatal = True))
+		envelope.append('player_hit', dict(player = 'a', attacker = 'a', charge = 0.5, fatal = True))
+		envelope.append('player_move', dict(player = 'b', energy = (0.1, -0.1)))
+		envelope.append('player_heal', dict(player = 'b', energy = (0.1, 0.3)))
+		tally = tournament.Tally()
+		tally.accept_batch(envelope)
+		self.assertEqual(tally.players['a'], {'kills': 1, 'deaths': 1, 'hits': 2, 'damage': 1.0})
+		self.assertEqual(tally.players['b'], {'kills': 0, 'deaths': 2, 'hits': 0, 'damage': 0})
+
+	def test_pool(self):
+		# playing matches in parallel should not change their outcome
+		parallel = tournament.run_tournament(ENTRIES, 4, 20, (1.0, 1.0), seed = 2, processes = 2)
+		serial = tournament.run_tournament(ENTRIES, 4, 20, (1.0, 1.0), seed = 2, processes = 1)
+		self.assertEqual([result['scores'] for result in parallel], [result['scores'] for result in serial])
+
+	def test_aggregate(self):
+		results = [
+			{'scores': {'a': {'kills': 2, 'deaths': 0, 'hits': 2, 'damage': 1.0}, 'b': {'kills': 1, 'deaths': 2, 'hits': 1, 'damage': 0.5}}},
+			{'scores': {'a': {'kills': 1, 'deaths': 0, 'hits': 1, 'damage': 0.5}, 'b': {'kills': 1, 'deaths': 1, 'hits': 1, 'damage': 0.5}}},
+		]
+		totals = tournament.aggregate(results)
+		self.assertEqual(totals['a'], {'kills': 3, 'deaths': 0, 'hits': 3, 'damage': 1.5, 'wins': 1})
+		self.assertEqual(totals['b']['wins'], 0)
@@ -1,15 +1,150 @@
+import math
+import random
+import threading
 import unittest
 
 from lobotomy import util
 
+# field used throughout the tests, as (x1, y1, x2, y2) and (width, height)
+FIELD = (0.0, 0.0, 2.0, 2.0)
+FIELD_SIZE = (2.0, 2.0)
+
+def wrapped_delta(a, b, size):
+	"""
+	Reference implementation of the shortest distance between a and b on an
+	axis of the given size that wraps.
+	"""
+	delta = abs(a - b) % size
+	return min(delta, size - delta)
+
 class TestAngle(unittest.TestCase):
-	pass
+	def test_axes(self):
+		# angles are measured from the y axis, towards the x axis
+		self.assertAlmostEqual(util.angle((0, 0), (0, 1)), 0.0)
+		self.assertAlmostEqual(util.angle((0, 0), (1, 0)), math.pi / 2)
+		self.assertAlmostEqual(util.angle((0, 0), (0, -1)), math.pi)
+		self.assertAlmostEqual(util.angle((0, 0), (-1, 0)), math.pi * 3 / 2)
+
+	def test_range(self):
+		# angles should always be in [0, 2π)
+		rng = random.Random(1)
+		for _ in range(1000):
+			a = (rng.uniform(-2, 2), rng.uniform(-2, 2))
+			b = (rng.uniform(-2, 2), rng.uniform(-2, 2))
+			self.assertTrue(0.0 <= util.angle(a, b) < 2 * math.pi)
+
+	def test_opposite(self):
+		# the angle seen from b should be opposite to that seen from a
+		a, b = (0.3, 0.4), (1.2, 1.9)
+		self.assertAlmostEqual((util.angle(a, b) - util.angle(b, a)) % (2 * math.pi), math.pi)
 
 class TestDistance(unittest.TestCase):
-	pass
+	def test_distance(self):
+		self.assertEqual(util.distance((0, 0), (0, 0)), 0.0)
+		self.assertEqual(util.distance((0, 0), (3, 4)), 5.0)
+		self.assertEqual(util.distance((3, 4), (0, 0)), 5.0)
+		self.assertEqual(util.distance((-1, -1), (2, 3)), 5.0)
+
+class TestMoveWrapped(unittest.TestCase):
+	def test_move(self):
+		# moves along the x axis for angle 0, along the y axis for angle π/2
+		x, y = util.move_wrapped((0.5, 0.5), 0.0, 0.2, FIELD_SIZE)
+		self.assertAlmostEqual(x, 0.7)
+		self.assertAlmostEqual(y, 0.5)
+		x, y = util.move_wrapped((0.5, 0.5), math.pi / 2, 0.2, FIELD_SIZE)
+		self.assertAlmostEqual(x, 0.5)
+		self.assertAlmostEqual(y, 0.7)
+
+	def test_wrap(self):
+		# moving over an edge should end up on the other side of the field
+		x, y = util.move_wrapped((1.9, 0.5), 0.0, 0.2, FIELD_SIZE)
+		self.assertAlmostEqual(x, 0.1)
+		x, y = util.move_wrapped((0.5, 0.1), math.pi * 3 / 2, 0.2, FIELD_SIZE)
+		self.assertAlmostEqual(y, 1.9)
+		# moving over a corner wraps both axes
+		x, y = util.move_wrapped((0.1, 0.1), math.pi * 5 / 4, math.sqrt(0.08), FIELD_SIZE)
+		self.assertAlmostEqual(x, 1.9)
+		self.assertAlmostEqual(y, 1.9)
+
+	def test_range(self):
+		# new locations should always be inside the field
+		rng = random.Random(2)
+		for _ in range(1000):
+			x, y = util.move_wrapped((rng.uniform(0, 2), rng.uniform(0, 2)), rng.uniform(0, 2 * math.pi), rng.uniform(0, 5), FIELD_SIZE)
+			self.assertTrue(0.0 <= x < 2.0)
+			self.assertTrue(0.0 <= y < 2.0)
 
 class TestWrappedBoundsGenerator(unittest.TestCase):
-	pass
+	def assertCovers(self, target):
+		# every point in the field should be in one of the generated bounds if
+		# and only if it is in target when wrapping
+		bounds = list(util.generate_wrapped_bounds(FIELD, target))
+		tx1, ty1, tx2, ty2 = target
+		cx, cy = (tx1 + tx2) / 2, (ty1 + ty2) / 2
+		rx, ry = (tx2 - tx1) / 2, (ty2 - ty1) / 2
+		steps = 40
+		for i in range(steps):
+			for j in range(steps):
+				# offset grid points to stay clear of boundaries
+				x = (i + 0.5) * 2.0 / steps
+				y = (j + 0.5) * 2.0 / steps
+				expected = wrapped_delta(x, cx, 2.0) <= rx and wrapped_delta(y, cy, 2.0) <= ry
+				found = any(x1 <= x < x2 and y1 <= y < y2 for (x1, y1, x2, y2) in bounds)
+				self.assertEqual(found, expected, 'point ({}, {}) for target {}'.format(x, y, target))
+
+	def test_inside(self):
+		# target inside the field should be yielded as is
+		self.assertEqual(list(util.generate_wrapped_bounds(FIELD, (0.5, 0.5, 1.0, 1.0))), [(0.5, 0.5, 1.0, 1.0)])
+
+	def test_edges(self):
+		self.assertCovers((-0.12, 0.9, 0.28, 1.3))
+		self.assertCovers((1.81, 0.9, 2.21, 1.3))
+		self.assertCovers((0.9, -0.12, 1.3, 0.28))
+		self.assertCovers((0.9, 1.81, 1.3, 2.21))
+
+	def test_corners(self):
+		self.assertCovers((-0.12, -0.12, 0.28, 0.28))
+		self.assertCovers((1.81, -0.12, 2.21, 0.28))
+		self.assertCovers((-0.12, 1.81, 0.28, 2.21))
+		self.assertCovers((1.81, 1.81, 2.21, 2.21))
 
 class TestWrappedRadius(unittest.TestCase):
-	pass
+	def test_distance(self):
+		radius = util.WrappedRadius((1.0, 1.0), 0.5, FIELD_SIZE)
+		distance, location = radius.distance((1.3, 1.4))
+		self.assertAlmostEqual(distance, 0.5)
+		self.assertEqual(location, (1.3, 1.4))
+
+	def test_wrapped_distance(self):
+		# distance should be measured to the closest wrapped location
+		radius = util.WrappedRadius((0.1, 0.1), 0.5, FIELD_SIZE)
+		distance, location = radius.distance((1.9, 1.9))
+		self.assertAlmostEqual(distance, math.sqrt(0.08))
+		self.assertAlmostEqual(location[0], -0.1)
+		self.assertAlmostEqual(location[1], -0.1)
+
+	def test_random_distance(self):
+		rng = random.Random(3)
+		for _ in range(1000):
+			point = (rng.uniform(0, 2), rng.uniform(0, 2))
+			other = (rng.uniform(0, 2), rng.uniform(0, 2))
+			radius = util.WrappedRadius(point, 0.5, FIELD_SIZE)
+			expected = math.hypot(wrapped_delta(point[0], other[0], 2.0), wrapped_delta(point[1], other[1], 2.0))
+			self.assertAlmostEqual(radius.distance(other)[0], expected)
+
+	def test_contains(self):
+		radius = util.WrappedRadius((1.95, 0.05), 0.2, FIELD_SIZE)
+		self.assertTrue((1.95, 0.05) in radius)
+		self.assertTrue((0.05, 0.05) in radius)
+		self.assertTrue((1.95, 1.95) in radius)
+		self.assertTrue((0.05, 1.95) in radius)
+		self.assertFalse((1.0, 1.0) in radius)
+		self.assertFalse((0.2, 0.05) in radius)
+
+class TestStartThread(unittest.TestCase):
+	def test_stack_size(self):
+		thread = threading.Thread(target = lambda: None)
+		util.start_thread(thread, 256 * 1024)
+		thread.join()
+		# the custom size applies to the started thread only
+		self.assertEqual(threading.stack_size(), 0)
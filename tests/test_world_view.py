@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import threading
+import unittest
+
+from lobotomy import world_view
+from lobotomy.player import PlayerState
+from lobotomy.simulation import Simulation
+from lobotomy.world_view import WorldPublisher, WorldReader
+
+def read_players(name):
+	reader = WorldReader(name)
+	try:
+		return reader.players()
+	finally:
+		reader.close()
+
+class TestWorldView(unittest.TestCase):
+	def setUp(self):
+		self.simulation = Simulation(20, seed = 5)
+		self.publisher = WorldPublisher('lobotomy-test-{}'.format(os.getpid()), 64)
+		self.simulation.server.world_view = self.publisher
+		self.reader = WorldReader(self.publisher.name)
+
+	def tearDown(self):
+		self.reader.close()
+		self.publisher.close()
+
+	def expected(self):
+		return {
+			player.slot: (player.name,) + player.location + (player.energy, player.state)
+			for player in self.simulation.players
+		}
+
+	def test_publish(self):
+		self.simulation.run(3)
+		snapshot = self.reader.read()
+		self.assertEqual((snapshot.turn, snapshot.total), (3, 20))
+		self.assertIn('publish', self.simulation.server.turn_timings)
+		# published after the turn was resolved, before the next one heals
+		self.assertEqual(self.reader.players(), self.expected())
+		self.assertTrue(all(state in (PlayerState.WAITING, PlayerState.DEAD) for (_, _, _, _, state) in self.reader.players().values()))
+
+	def test_other_process(self):
+		self.simulation.run(2)
+		with multiprocessing.get_context('spawn').Pool(1) as pool:
+			self.assertEqual(pool.apply(read_players, (self.publisher.name,)), self.expected())
+
+	def test_leave(self):
+		self.simulation.run(1)
+		player = self.simulation.players.pop()
+		player.shutdown()
+		self.simulation.run(1)
+		self.assertNotIn(player.name, [name for (name, *_) in self.reader.players().values()])
+		self.assertEqual(self.reader.players(), self.expected())
+
+	def test_long_name(self):
+		# names are cut at a character boundary, 'é' taking two bytes
+		player = self.simulation.players[0]
+		player.name = 'x' + 'é' * 20
+		self.simulation.run(1)
+		name = self.reader.players()[player.slot][0]
+		self.assertEqual(name, 'x' + 'é' * 15)
+		self.assertEqual(len(name.encode('utf-8')), world_view.NAME_SIZE - 1)
+
+	def test_writing(self):
+		self.simulation.run(1)
+		# readers retry while the sequence says the view is being written
+		world_view.SEQUENCE.pack_into(self.publisher._buffer, world_view.SEQUENCE_OFFSET, 3)
+		with self.assertRaises(TimeoutError):
+			self.reader.read(attempts = 10)
+
+	def test_capacity(self):
+		small = WorldPublisher('lobotomy-test-small-{}'.format(os.getpid()), 8)
+		try:
+			small.publish(1, self.simulation.server.table)
+			reader = WorldReader(small.name)
+			snapshot = reader.read()
+			reader.close()
+			# slots beyond capacity are left out
+			self.assertEqual((len(snapshot.names), snapshot.total), (8, 20))
+		finally:
+			small.close()
+
+	def test_allocate(self):
+		# connections allocating slots while the world is published
+		table = self.simulation.server.table
+		owner = next(iter(self.simulation.server._players.values()))
+		errors = []
+
+		def allocate():
+			try:
+				for i in range(20000):
+					table.allocate(owner)
+			except Exception as e:
+				errors.append(e)
+
+		allocator = threading.Thread(target = allocate)
+		allocator.start()
+		while allocator.is_alive():
+			self.publisher.publish(1, table)
+		allocator.join()
+		self.assertEqual(errors, [])